@@ -0,0 +1,190 @@
+"""Микробенчмарки функций menu/crud.py на SQLite.
+
+База создаётся во временном каталоге и заполняется синтетическим каталогом
+(benchmarks.catalog). Каждая функция вызывается --runs раз в новой сессии,
+в JSON выводятся перцентили времени вызова. Записи, созданные
+бенчмарками create_*, затем изменяются update_* и удаляются delete_*,
+поэтому размер каталога между прогонами не меняется.
+
+    python -m benchmarks.bench_crud --scale 10k --runs 100 --output crud.json
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks import catalog, common
+from menu import crud, schemas
+
+MENU = schemas.MenuBase(title="bench menu", description="description")
+SUBMENU = schemas.SubmenuBase(title="bench submenu", description="description")
+DISH = schemas.DishBase(
+    title="bench dish", description="description", price="1"
+)
+
+READS = {
+    "get_all_menu": lambda db: crud.get_all_menu(db),
+    "get_menu_page": lambda db: crud.get_menu_page(crud.PAGE_SIZE, None, db),
+    "get_menu_by_id": lambda db: crud.get_menu_by_id("1", db),
+    "get_menu_tree_by_id": lambda db: crud.get_menu_tree_by_id("1", db),
+    "get_all_submenu": lambda db: crud.get_all_submenu("1", db),
+    "get_submenu_page": lambda db: crud.get_submenu_page(
+        "1", crud.PAGE_SIZE, None, db
+    ),
+    "get_submenu_by_id": lambda db: crud.get_submenu_by_id("1", "1", db),
+    "get_all_dishes": lambda db: crud.get_all_dishes("1", "1", db),
+    "get_all_dishes_rows": lambda db: crud.get_all_dishes_rows("1", "1", db),
+    "get_dishes_filtered": lambda db: crud.get_dishes_filtered(
+        "1", "1", None, None, "id", crud.PAGE_SIZE, None, db
+    ),
+    "get_dish_by_id": lambda db: crud.get_dish_by_id("1", "1", "1", db),
+    "get_etag_menus": lambda db: crud.get_etag(crud.menus_version_query(), db),
+    "get_etag_dishes": lambda db: crud.get_etag(
+        crud.dishes_version_query("1", "1"), db
+    ),
+    "get_catalog_last_modified": crud.get_catalog_last_modified,
+}
+
+# Полное дерево и выгрузка читают весь каталог, их время растёт
+# с масштабом, поэтому они выполняются меньшее число раз
+FULL_READS = {
+    "get_menu_tree": lambda db: crud.get_menu_tree(db),
+    "iter_catalog_batches": lambda db: sum(
+        len(rows) for _, rows in crud.iter_catalog_batches(None, db)
+    ),
+}
+
+
+def run(Session, func, runs: int) -> list[float]:
+    samples = []
+    for _ in range(runs):
+        with Session() as db:
+            start = time.perf_counter()
+            func(db)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+# create_* возвращают новые id, которые используют update_* и delete_*
+def run_writes(Session, runs: int) -> dict:
+    samples = {}
+
+    def step(name, calls):
+        samples[name] = []
+        results = []
+        for call in calls:
+            with Session() as db:
+                start = time.perf_counter()
+                results.append(call(db))
+                samples[name].append(time.perf_counter() - start)
+        return results
+
+    menus = step(
+        "create_menu", [lambda db: crud.create_menu(MENU, db).id] * runs
+    )
+    step(
+        "update_menu",
+        [
+            lambda db, m=m: crud.update_menu(
+                crud.get_menu_by_id(m, db), MENU, db
+            )
+            for m in menus
+        ],
+    )
+    submenus = step(
+        "create_submenu",
+        [lambda db: crud.create_submenu(menus[0], SUBMENU, db).id] * runs,
+    )
+    step(
+        "update_submenu",
+        [
+            lambda db, s=s: crud.update_submenu(
+                crud.get_submenu_by_id(menus[0], s, db), SUBMENU, db
+            )
+            for s in submenus
+        ],
+    )
+    dishes = step(
+        "create_dish",
+        [lambda db: crud.create_dish(menus[0], submenus[0], DISH, db).id]
+        * runs,
+    )
+    step(
+        "update_dish",
+        [
+            lambda db, d=d: crud.update_dish(
+                crud.get_dish_by_id(menus[0], submenus[0], d, db), DISH, db
+            )
+            for d in dishes
+        ],
+    )
+    step(
+        "delete_dish",
+        [
+            lambda db, d=d: crud.delete_dish(menus[0], submenus[0], d, db)
+            for d in dishes
+        ],
+    )
+    step(
+        "delete_submenu",
+        [
+            lambda db, s=s: crud.delete_submenu(menus[0], s, db)
+            for s in submenus
+        ],
+    )
+    step(
+        "delete_menu",
+        [lambda db, m=m: crud.delete_menu(m, db) for m in menus],
+    )
+    return samples
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", default="10k")
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--full-runs", type=int, default=5)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    dishes = catalog.parse_scale(args.scale)
+    with tempfile.TemporaryDirectory() as tmp:
+        url = "sqlite:///" + os.path.join(tmp, "bench.db")
+        start = time.perf_counter()
+        engine, totals = catalog.prepare_database(url, dishes)
+        seeded = time.perf_counter() - start
+        Session = sessionmaker(bind=engine, autoflush=False)
+
+        samples = {
+            name: run(Session, func, args.runs) for name, func in READS.items()
+        }
+        samples.update(
+            (name, run(Session, func, args.full_runs))
+            for name, func in FULL_READS.items()
+        )
+        samples.update(run_writes(Session, args.runs))
+        engine.dispose()
+
+    common.write_result(
+        {
+            "benchmark": "crud",
+            "environment": common.environment(),
+            "scale": totals,
+            "seed_s": round(seeded, 2),
+            "runs": args.runs,
+            "functions": {
+                name: common.percentiles(values)
+                for name, values in samples.items()
+            },
+        },
+        args.output,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""Пропускная способность и задержки маршрутов menu/main.py.
+
+Приложение из create_app запускается в этом же процессе под uvicorn
+(в отдельном потоке) на SQLite во временном каталоге, заполненной
+синтетическим каталогом (benchmarks.catalog). Каждый маршрут нагружается
+--requests запросами из --concurrency потоков; в JSON выводятся
+запросы в секунду, перцентили задержки и коды ответов по шаблону маршрута.
+Созданные POST-запросами записи удаляются DELETE-запросами.
+
+    python -m benchmarks.bench_http --scale 10k --requests 500 --concurrency 8
+"""
+
+import argparse
+import os
+import queue
+import socket
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple
+
+import httpx
+import uvicorn
+
+from benchmarks import catalog, common
+
+DISHES = "/api/v1/menus/1/submenus/1/dishes"
+
+
+class Case(NamedTuple):
+    method: str
+    template: str
+    # Номер запроса -> (путь, тело)
+    request: Callable[[int], tuple[str, dict | None]]
+    # Читает весь каталог: выполняется --full-requests раз
+    full: bool = False
+    # Очередь, в которую складываются id созданных записей
+    produces: str | None = None
+
+
+def body(title: str, **extra) -> dict:
+    return {"title": title, "description": "bench", **extra}
+
+
+def build_cases(created: dict[str, queue.SimpleQueue]) -> list[Case]:
+    def take(name: str) -> str:
+        return created[name].get_nowait()
+
+    return [
+        Case("GET", "/api/v1/menus", lambda i: ("/api/v1/menus", None)),
+        Case("GET", "/api/v1/menus/tree", lambda i: ("/api/v1/menus/tree", None), full=True),
+        Case("GET", "/api/v1/menus/{menu_id}", lambda i: ("/api/v1/menus/1", None)),
+        Case("GET", "/api/v1/menus/{menu_id}/tree", lambda i: ("/api/v1/menus/1/tree", None)),
+        Case("GET", "/api/v1/menus/{menu_id}/submenus", lambda i: ("/api/v1/menus/1/submenus", None)),
+        Case("GET", "/api/v1/menus/{menu_id}/submenus/{submenu_id}", lambda i: ("/api/v1/menus/1/submenus/1", None)),
+        Case("GET", "/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes", lambda i: (DISHES, None)),
+        Case("GET", "/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}", lambda i: (DISHES + "/1", None)),
+        Case("GET", "/api/v1/catalog/export", lambda i: ("/api/v1/catalog/export", None), full=True),
+        Case("POST", "/api/v1/menus", lambda i: ("/api/v1/menus", body(f"menu {i}")), produces="menus"),
+        Case("PATCH", "/api/v1/menus/{menu_id}", lambda i: ("/api/v1/menus/1", body("menu 0"))),
+        Case("POST", "/api/v1/menus/{menu_id}/submenus", lambda i: ("/api/v1/menus/1/submenus", body(f"submenu {i}")), produces="submenus"),
+        Case("PATCH", "/api/v1/menus/{menu_id}/submenus/{submenu_id}", lambda i: ("/api/v1/menus/1/submenus/1", body("submenu 0"))),
+        Case("POST", "/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes", lambda i: (DISHES, body(f"dish {i}", price="1")), produces="dishes"),
+        Case("PATCH", "/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}", lambda i: (DISHES + "/1", body("dish 0", price="0.00"))),
+        Case("DELETE", "/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}", lambda i: (f"{DISHES}/{take('dishes')}", None)),
+        Case("DELETE", "/api/v1/menus/{menu_id}/submenus/{submenu_id}", lambda i: (f"/api/v1/menus/1/submenus/{take('submenus')}", None)),
+        Case("DELETE", "/api/v1/menus/{menu_id}", lambda i: (f"/api/v1/menus/{take('menus')}", None)),
+        Case("POST", "/api/v1/catalog/import", lambda i: ("/api/v1/catalog/import", next(catalog.generate(10)).dict())),
+    ]  # fmt: skip
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int) -> tuple[uvicorn.Server, threading.Thread]:
+    from menu.main import create_app
+
+    config = uvicorn.Config(
+        create_app(), host="127.0.0.1", port=port, log_level="warning"
+    )
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn не запустился")
+        time.sleep(0.05)
+    return server, thread
+
+
+def load(
+    base_url: str,
+    case: Case,
+    requests: int,
+    concurrency: int,
+    created: dict[str, queue.SimpleQueue],
+) -> dict:
+    local = threading.local()
+
+    def send(i: int) -> tuple[float, int]:
+        if not hasattr(local, "client"):
+            local.client = httpx.Client(base_url=base_url, timeout=60)
+        path, json = case.request(i)
+        start = time.perf_counter()
+        response = local.client.request(case.method, path, json=json)
+        elapsed = time.perf_counter() - start
+        if case.produces and response.status_code == 201:
+            created[case.produces].put(response.json()["id"])
+        return elapsed, response.status_code
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(send, range(requests)))
+    wall = time.perf_counter() - start
+
+    return {
+        "requests": requests,
+        "rps": round(requests / wall, 1),
+        "latency": common.percentiles([elapsed for elapsed, _ in results]),
+        "status": dict(Counter(str(status) for _, status in results)),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", default="10k")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--full-requests", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # Приложение по умолчанию открывает ./sql_app.db
+        os.chdir(tmp)
+        try:
+            engine, totals = catalog.prepare_database(
+                "sqlite:///./sql_app.db", catalog.parse_scale(args.scale)
+            )
+            engine.dispose()
+
+            port = free_port()
+            server, thread = start_server(port)
+            created = {
+                name: queue.SimpleQueue()
+                for name in ("menus", "submenus", "dishes")
+            }
+            routes = {}
+            for case in build_cases(created):
+                requests = args.full_requests if case.full else args.requests
+                routes[f"{case.method} {case.template}"] = load(
+                    f"http://127.0.0.1:{port}",
+                    case,
+                    requests,
+                    args.concurrency,
+                    created,
+                )
+            server.should_exit = True
+            thread.join()
+        finally:
+            os.chdir(cwd)
+
+    common.write_result(
+        {
+            "benchmark": "http",
+            "environment": common.environment(),
+            "scale": totals,
+            "concurrency": args.concurrency,
+            "routes": routes,
+        },
+        args.output,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
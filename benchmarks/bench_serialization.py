@@ -0,0 +1,147 @@
+"""Процессорное время на один ответ со списком блюд.
+
+Сравниваются обычный путь (ORM-объекты, схема pydantic, jsonable_encoder,
+json) и быстрый (кортежи строк, orjson), отдельно с запросом к БД и только
+сериализация. Для тела быстрого ответа замеряется сжатие gzip и brotli
+(если установлен пакет brotli). Данные создаются в SQLite в памяти через
+массовую загрузку каталога, результат выводится в JSON.
+
+    python -m benchmarks.bench_serialization --dishes 10000 --runs 20
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from menu import compression, crud, models, schemas
+
+
+def create_session(dishes: int):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    catalog = {
+        "menus": [
+            {
+                "title": "menu",
+                "description": "description",
+                "submenus": [
+                    {
+                        "title": "submenu",
+                        "description": "description",
+                        "dishes": [
+                            {
+                                "title": f"dish {i}",
+                                "description": f"description of dish {i}",
+                                "price": f"{i % 1000}.50",
+                            }
+                            for i in range(dishes)
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+    crud.import_catalog(schemas.CatalogImport.parse_obj(catalog), db)
+    return db
+
+
+def render_schemas(rows) -> bytes:
+    content = jsonable_encoder([schemas.Dish.from_orm(row) for row in rows])
+    return JSONResponse(content).body
+
+
+def render_rows(rows) -> bytes:
+    return ORJSONResponse(rows).body
+
+
+def measure(func, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        start = time.process_time()
+        func()
+        samples.append(time.process_time() - start)
+    ms = [value * 1000 for value in samples]
+    return {
+        "min_ms": round(min(ms), 3),
+        "median_ms": round(statistics.median(ms), 3),
+        "max_ms": round(max(ms), 3),
+    }
+
+
+def measure_compression(body: bytes, runs: int) -> dict:
+    result = {}
+    for encoding in compression.available_encodings():
+        middleware = compression.CompressionMiddleware(None)
+
+        def compress():
+            encoder = middleware.encoder(encoding)
+            return encoder.compress(body) + encoder.finish()
+
+        result[encoding] = {
+            "bytes": len(compress()),
+            "cpu": measure(compress, runs),
+        }
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dishes", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    db = create_session(args.dishes)
+    orm_rows = crud.get_all_dishes("1", "1", db)
+    tuple_rows = crud.get_all_dishes_rows("1", "1", db)
+    assert json.loads(render_schemas(orm_rows)) == json.loads(
+        render_rows(tuple_rows)
+    )
+
+    standard = measure(
+        lambda: render_schemas(crud.get_all_dishes("1", "1", db)), args.runs
+    )
+    fast = measure(
+        lambda: render_rows(crud.get_all_dishes_rows("1", "1", db)), args.runs
+    )
+    body = render_rows(tuple_rows)
+    result = {
+        "benchmark": "serialization",
+        "dishes": args.dishes,
+        "runs": args.runs,
+        "with_query": {
+            "standard": standard,
+            "fast": fast,
+            "speedup": round(standard["median_ms"] / fast["median_ms"], 2),
+        },
+        "serialize_only": {
+            "standard": measure(lambda: render_schemas(orm_rows), args.runs),
+            "fast": measure(lambda: render_rows(tuple_rows), args.runs),
+        },
+        "body_bytes": len(body),
+        "compression": measure_compression(body, args.runs),
+    }
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""Одновременное чтение и запись на SQLite: обычный и встроенный режим.
+
+Для каждого режима (SQLITE_TUNED=false и true) база создаётся во временном
+каталоге и заполняется синтетическим каталогом (benchmarks.catalog),
+движки создаются menu.database.init_engine, как при запуске приложения.
+--seconds секунд --readers потоков читают список блюд подменю (сессия
+выбирается так же, как в get_read_db), а --writers потоков изменяют
+каждый своё блюдо через crud.update_dish. В JSON выводятся операции
+в секунду, перцентили задержки и число ошибок (database is locked)
+для чтения и записи.
+
+    python -m benchmarks.bench_sqlite --scale 10k --readers 4 --writers 2
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from benchmarks import catalog, common
+from menu import crud, database, schemas
+from menu.dependencies import get_sqlite_settings
+
+
+def read_session():
+    replica = database.replicas.pick() if database.replicas else None
+    if replica is None:
+        return database.SessionLocal()
+    return replica.session()
+
+
+def read(submenu: str, i: int) -> None:
+    with read_session() as db:
+        crud.get_all_dishes("1", submenu, db)
+
+
+def write(dish_id: str, i: int) -> None:
+    with database.SessionLocal() as db:
+        dish = crud.get_dish_by_id("1", "1", dish_id, db)
+        new_dish = schemas.DishBase(
+            title=f"dish {i}", description="bench", price=f"{i % 100}.00"
+        )
+        crud.update_dish(dish, new_dish, db)
+
+
+def worker(func, args, stop: threading.Event, result: dict) -> None:
+    i = 0
+    while not stop.is_set():
+        i += 1
+        start = time.perf_counter()
+        try:
+            func(*args, i)
+        except OperationalError:
+            result["errors"] += 1
+            continue
+        result["samples"].append(time.perf_counter() - start)
+
+
+def summary(results: list[dict], seconds: float) -> dict:
+    samples = [s for result in results for s in result["samples"]]
+    return {
+        "ops_per_sec": round(len(samples) / seconds, 1),
+        "errors": sum(result["errors"] for result in results),
+        "latency": common.percentiles(samples) if samples else None,
+    }
+
+
+def run_mode(tuned: bool, args) -> dict:
+    os.environ["SQLITE_TUNED"] = "true" if tuned else "false"
+    os.environ["SQLITE_READERS"] = str(args.readers)
+    get_sqlite_settings.cache_clear()
+
+    engine, totals = catalog.prepare_database(
+        "sqlite:///./sql_app.db", catalog.parse_scale(args.scale)
+    )
+    engine.dispose()
+    database.init_engine()
+    try:
+        stop = threading.Event()
+        readers = [{"samples": [], "errors": 0} for _ in range(args.readers)]
+        writers = [{"samples": [], "errors": 0} for _ in range(args.writers)]
+        threads = [
+            threading.Thread(
+                target=worker,
+                args=(read, ("1",), stop, result),
+            )
+            for result in readers
+        ] + [
+            threading.Thread(
+                target=worker,
+                args=(write, (str(n + 1),), stop, result),
+            )
+            for n, result in enumerate(writers)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        asyncio.run(database.dispose_engine())
+        os.remove("sql_app.db")
+
+    return {
+        "scale": totals,
+        "reads": summary(readers, elapsed),
+        "writes": summary(writers, elapsed),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", default="10k")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    modes = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # init_engine открывает ./sql_app.db
+        os.chdir(tmp)
+        try:
+            for name, tuned in (("default", False), ("tuned", True)):
+                modes[name] = run_mode(tuned, args)
+        finally:
+            os.chdir(cwd)
+
+    common.write_result(
+        {
+            "benchmark": "sqlite",
+            "environment": common.environment(),
+            "readers": args.readers,
+            "writers": args.writers,
+            "seconds": args.seconds,
+            "modes": modes,
+        },
+        args.output,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
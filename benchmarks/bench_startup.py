@@ -0,0 +1,79 @@
+"""Время холодного импорта приложения и создания его экземпляра.
+
+Каждый замер выполняется в отдельном процессе интерпретатора, результат
+выводится в JSON. С --max-ms скрипт завершается с ошибкой, если медиана
+импорта превышает порог.
+
+    python -m benchmarks.bench_startup --runs 10 --max-ms 1500
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+MEASURE = """
+import json
+import time
+start = time.perf_counter()
+import menu.main
+imported = time.perf_counter()
+menu.main.create_app()
+created = time.perf_counter()
+print(json.dumps({"import": imported - start, "create_app": created - imported}))
+"""
+
+
+def measure_once() -> dict:
+    res = subprocess.run(
+        [sys.executable, "-c", MEASURE],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(res.stdout.splitlines()[-1])
+
+
+def summarize(values: list[float]) -> dict:
+    ms = [value * 1000 for value in values]
+    return {
+        "min_ms": round(min(ms), 2),
+        "median_ms": round(statistics.median(ms), 2),
+        "max_ms": round(max(ms), 2),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    samples = [measure_once() for _ in range(args.runs)]
+    result = {
+        "benchmark": "startup",
+        "runs": args.runs,
+        "import": summarize([s["import"] for s in samples]),
+        "create_app": summarize([s["create_app"] for s in samples]),
+    }
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    print(text)
+
+    if args.max_ms is not None and result["import"]["median_ms"] > args.max_ms:
+        print(
+            f"import median {result['import']['median_ms']} ms "
+            f"exceeds {args.max_ms} ms",
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
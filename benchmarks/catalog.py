@@ -0,0 +1,112 @@
+"""Генератор синтетического каталога для бенчмарков.
+
+Каталог загружается через массовую загрузку (crud.import_catalog) частями,
+поэтому даже миллион блюд не держится в памяти целиком. Размер задаётся
+числом блюд или одним из масштабов: 10, 10k, 1m.
+
+    python -m benchmarks.catalog --scale 10k --database sqlite:///./bench.db
+"""
+
+import argparse
+import sys
+import time
+from typing import Iterator
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from menu import crud, migrations, schemas
+
+SCALES = {"10": 10, "10k": 10_000, "1m": 1_000_000}
+
+# Меню с подменю, загружаемых одним вызовом import_catalog
+MENUS_PER_CHUNK = 10
+
+
+def parse_scale(value: str) -> int:
+    value = value.lower()
+    if value in SCALES:
+        return SCALES[value]
+    return int(value)
+
+
+def generate(
+    dishes: int, dishes_per_submenu: int = 100, submenus_per_menu: int = 10
+) -> Iterator[schemas.CatalogImport]:
+    menus = []
+    number = 0
+    while number < dishes:
+        submenus = []
+        while number < dishes and len(submenus) < submenus_per_menu:
+            count = min(dishes_per_submenu, dishes - number)
+            submenus.append(
+                schemas.SubmenuImport(
+                    title=f"submenu {len(submenus)}",
+                    description="synthetic submenu",
+                    dishes=[
+                        schemas.DishBase(
+                            title=f"dish {i}",
+                            description=f"synthetic dish number {i}",
+                            price=f"{i % 1000}.{i % 100:02d}",
+                        )
+                        for i in range(number, number + count)
+                    ],
+                )
+            )
+            number += count
+        menus.append(
+            schemas.MenuImport(
+                title=f"menu {len(menus)}",
+                description="synthetic menu",
+                submenus=submenus,
+            )
+        )
+        if len(menus) == MENUS_PER_CHUNK:
+            yield schemas.CatalogImport(menus=menus)
+            menus = []
+    if menus:
+        yield schemas.CatalogImport(menus=menus)
+
+
+def seed(db: Session, dishes: int, **shape) -> dict:
+    totals = {"menus": 0, "submenus": 0, "dishes": 0}
+    for catalog in generate(dishes, **shape):
+        for key, value in crud.import_catalog(catalog, db).items():
+            totals[key] += value
+    return totals
+
+
+# Новая база со схемой из миграций и каталогом заданного размера
+def prepare_database(url: str, dishes: int, **shape) -> tuple[Engine, dict]:
+    connect_args = {}
+    if url.startswith("sqlite"):
+        connect_args["check_same_thread"] = False
+    engine = create_engine(url, connect_args=connect_args)
+    migrations.migrate(engine)
+    with Session(engine) as db:
+        totals = seed(db, dishes, **shape)
+    return engine, totals
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", default="10k")
+    parser.add_argument("--database", default="sqlite:///./bench.db")
+    parser.add_argument("--dishes-per-submenu", type=int, default=100)
+    parser.add_argument("--submenus-per-menu", type=int, default=10)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    _, totals = prepare_database(
+        args.database,
+        parse_scale(args.scale),
+        dishes_per_submenu=args.dishes_per_submenu,
+        submenus_per_menu=args.submenus_per_menu,
+    )
+    print(totals, f"{time.perf_counter() - start:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+import json
+import platform
+import statistics
+import time
+
+
+def percentiles(samples: list[float]) -> dict:
+    ms = sorted(value * 1000 for value in samples)
+
+    def pick(q: float) -> float:
+        return round(ms[min(len(ms) - 1, int(q * len(ms)))], 3)
+
+    return {
+        "count": len(ms),
+        "min_ms": round(ms[0], 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "p50_ms": pick(0.50),
+        "p90_ms": pick(0.90),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ms[-1], 3),
+    }
+
+
+def timed(func, runs: int) -> list[float]:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+# Окружение записывается вместе с результатом, чтобы сравнивать
+# только сопоставимые прогоны
+def environment() -> dict:
+    import sqlite3
+
+    import sqlalchemy
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "sqlite": sqlite3.sqlite_version,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def write_result(result: dict, output: str | None) -> None:
+    text = json.dumps(result, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text)
+    print(text)
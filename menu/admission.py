@@ -0,0 +1,184 @@
+import asyncio
+from collections import deque
+from typing import NamedTuple
+
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+# Класс запросов: приоритет (меньше — раньше), длина очереди ожидания
+# и сколько секунд запрос может ждать свободного слота
+class RequestClass(NamedTuple):
+    priority: int
+    queue_size: int
+    timeout: float
+
+
+class ClassStats:
+    __slots__ = ("queued", "admitted", "rejected_full", "rejected_timeout")
+
+    def __init__(self):
+        self.queued = 0
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+# Не больше limit запросов одновременно. Остальные ждут в очереди своего
+# класса; освободившийся слот получает первый запрос из очереди
+# с наименьшим приоритетом. Переполненная очередь и истёкшее ожидание
+# сразу дают отказ.
+class Limiter:
+    def __init__(self, limit: int, classes: dict[str, RequestClass]):
+        self.limit = limit
+        self.classes = classes
+        self.in_flight = 0
+        self._order = sorted(classes, key=lambda name: classes[name].priority)
+        self._waiters: dict[str, deque[asyncio.Future]] = {
+            name: deque() for name in classes
+        }
+        self.stats = {name: ClassStats() for name in classes}
+
+    async def acquire(self, name: str) -> None:
+        request_class = self.classes[name]
+        stats = self.stats[name]
+        if self.in_flight < self.limit:
+            self.in_flight += 1
+            stats.admitted += 1
+            return
+
+        waiters = self._waiters[name]
+        if len(waiters) >= request_class.queue_size:
+            stats.rejected_full += 1
+            raise Overloaded("queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        waiters.append(future)
+        stats.queued += 1
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(future), request_class.timeout
+            )
+        except asyncio.TimeoutError:
+            self._abandon(future, waiters)
+            stats.rejected_timeout += 1
+            raise Overloaded("timeout")
+        except asyncio.CancelledError:
+            # Клиент отключился, пока запрос ждал в очереди
+            self._abandon(future, waiters)
+            raise
+        finally:
+            stats.queued -= 1
+        stats.admitted += 1
+
+    # Слот мог быть выдан одновременно с отменой ожидания: тогда он
+    # передаётся дальше
+    def _abandon(self, future: asyncio.Future, waiters: deque) -> None:
+        if future.done():
+            self.release()
+        else:
+            future.cancel()
+            waiters.remove(future)
+
+    def release(self) -> None:
+        for name in self._order:
+            waiters = self._waiters[name]
+            while waiters:
+                future = waiters.popleft()
+                if not future.done():
+                    # Слот переходит ожидающему, in_flight не меняется
+                    future.set_result(None)
+                    return
+        self.in_flight -= 1
+
+    def get_stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "classes": {
+                name: {
+                    "queued": stats.queued,
+                    "admitted": stats.admitted,
+                    "rejected_queue_full": stats.rejected_full,
+                    "rejected_timeout": stats.rejected_timeout,
+                }
+                for name, stats in self.stats.items()
+            },
+        }
+
+
+# Класс запроса по методу и пути; None — запрос не ограничивается
+# (метрики, служебные маршруты, документация и долгоживущая лента
+# изменений, которая не обращается к БД)
+def classify(method: str, path: str) -> str | None:
+    if not path.startswith("/api/") or path == "/api/v1/changes":
+        return None
+    if path.startswith("/api/v1/catalog/"):
+        return "bulk"
+    if method in ("GET", "HEAD") and path.startswith("/api/v1/menus"):
+        return "read"
+    if method in ("GET", "HEAD") or path.endswith("/batch"):
+        return "query"
+    return "write"
+
+
+def classes_from_settings(settings) -> dict[str, RequestClass]:
+    return {
+        name: RequestClass(
+            priority,
+            getattr(settings, f"{name}_queue"),
+            getattr(settings, f"{name}_timeout"),
+        )
+        for priority, name in enumerate(("read", "query", "write", "bulk"))
+    }
+
+
+limiter: Limiter | None = None
+
+
+def get_stats() -> dict | None:
+    return None if limiter is None else limiter.get_stats()
+
+
+class AdmissionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        limit: int,
+        classes: dict[str, RequestClass],
+        retry_after: int = 1,
+    ):
+        global limiter
+        self.app = app
+        self.limiter = limiter = Limiter(limit, classes)
+        self.retry_after = retry_after
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        name = None
+        if scope["type"] == "http":
+            name = classify(scope["method"], scope["path"])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.limiter.acquire(name)
+        except Overloaded as exc:
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "service overloaded", "reason": exc.reason},
+                headers={"Retry-After": str(self.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release()
@@ -0,0 +1,423 @@
+from fastapi import APIRouter, Depends, Header, Query, Request
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Union
+
+from menu import cache, crud, crud_async, database, etag, export, handlers
+from menu import responses, schemas, snapshot
+
+
+# Асинхронные обработчики режима DB_ASYNC=1. Общая с синхронными
+# маршрутами (menu.main) часть вынесена в menu.handlers; отличия режима
+# отмечены у get_async_db.
+router = APIRouter()
+
+
+# Все запросы асинхронного режима, включая чтение, идут в основную БД:
+# реплики (DB_REPLICA_URLS) и пул чтения встроенного режима SQLite
+# используются только синхронными маршрутами (main.get_read_db). Поэтому
+# отказ реплики здесь не обрабатывается, а кэш заполняется только
+# данными основной БД и пропускать его, как для отстающей реплики, не нужно.
+async def get_async_db():
+    async with database.AsyncSessionLocal() as db:
+        yield db
+
+
+# Проверка If-None-Match до загрузки данных: версия читается отдельным
+# лёгким запросом (или берётся из снимка каталога), при совпадении сразу
+# отдаётся 304 Not Modified
+def check_etag(version_query, key_func):
+    async def dependency(
+        request: Request,
+        response: Response,
+        if_none_match: str | None = Header(None),
+        db: AsyncSession = Depends(get_async_db),
+    ):
+        key = key_func(**request.path_params)
+        if handlers.check_snapshot_etag(key, if_none_match, response):
+            return
+        query = version_query(**request.path_params)
+        etag.check(
+            await crud_async.get_etag(query, db), if_none_match, response
+        )
+
+    return Depends(dependency)
+
+
+@router.get(
+    "/api/v1/menus",
+    response_model=Union[list[schemas.Menu], schemas.MenuPage],
+    dependencies=[check_etag(crud.menus_version_query, cache.menus_key)],
+)
+async def get_all_menu(
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=crud.MAX_PAGE_SIZE),
+    after: int | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    if limit is None and after is None:
+        entry = snapshot.lookup(cache.menus_key())
+        if entry is not None:
+            return snapshot.respond(entry)
+        if responses.fast_json_enabled():
+            rows = await crud_async.cached_get_all_menu_rows(db)
+            return responses.fast_list(rows, response)
+        return await crud_async.cached_get_all_menu(db)
+    return await crud_async.get_menu_page(limit or crud.PAGE_SIZE, after, db)
+
+
+# Объявлен раньше /api/v1/menus/{menu_id}, чтобы "tree" не считался id
+@router.get("/api/v1/menus/tree", response_model=list[schemas.MenuTree])
+async def get_menu_tree(db: AsyncSession = Depends(get_async_db)):
+    return await crud_async.get_menu_tree(db)
+
+
+# Несколько меню по списку id одним запросом
+@router.post("/api/v1/menus/batch", response_model=schemas.MenuBatch)
+async def get_menus_by_ids(
+    batch: schemas.BatchIds, db: AsyncSession = Depends(get_async_db)
+):
+    return await crud_async.get_menus_by_ids(batch.ids, db)
+
+
+@router.get(
+    "/api/v1/menus/{menu_id}",
+    response_model=schemas.Menu,
+    dependencies=[check_etag(crud.menu_version_query, cache.menu_key)],
+)
+async def get_menu_by_id(
+    menu_id: str, db: AsyncSession = Depends(get_async_db)
+):
+    entry = snapshot.lookup(cache.menu_key(menu_id))
+    if entry is not None:
+        return snapshot.respond(entry)
+    menu_db = await crud_async.cached_get_menu_by_id(menu_id, db)
+
+    if menu_db is None:
+        return handlers.not_found("menu")
+
+    return menu_db
+
+
+@router.get("/api/v1/menus/{menu_id}/tree", response_model=schemas.MenuTree)
+async def get_menu_tree_by_id(
+    menu_id: str, db: AsyncSession = Depends(get_async_db)
+):
+    menu_db = await crud_async.get_menu_tree_by_id(menu_id, db)
+
+    if menu_db is None:
+        return handlers.not_found("menu")
+
+    return menu_db
+
+
+@router.post("/api/v1/menus", response_model=schemas.Menu, status_code=201)
+async def create_menu(
+    menu: schemas.MenuBase, db: AsyncSession = Depends(get_async_db)
+):
+    return await crud_async.create_menu(menu, db)
+
+
+@router.delete("/api/v1/menus/{menu_id}")
+async def delete_menu(menu_id: str, db: AsyncSession = Depends(get_async_db)):
+    await crud_async.delete_menu(menu_id, db)
+    return handlers.deleted("menu")
+
+
+@router.patch("/api/v1/menus/{menu_id}", response_model=schemas.Menu)
+async def update_menu(
+    menu_id: str,
+    menu_new: schemas.MenuBase,
+    db: AsyncSession = Depends(get_async_db),
+) -> Any:
+    menu_db = await crud_async.get_menu_by_id(menu_id, db)
+
+    if menu_db is None:
+        return handlers.not_found("menu")
+
+    menu_db = await crud_async.update_menu(menu_db, menu_new, db)
+    return menu_db
+
+
+@router.post(
+    "/api/v1/catalog/import",
+    response_model=schemas.CatalogImportResult,
+    status_code=201,
+)
+async def import_catalog(
+    catalog: schemas.CatalogImport, db: AsyncSession = Depends(get_async_db)
+):
+    return await crud_async.import_catalog(catalog, db)
+
+
+# Выгрузка каталога в NDJSON или CSV. С since или If-Modified-Since
+# выгружаются только записи, изменённые позже указанного времени.
+@router.get("/api/v1/catalog/export")
+async def export_catalog(
+    fmt: str = Query("ndjson", alias="format", regex="^(ndjson|csv)$"),
+    since: datetime | None = None,
+    if_modified_since: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    last_modified = await crud_async.get_catalog_last_modified(db)
+    headers, since = handlers.export_since(
+        last_modified, since, if_modified_since
+    )
+    batches = crud_async.iter_catalog_batches(since, db)
+    return handlers.export_response(
+        fmt, export.aiter_export(fmt, batches), headers
+    )
+
+
+@router.get(
+    "/api/v1/menus/{menu_id}/submenus",
+    response_model=Union[list[schemas.Submenu], schemas.SubmenuPage],
+    dependencies=[check_etag(crud.submenus_version_query, cache.submenus_key)],
+)
+async def get_all_submenu_for_menu(
+    menu_id: str,
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=crud.MAX_PAGE_SIZE),
+    after: int | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    if limit is None and after is None:
+        entry = snapshot.lookup(cache.submenus_key(menu_id))
+        if entry is not None:
+            return snapshot.respond(entry)
+        if responses.fast_json_enabled():
+            rows = await crud_async.cached_get_all_submenu_rows(menu_id, db)
+            return responses.fast_list(rows, response)
+        return await crud_async.cached_get_all_submenu(menu_id, db)
+    return await crud_async.get_submenu_page(
+        menu_id, limit or crud.PAGE_SIZE, after, db
+    )
+
+
+@router.get(
+    "/api/v1/menus/{menu_id}/submenus/{submenu_id}",
+    response_model=schemas.Submenu,
+    dependencies=[check_etag(crud.submenu_version_query, cache.submenu_key)],
+)
+async def get_submenu_for_menu_by_id(
+    menu_id: str, submenu_id: str, db: AsyncSession = Depends(get_async_db)
+):
+    entry = snapshot.lookup(cache.submenu_key(menu_id, submenu_id))
+    if entry is not None:
+        return snapshot.respond(entry)
+    submenu_db = await crud_async.cached_get_submenu_by_id(
+        menu_id, submenu_id, db
+    )
+
+    if submenu_db is None:
+        return handlers.not_found("submenu")
+
+    return submenu_db
+
+
+@router.post("/api/v1/submenus/batch", response_model=schemas.SubmenuBatch)
+async def get_submenus_by_ids(
+    batch: schemas.BatchIds, db: AsyncSession = Depends(get_async_db)
+):
+    return await crud_async.get_submenus_by_ids(batch.ids, db)
+
+
+@router.post(
+    "/api/v1/menus/{menu_id}/submenus",
+    response_model=schemas.Submenu,
+    status_code=201,
+)
+async def create_submenu(
+    menu_id: str,
+    submenu: schemas.SubmenuBase,
+    db: AsyncSession = Depends(get_async_db),
+):
+    submenu_db = await crud_async.create_submenu(menu_id, submenu, db)
+
+    if submenu_db is None:
+        return handlers.not_found("menu")
+
+    return submenu_db
+
+
+@router.patch(
+    "/api/v1/menus/{menu_id}/submenus/{submenu_id}",
+    response_model=schemas.Submenu,
+)
+async def update_submenu(
+    menu_id: str,
+    submenu_id: str,
+    new_submenu: schemas.SubmenuBase,
+    db: AsyncSession = Depends(get_async_db),
+):
+    submenu_db = await crud_async.get_submenu_by_id(menu_id, submenu_id, db)
+
+    if submenu_db is None:
+        return handlers.not_found("submenu")
+
+    submenu_db = await crud_async.update_submenu(submenu_db, new_submenu, db)
+    return submenu_db
+
+
+@router.delete("/api/v1/menus/{menu_id}/submenus/{submenu_id}")
+async def delete_submenu(
+    menu_id: str, submenu_id: str, db: AsyncSession = Depends(get_async_db)
+):
+    await crud_async.delete_submenu(menu_id, submenu_id, db)
+    return handlers.deleted("submenu")
+
+
+async def get_dishes_filtered(*args):
+    try:
+        return await crud_async.get_dishes_filtered(*args)
+    except ValueError:
+        return handlers.invalid_cursor()
+
+
+@router.get(
+    "/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes",
+    response_model=Union[list[schemas.Dish], schemas.DishPage],
+    dependencies=[check_etag(crud.dishes_version_query, cache.dishes_key)],
+)
+async def get_all_dish_for_submenu(
+    menu_id: str,
+    submenu_id: str,
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=crud.MAX_PAGE_SIZE),
+    after: str | None = Query(None, regex=crud.DISH_CURSOR_REGEX),
+    min_price: Decimal | None = Query(None, ge=0),
+    max_price: Decimal | None = Query(None, ge=0),
+    sort: str = Query("id", regex=crud.DISH_SORT_REGEX),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if handlers.whole_dish_list(limit, after, min_price, max_price, sort):
+        entry = snapshot.lookup(cache.dishes_key(menu_id, submenu_id))
+        if entry is not None:
+            return snapshot.respond(entry)
+        if responses.fast_json_enabled():
+            rows = await crud_async.cached_get_all_dishes_rows(
+                menu_id, submenu_id, db
+            )
+            return responses.fast_list(rows, response)
+        return await crud_async.cached_get_all_dishes(menu_id, submenu_id, db)
+    return await get_dishes_filtered(
+        menu_id,
+        submenu_id,
+        min_price,
+        max_price,
+        sort,
+        handlers.dish_page_size(limit, after),
+        after,
+        db,
+    )
+
+
+@router.get("/api/v1/dishes", response_model=schemas.DishPage)
+async def get_all_dishes(
+    limit: int = Query(crud.PAGE_SIZE, ge=1, le=crud.MAX_PAGE_SIZE),
+    after: str | None = Query(None, regex=crud.DISH_CURSOR_REGEX),
+    min_price: Decimal | None = Query(None, ge=0),
+    max_price: Decimal | None = Query(None, ge=0),
+    sort: str = Query("id", regex=crud.DISH_SORT_REGEX),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await get_dishes_filtered(
+        None, None, min_price, max_price, sort, limit, after, db
+    )
+
+
+# Блюда разных подменю (например, корзина заказа) одним запросом
+@router.post("/api/v1/dishes/batch", response_model=schemas.DishBatch)
+async def get_dishes_by_ids(
+    batch: schemas.BatchIds, db: AsyncSession = Depends(get_async_db)
+):
+    return await crud_async.get_dishes_by_ids(batch.ids, db)
+
+
+# Полнотекстовый поиск по названиям и описаниям всего каталога
+@router.get("/api/v1/search", response_model=schemas.SearchPage)
+async def search_catalog(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(crud.PAGE_SIZE, ge=1, le=crud.MAX_PAGE_SIZE),
+    after: str | None = Query(None, regex=crud.SEARCH_CURSOR_REGEX),
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await crud_async.search_catalog(q, limit, after, db)
+
+
+@router.get(
+    "/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}",
+    response_model=schemas.Dish,
+    dependencies=[check_etag(crud.dish_version_query, cache.dish_key)],
+)
+async def get_dish_for_menu_by_id(
+    menu_id: str,
+    submenu_id: str,
+    dish_id: str,
+    db: AsyncSession = Depends(get_async_db),
+):
+    entry = snapshot.lookup(cache.dish_key(menu_id, submenu_id, dish_id))
+    if entry is not None:
+        return snapshot.respond(entry)
+    dish_db = await crud_async.cached_get_dish_by_id(
+        menu_id, submenu_id, dish_id, db
+    )
+
+    if dish_db is None:
+        return handlers.not_found("dish")
+
+    return dish_db
+
+
+@router.post(
+    "/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes",
+    response_model=schemas.Dish,
+    status_code=201,
+)
+async def create_dish(
+    menu_id: str,
+    submenu_id: str,
+    dish: schemas.DishBase,
+    db: AsyncSession = Depends(get_async_db),
+):
+    dish_db = await crud_async.create_dish(menu_id, submenu_id, dish, db)
+
+    if dish_db is None:
+        return handlers.not_found("submenu")
+
+    return dish_db
+
+
+@router.patch(
+    "/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}",
+    response_model=schemas.Dish,
+)
+async def update_dish(
+    menu_id: str,
+    submenu_id: str,
+    dish_id: str,
+    new_dish: schemas.DishBase,
+    db: AsyncSession = Depends(get_async_db),
+):
+    dish_db = await crud_async.get_dish_by_id(menu_id, submenu_id, dish_id, db)
+
+    if dish_db is None:
+        return handlers.not_found("dish")
+
+    dish_db = await crud_async.update_dish(dish_db, new_dish, db)
+    return dish_db
+
+
+@router.delete(
+    "/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}"
+)
+async def delete_dish(
+    menu_id: str,
+    submenu_id: str,
+    dish_id: str,
+    db: AsyncSession = Depends(get_async_db),
+):
+    await crud_async.delete_dish(menu_id, submenu_id, dish_id, db)
+    return handlers.deleted("dish")
@@ -0,0 +1,295 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable
+
+from starlette.concurrency import run_in_threadpool
+
+from menu.dependencies import get_cache_settings
+
+
+class CacheBackend:
+    # Сетевой бэкенд: из асинхронного кода вызывается в пуле потоков,
+    # чтобы не блокировать цикл событий
+    blocking = False
+
+    def get(self, key: str) -> Any | None:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any) -> None:
+        raise NotImplementedError
+
+    def delete(self, *keys: str) -> None:
+        raise NotImplementedError
+
+    def delete_prefix(self, prefix: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+# Кэш выключен: всегда промах, инвалидация ничего не делает
+class NullCache(CacheBackend):
+    def get(self, key: str) -> Any | None:
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def delete(self, *keys: str) -> None:
+        pass
+
+    def delete_prefix(self, prefix: str) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+# LRU в памяти процесса с ограничением по размеру и времени жизни записей
+class MemoryCache(CacheBackend):
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+# Бэкенд поверх клиента с протоколом Redis (get/set/delete/scan_iter),
+# значения хранятся в JSON
+class RedisCache(CacheBackend):
+    blocking = True
+
+    def __init__(self, client, ttl: float = 60.0, prefix: str = "menu:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Any | None:
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    def set(self, key: str, value: Any) -> None:
+        self.client.set(
+            self.prefix + key, json.dumps(value), ex=max(1, int(self.ttl))
+        )
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def delete_prefix(self, prefix: str) -> None:
+        keys = list(self.client.scan_iter(match=self.prefix + prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def clear(self) -> None:
+        self.delete_prefix("")
+
+
+def create_backend() -> CacheBackend:
+    settings = get_cache_settings()
+    if settings.backend == "memory":
+        return MemoryCache(maxsize=settings.maxsize, ttl=settings.ttl)
+    if settings.backend == "redis":
+        from redis import Redis
+
+        return RedisCache(Redis.from_url(settings.redis_url), ttl=settings.ttl)
+    return NullCache()
+
+
+_backend: CacheBackend | None = None
+
+
+def get_backend() -> CacheBackend:
+    global _backend
+    if _backend is None:
+        _backend = create_backend()
+    return _backend
+
+
+# Подмена бэкенда (например, в тестах)
+def set_backend(backend: CacheBackend) -> None:
+    global _backend
+    _backend = backend
+
+
+# Ключи повторяют структуру URL, поэтому поддерево сущности
+# удаляется по префиксу "<ключ>:". Числовые id приводятся к int
+# ("01" и "1" — одна запись), остальные не совпадают ни с одной строкой
+# БД и остаются как есть.
+def _id(value) -> str:
+    if isinstance(value, str) and value.isascii() and value.isdigit():
+        return str(int(value))
+    return str(value)
+
+
+def menus_key() -> str:
+    return "menus"
+
+
+def menu_key(menu_id) -> str:
+    return f"menus:{_id(menu_id)}"
+
+
+def submenus_key(menu_id) -> str:
+    return f"{menu_key(menu_id)}:submenus"
+
+
+def submenu_key(menu_id, submenu_id) -> str:
+    return f"{submenus_key(menu_id)}:{_id(submenu_id)}"
+
+
+def dishes_key(menu_id, submenu_id) -> str:
+    return f"{submenu_key(menu_id, submenu_id)}:dishes"
+
+
+def dish_key(menu_id, submenu_id, dish_id) -> str:
+    return f"{dishes_key(menu_id, submenu_id)}:{_id(dish_id)}"
+
+
+# Подписчики на изменения данных (menu/snapshot.py) получают
+# инвалидированные ключи и корни удалённых поддеревьев
+_subscribers: list[Callable[[tuple[str, ...], tuple[str, ...]], None]] = []
+
+
+def subscribe(callback) -> None:
+    _subscribers.append(callback)
+
+
+def unsubscribe(callback) -> None:
+    _subscribers.remove(callback)
+
+
+def _notify(keys: tuple[str, ...], trees: tuple[str, ...]) -> None:
+    for callback in _subscribers:
+        callback(keys, trees)
+
+
+def invalidate(*keys: str) -> None:
+    get_backend().delete(*keys)
+    _notify(keys, ())
+
+
+def invalidate_tree(key: str) -> None:
+    backend = get_backend()
+    backend.delete(key)
+    backend.delete_prefix(key + ":")
+    _notify((), (key,))
+
+
+# То же для crud_async: бэкенд и подписчики вызываются в пуле потоков
+async def invalidate_async(*keys: str) -> None:
+    await run_in_threadpool(invalidate, *keys)
+
+
+async def invalidate_tree_async(key: str) -> None:
+    await run_in_threadpool(invalidate_tree, key)
+
+
+def _serialize(res, schema, many: bool):
+    if schema is None:
+        return res
+    if many:
+        return [schema.from_orm(item).dict() for item in res]
+    return schema.from_orm(res).dict()
+
+
+# Чтение через кэш для функций crud вида f(*ids, db).
+# В кэш кладётся сериализованная схема (без схемы — сам результат),
+# None (не найдено) не кэшируется. Результат чтения из отстающей
+# реплики тоже не кэшируется: сразу после инвалидации реплика может
+# вернуть старые данные, и они остались бы в кэше до конца TTL.
+def read_through(
+    key_func: Callable[..., str], schema=None, many: bool = False
+):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args):
+            key = key_func(*args[:-1])
+            backend = get_backend()
+            value = backend.get(key)
+            if value is not None:
+                return value
+
+            res = func(*args)
+            if res is None:
+                return None
+            value = _serialize(res, schema, many)
+            if not args[-1].info.get("lagging"):
+                backend.set(key, value)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+# То же для асинхронных функций crud_async. Асинхронный режим читает
+# только основную БД, поэтому проверки отстающей реплики здесь нет.
+def read_through_async(
+    key_func: Callable[..., str], schema=None, many: bool = False
+):
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args):
+            key = key_func(*args[:-1])
+            backend = get_backend()
+            if backend.blocking:
+                value = await run_in_threadpool(backend.get, key)
+            else:
+                value = backend.get(key)
+            if value is not None:
+                return value
+
+            res = await func(*args)
+            if res is None:
+                return None
+            value = _serialize(res, schema, many)
+            if backend.blocking:
+                await run_in_threadpool(backend.set, key, value)
+            else:
+                backend.set(key, value)
+            return value
+
+        return wrapper
+
+    return decorator
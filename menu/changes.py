@@ -0,0 +1,162 @@
+import asyncio
+import json
+import threading
+from collections import deque
+from itertools import islice
+from typing import AsyncIterator, NamedTuple
+
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+# Лента изменений каталога: crud после фиксации записи публикует событие
+# с порядковым номером, события хранятся в кольцевом буфере процесса.
+# Подписчики ждут одного общего future, который публикация завершает
+# и заменяет новым, поэтому простаивающий подписчик — это только корутина.
+# Номера событий и буфер свои у каждого процесса: с несколькими воркерами
+# клиент пропускал бы записи других воркеров, поэтому лента работает
+# только с одним воркером (menu.main.create_app).
+
+
+class Event(NamedTuple):
+    seq: int
+    type: str
+    kind: str
+    id: str | None
+    menu_id: str | None
+    submenu_id: str | None
+
+    def encode(self) -> bytes:
+        data = json.dumps(self._asdict(), separators=(",", ":"))
+        return f"id: {self.seq}\nevent: {self.type}\ndata: {data}\n\n".encode()
+
+
+class ChangeFeed:
+    def __init__(self, size: int = 1000):
+        self.seq = 0
+        # Событие хранится вместе с готовым текстом SSE, который
+        # одинаков для всех подписчиков
+        self._events: deque[tuple[Event, bytes]] = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._next: asyncio.Future | None = None
+
+    # Может вызываться из потоков пула (синхронные обработчики), поэтому
+    # подписчики будятся через цикл событий, в котором они ждут
+    def publish(
+        self,
+        event_type: str,
+        kind: str,
+        entity_id=None,
+        menu_id=None,
+        submenu_id=None,
+    ) -> Event:
+        with self._lock:
+            self.seq += 1
+            event = Event(
+                self.seq,
+                event_type,
+                kind,
+                None if entity_id is None else str(entity_id),
+                None if menu_id is None else str(menu_id),
+                None if submenu_id is None else str(submenu_id),
+            )
+            self._events.append((event, event.encode()))
+            loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wake)
+        return event
+
+    def _wake(self) -> None:
+        if self._next is not None and not self._next.done():
+            self._next.set_result(None)
+        self._next = None
+
+    # События после after; None — в буфере уже нет части пропущенных
+    # событий (или номер из другого запуска процесса), клиент должен
+    # перечитать каталог
+    def since(self, after: int) -> list[Event] | None:
+        entries = self._entries(after)
+        return None if entries is None else [event for event, _ in entries]
+
+    def _entries(self, after: int) -> list[tuple[Event, bytes]] | None:
+        with self._lock:
+            if after > self.seq:
+                return None
+            if not self._events:
+                return []
+            first = self._events[0][0].seq
+            if after < first - 1:
+                return None
+            return list(islice(self._events, after - first + 1, None))
+
+    async def wait(self, after: int, timeout: float) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.seq > after:
+                return
+            if self._next is None or self._loop is not loop:
+                self._loop = loop
+                self._next = loop.create_future()
+            future = self._next
+        # Общий future защищён от отмены по тайм-ауту одного подписчика
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def stream(
+        self, after: int, heartbeat: float = 15.0
+    ) -> AsyncIterator[bytes]:
+        # Первая строка сразу отправляет заголовки ответа
+        yield b"retry: 3000\n\n"
+        while True:
+            entries = self._entries(after)
+            if entries is None:
+                after = self.seq
+                yield f"id: {after}\nevent: reset\ndata: {{}}\n\n".encode()
+                continue
+            if entries:
+                yield b"".join(data for _, data in entries)
+                after = entries[-1][0].seq
+                continue
+            await self.wait(after, heartbeat)
+            if self.seq == after:
+                yield b": keepalive\n\n"
+
+
+# None — лента отключена: события не хранятся, /api/v1/changes отвечает 404
+feed: ChangeFeed | None = ChangeFeed()
+
+
+def configure(size: int, enabled: bool = True) -> None:
+    global feed
+    feed = ChangeFeed(size) if enabled else None
+
+
+# Событие create, update или delete для menu, submenu, dish или
+# catalog (загрузка каталога целиком)
+def publish(
+    event_type: str, kind: str, entity_id=None, menu_id=None, submenu_id=None
+) -> Event | None:
+    if feed is None:
+        return None
+    return feed.publish(event_type, kind, entity_id, menu_id, submenu_id)
+
+
+def parse_last_event_id(value: str | None) -> int | None:
+    if value is None or not value.isdecimal():
+        return None
+    return int(value)
+
+
+def respond(after: int | None, heartbeat: float) -> Response:
+    if feed is None:
+        return JSONResponse(
+            status_code=404, content={"detail": "change feed disabled"}
+        )
+    if after is None:
+        after = feed.seq
+    return StreamingResponse(
+        feed.stream(after, heartbeat),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
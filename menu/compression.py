@@ -0,0 +1,175 @@
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+# brotli из extras compression: без него сжатие выполняется только gzip
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def available_encodings() -> tuple[str, ...]:
+    if _brotli() is not None:
+        return ("br", "gzip")
+    return ("gzip",)
+
+
+# Выбор кодировки по Accept-Encoding с учётом q-значений,
+# при равном весе предпочтение отдаётся brotli
+def negotiate(accept_encoding: str) -> str | None:
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in available_encodings():
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+class GzipEncoder:
+    def __init__(self, level: int = 6):
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+class BrotliEncoder:
+    def __init__(self, quality: int = 4):
+        self._obj = _brotli().Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+# Сжатие ответов не меньше minimum_size байт. Потоковые ответы
+# (выгрузка каталога) сжимаются по частям, каждая часть сразу
+# отправляется клиенту.
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def encoder(self, encoding: str):
+        if encoding == "br":
+            return BrotliEncoder(self.brotli_quality)
+        return GzipEncoder(self.gzip_level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            encoding = negotiate(headers.get("accept-encoding", ""))
+            if encoding is not None:
+                responder = _Responder(self, encoding)
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+class _Responder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.encoder = None
+        self.send: Send | None = None
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.middleware.app(scope, receive, self.send_compressed)
+
+    def start_encoding(self, streaming: bool) -> MutableHeaders:
+        self.encoder = self.middleware.encoder(self.encoding)
+        headers = MutableHeaders(raw=self.initial_message["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if streaming:
+            del headers["Content-Length"]
+        return headers
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Заголовки отправляются вместе с первой частью тела,
+            # когда уже известно, нужно ли сжатие
+            self.initial_message = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = "content-encoding" in headers
+            return
+
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            self.started = True
+            if self.passthrough or (
+                len(body) < self.middleware.minimum_size and not more_body
+            ):
+                self.passthrough = True
+                await self.send(self.initial_message)
+                await self.send(message)
+                return
+
+            headers = self.start_encoding(streaming=more_body)
+            if more_body:
+                body = self.encoder.compress(body) + self.encoder.flush()
+            else:
+                body = self.encoder.compress(body) + self.encoder.finish()
+                headers["Content-Length"] = str(len(body))
+            await self.send(self.initial_message)
+            await self.send({**message, "body": body})
+            return
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        if more_body:
+            body = self.encoder.compress(body) + self.encoder.flush()
+        else:
+            body = self.encoder.compress(body) + self.encoder.finish()
+        await self.send({**message, "body": body})
@@ -1,17 +1,62 @@
-from sqlalchemy.orm import Session
-
-from menu import models, schemas
+from datetime import datetime
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal
+
+from sqlalchemy import (
+    DateTime,
+    String,
+    and_,
+    cast,
+    delete,
+    false,
+    func,
+    insert,
+    literal,
+    null,
+    or_,
+    select,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy.orm import Session, selectinload
+
+from menu import cache, changes, etag, models, schemas, search
+
+
+# Размер страницы по умолчанию и максимальный при постраничной выдаче
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
 
 
 def get_all_menu(db: Session) -> list[schemas.MenuBase]:
-    res = db.query(models.Menu).all()
+    res = db.query(models.Menu).order_by(models.Menu.id).all()
     return res
 
 
+def get_menu_page(limit: int, after: int | None, db: Session):
+    return _get_page(db.query(models.Menu), models.Menu, limit, after)
+
+
 def get_menu_by_id(menu_id: str, db: Session) -> schemas.Menu:
     return db.query(models.Menu).filter(models.Menu.id == menu_id).first()
 
 
+# Дерево меню загружается тремя запросами (меню, подменю, блюда)
+# независимо от их количества
+def _menu_tree_query(db: Session):
+    return db.query(models.Menu).options(
+        selectinload(models.Menu.submenu).selectinload(models.Submenu.dishes)
+    )
+
+
+def get_menu_tree(db: Session):
+    return _menu_tree_query(db).order_by(models.Menu.id).all()
+
+
+def get_menu_tree_by_id(menu_id: str, db: Session):
+    return _menu_tree_query(db).filter(models.Menu.id == menu_id).first()
+
+
 def create_menu(menu: schemas.MenuBase, db: Session) -> schemas.Menu:
     menu_db = models.Menu(
         title=menu.title,
@@ -20,30 +65,55 @@ def create_menu(menu: schemas.MenuBase, db: Session) -> schemas.Menu:
         dishes_count=0,
     )
     db.add(menu_db)
+    db.flush()
+    db.execute(search.add([menu_document(menu_db)]))
     db.commit()
+    cache.invalidate(cache.menus_key())
+    changes.publish("create", "menu", menu_db.id, menu_db.id)
     return menu_db
 
 
 def delete_menu(menu_id: str, db: Session) -> None:
-    menu_db = get_menu_by_id(menu_id, db)
-    db.delete(menu_db)
+    for statement in delete_menu_statements(menu_id):
+        res = db.execute(statement)
     db.commit()
+    cache.invalidate(cache.menus_key())
+    cache.invalidate_tree(cache.menu_key(menu_id))
+    if res.rowcount:
+        changes.publish("delete", "menu", menu_id, menu_id)
 
 
 def update_menu(
     old_menu: schemas.Menu, new_menu: schemas.MenuBase, db: Session
 ) -> schemas.MenuBase:
     old_menu.title, old_menu.description = new_menu.title, new_menu.description
+    old_menu.version = models.Menu.version + 1
     db.add(old_menu)
+    for statement in search.replace(menu_document(old_menu)):
+        db.execute(statement)
     db.commit()
+    cache.invalidate(cache.menus_key(), cache.menu_key(old_menu.id))
+    changes.publish("update", "menu", old_menu.id, old_menu.id)
     return old_menu
 
 
 def get_all_submenu(menu_id: str, db: Session):
-    res = db.query(models.Submenu).filter(models.Submenu.menu_id == menu_id).all()
+    res = (
+        db.query(models.Submenu)
+        .filter(models.Submenu.menu_id == menu_id)
+        .order_by(models.Submenu.id)
+        .all()
+    )
     return res
 
 
+def get_submenu_page(
+    menu_id: str, limit: int, after: int | None, db: Session
+):
+    query = db.query(models.Submenu).filter(models.Submenu.menu_id == menu_id)
+    return _get_page(query, models.Submenu, limit, after)
+
+
 def get_submenu_by_id(menu_id: str, submenu_id: str, db: Session):
     res = (
         db.query(models.Submenu)
@@ -63,11 +133,18 @@ def create_submenu(menu_id: str, submenu: schemas.SubmenuBase, db: Session):
     )
     db.add(submenu_db)
 
-    menu_db = get_menu_by_id(menu_id, db)
-    menu_db.submenus_count += 1
-    db.add(menu_db)
+    res = db.execute(menu_counters(menu_id, submenus=1))
+    if res.rowcount == 0:
+        db.rollback()
+        return None
+    db.flush()
+    db.execute(search.add([submenu_document(submenu_db)]))
 
     db.commit()
+    cache.invalidate(
+        cache.menus_key(), cache.menu_key(menu_id), cache.submenus_key(menu_id)
+    )
+    changes.publish("create", "submenu", submenu_db.id, menu_id)
 
     return submenu_db
 
@@ -79,22 +156,31 @@ def update_submenu(
         new_submenu.title,
         new_submenu.description,
     )
+    old_submenu.version = models.Submenu.version + 1
     db.add(old_submenu)
+    db.execute(menu_counters(old_submenu.menu_id))
+    for statement in search.replace(submenu_document(old_submenu)):
+        db.execute(statement)
     db.commit()
+    cache.invalidate(
+        cache.submenus_key(old_submenu.menu_id),
+        cache.submenu_key(old_submenu.menu_id, old_submenu.id),
+    )
+    changes.publish("update", "submenu", old_submenu.id, old_submenu.menu_id)
     return old_submenu
 
 
 def delete_submenu(menu_id: str, submenu_id: str, db: Session):
-    submenu_db = get_submenu_by_id(menu_id, submenu_id, db)
-
-    menu_db = get_menu_by_id(menu_id, db)
-    menu_db.submenus_count -= 1
-    menu_db.dishes_count -= submenu_db.dishes_count
-
-    db.add(menu_db)
-    db.delete(submenu_db)
+    for statement in delete_submenu_statements(menu_id, submenu_id):
+        res = db.execute(statement)
 
     db.commit()
+    cache.invalidate(
+        cache.menus_key(), cache.menu_key(menu_id), cache.submenus_key(menu_id)
+    )
+    cache.invalidate_tree(cache.submenu_key(menu_id, submenu_id))
+    if res.rowcount:
+        changes.publish("delete", "submenu", submenu_id, menu_id)
 
 
 def get_all_dishes(menu_id: str, submenu_id: str, db: Session):
@@ -102,11 +188,87 @@ def get_all_dishes(menu_id: str, submenu_id: str, db: Session):
         db.query(models.Dish)
         .filter(models.Dish.submenu_id == submenu_id)
         .filter(models.Dish.menu_id == menu_id)
+        .order_by(models.Dish.id)
         .all()
     )
     return res
 
 
+# Курсор блюд: id или при sort=price "цена в копейках:id"
+DISH_CURSOR_REGEX = r"^\d+(:\d+)?$"
+DISH_SORT_REGEX = "^(id|price)$"
+
+# Сортировки списка блюд и курсор следующей страницы для каждой из них
+DISH_SORTS = {
+    "id": (
+        (models.Dish.id,),
+        lambda dish: str(dish.id),
+    ),
+    "price": (
+        (models.Dish.price_cents, models.Dish.id),
+        lambda dish: f"{dish.price_cents}:{dish.id}",
+    ),
+}
+
+
+# Границы цены в копейках: нижняя округляется вверх, верхняя вниз
+def price_bound(price: Decimal, rounding: str) -> int:
+    return int((price * 100).to_integral_value(rounding))
+
+
+# Курсор "id" или "копейки:id" в значения столбцов сортировки
+def parse_dish_cursor(after: str, sort: str) -> tuple[int, ...]:
+    values = tuple(int(value) for value in after.split(":"))
+    if len(values) != len(DISH_SORTS[sort][0]):
+        raise ValueError("invalid cursor")
+    return values
+
+
+# Список блюд (одного подменю или всех меню) с фильтром по цене
+# и сортировкой в SQL. Без limit возвращается весь список.
+def get_dishes_filtered(
+    menu_id: str | None,
+    submenu_id: str | None,
+    min_price: Decimal | None,
+    max_price: Decimal | None,
+    sort: str,
+    limit: int | None,
+    after: str | None,
+    db: Session,
+):
+    columns, cursor = DISH_SORTS[sort]
+    query = db.query(models.Dish)
+    if menu_id is not None:
+        query = query.filter(models.Dish.menu_id == menu_id)
+    if submenu_id is not None:
+        query = query.filter(models.Dish.submenu_id == submenu_id)
+    if min_price is not None:
+        query = query.filter(
+            models.Dish.price_cents >= price_bound(min_price, ROUND_CEILING)
+        )
+    if max_price is not None:
+        query = query.filter(
+            models.Dish.price_cents <= price_bound(max_price, ROUND_FLOOR)
+        )
+    if sort == "price":
+        query = query.filter(models.Dish.price_cents.is_not(None))
+    if after is not None:
+        query = query.filter(
+            tuple_(*columns) > tuple_(*parse_dish_cursor(after, sort))
+        )
+    query = query.order_by(*columns)
+
+    if limit is None:
+        return query.all()
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = cursor(rows[-1])
+    return {"items": rows, "next_cursor": next_cursor}
+
+
 def get_dish_by_id(menu_id: str, submenu_id: str, dish_id: str, db: Session):
     res = (
         db.query(models.Dish)
@@ -125,20 +287,23 @@ def create_dish(
         title=dish.title,
         description=dish.description,
         price=dish.price,
+        price_cents=schemas.price_to_cents(dish.price),
         menu_id=menu_id,
         submenu_id=submenu_id,
     )
     db.add(dish_db)
 
-    menu_db = get_menu_by_id(menu_id, db)
-    menu_db.dishes_count += 1
-    db.add(menu_db)
-
-    submenu_db = get_submenu_by_id(menu_id, submenu_id, db)
-    submenu_db.dishes_count += 1
-    db.add(submenu_db)
+    res = db.execute(submenu_counters(menu_id, submenu_id, dishes=1))
+    if res.rowcount == 0:
+        db.rollback()
+        return None
+    db.execute(menu_counters(menu_id, dishes=1))
+    db.flush()
+    db.execute(search.add([dish_document(dish_db)]))
 
     db.commit()
+    _invalidate_dish_parents(menu_id, submenu_id)
+    changes.publish("create", "dish", dish_db.id, menu_id, submenu_id)
 
     return dish_db
 
@@ -153,21 +318,696 @@ def update_dish(
         new_dish.description,
         new_dish.price,
     )
+    old_dish.price_cents = schemas.price_to_cents(new_dish.price)
+    old_dish.version = models.Dish.version + 1
     db.add(old_dish)
+    db.execute(submenu_counters(old_dish.menu_id, old_dish.submenu_id))
+    db.execute(menu_counters(old_dish.menu_id))
+    for statement in search.replace(dish_document(old_dish)):
+        db.execute(statement)
     db.commit()
+    cache.invalidate(
+        cache.dishes_key(old_dish.menu_id, old_dish.submenu_id),
+        cache.dish_key(old_dish.menu_id, old_dish.submenu_id, old_dish.id),
+    )
+    changes.publish(
+        "update", "dish", old_dish.id, old_dish.menu_id, old_dish.submenu_id
+    )
     return old_dish
 
 
 def delete_dish(menu_id: str, submenu_id: str, dish_id: str, db: Session):
-    dish_db = get_dish_by_id(menu_id, submenu_id, dish_id, db)
-    db.delete(dish_db)
+    res = db.execute(
+        delete(models.Dish)
+        .filter(models.Dish.submenu_id == submenu_id)
+        .filter(models.Dish.menu_id == menu_id)
+        .filter(models.Dish.id == dish_id)
+        .execution_options(synchronize_session=False)
+    )
+    if res.rowcount:
+        db.execute(submenu_counters(menu_id, submenu_id, dishes=-1))
+        db.execute(menu_counters(menu_id, dishes=-1))
+        db.execute(search.remove_dish(dish_id))
+        db.execute(dish_tombstone(menu_id, submenu_id, dish_id))
 
-    menu_db = get_menu_by_id(menu_id, db)
-    menu_db.dishes_count -= 1
-    db.add(menu_db)
+    db.commit()
+    _invalidate_dish_parents(menu_id, submenu_id)
+    cache.invalidate(cache.dish_key(menu_id, submenu_id, dish_id))
+    if res.rowcount:
+        changes.publish("delete", "dish", dish_id, menu_id, submenu_id)
+
+
+# Счётчики меняются одним UPDATE на стороне БД (x = x + n) в транзакции
+# записи, без предварительного чтения строки и потери обновлений
+# при параллельных запросах. Вместе с ними растёт версия родителя,
+# поэтому без изменения счётчиков эти выражения просто поднимают версию.
+def menu_counters(menu_id: str, submenus=0, dishes=0):
+    return (
+        update(models.Menu)
+        .filter(models.Menu.id == menu_id)
+        .values(
+            submenus_count=models.Menu.submenus_count + submenus,
+            dishes_count=models.Menu.dishes_count + dishes,
+            version=models.Menu.version + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def submenu_counters(menu_id: str, submenu_id: str, dishes=0):
+    return (
+        update(models.Submenu)
+        .filter(models.Submenu.menu_id == menu_id)
+        .filter(models.Submenu.id == submenu_id)
+        .values(
+            dishes_count=models.Submenu.dishes_count + dishes,
+            version=models.Submenu.version + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+# Число блюд подменю вычитается из меню подзапросом до удаления подменю
+def delete_submenu_statements(menu_id: str, submenu_id: str):
+    submenu_dishes = (
+        select(models.Submenu.dishes_count)
+        .filter(models.Submenu.menu_id == menu_id)
+        .filter(models.Submenu.id == submenu_id)
+        .scalar_subquery()
+    )
+    return (
+        menu_counters(menu_id, submenus=-1, dishes=-submenu_dishes).filter(
+            submenu_dishes.isnot(None)
+        ),
+        search.remove_submenu(menu_id, submenu_id),
+        tombstone(
+            "submenu",
+            models.Submenu,
+            models.Submenu.menu_id == menu_id,
+            models.Submenu.id == submenu_id,
+        ),
+        delete(models.Dish)
+        .filter(models.Dish.menu_id == menu_id)
+        .filter(models.Dish.submenu_id == submenu_id)
+        .execution_options(synchronize_session=False),
+        delete(models.Submenu)
+        .filter(models.Submenu.menu_id == menu_id)
+        .filter(models.Submenu.id == submenu_id)
+        .execution_options(synchronize_session=False),
+    )
+
+
+# Запись об удалении строки model, отобранной criteria. Вставляется
+# до её DELETE и только если строка ещё есть (INSERT ... SELECT), поэтому
+# повторное удаление записи не добавляет.
+def tombstone(kind: str, model, *criteria):
+    menu_id = model.id if model is models.Menu else model.menu_id
+    submenu_id = model.submenu_id if model is models.Dish else null()
+    return insert(models.Tombstone).from_select(
+        ["kind", "entity_id", "menu_id", "submenu_id", "deleted_at"],
+        select(
+            literal(kind),
+            model.id,
+            menu_id,
+            submenu_id,
+            literal(datetime.utcnow(), DateTime),
+        ).filter(*criteria),
+    )
+
+
+# Блюдо к этому моменту уже удалено, поэтому запись вставляется по id
+def dish_tombstone(menu_id: str, submenu_id: str, dish_id: str):
+    return insert(models.Tombstone).values(
+        kind="dish",
+        entity_id=dish_id,
+        menu_id=menu_id,
+        submenu_id=submenu_id,
+        deleted_at=datetime.utcnow(),
+    )
+
+
+# Выборка по списку id одним запросом WHERE id IN (...). Нечисловые id
+# в запрос не попадают и сразу считаются ненайденными.
+def _batch_key(entity_id: str) -> int | None:
+    if entity_id.isdecimal() and len(entity_id) <= 18:
+        return int(entity_id)
+    return None
+
+
+def batch_query(model, ids: list[str]):
+    keys = {_batch_key(entity_id) for entity_id in ids} - {None}
+    return select(model).filter(model.id.in_(keys))
+
+
+def batch_result(ids: list[str], rows) -> dict:
+    found = {row.id: row for row in rows}
+    items, not_found, seen = [], [], set()
+    for entity_id in ids:
+        if entity_id in seen:
+            continue
+        seen.add(entity_id)
+        row = found.get(_batch_key(entity_id))
+        if row is None:
+            not_found.append(entity_id)
+        else:
+            items.append(row)
+    return {"items": items, "not_found": not_found}
 
-    submenu_db = get_submenu_by_id(menu_id, submenu_id, db)
-    submenu_db.dishes_count -= 1
-    db.add(submenu_db)
+
+def get_menus_by_ids(ids: list[str], db: Session) -> dict:
+    rows = db.scalars(batch_query(models.Menu, ids)).all()
+    return batch_result(ids, rows)
+
+
+def get_submenus_by_ids(ids: list[str], db: Session) -> dict:
+    rows = db.scalars(batch_query(models.Submenu, ids)).all()
+    return batch_result(ids, rows)
+
+
+def get_dishes_by_ids(ids: list[str], db: Session) -> dict:
+    rows = db.scalars(batch_query(models.Dish, ids)).all()
+    return batch_result(ids, rows)
+
+
+# Строки поискового индекса (menu/search.py) для записей каталога
+def menu_document(menu: models.Menu) -> dict:
+    return search.document(
+        "menu", menu.id, menu.id, None, menu.title, menu.description
+    )
+
+
+def submenu_document(submenu: models.Submenu) -> dict:
+    return search.document(
+        "submenu",
+        submenu.id,
+        submenu.menu_id,
+        None,
+        submenu.title,
+        submenu.description,
+    )
+
+
+def dish_document(dish: models.Dish) -> dict:
+    return search.document(
+        "dish",
+        dish.id,
+        dish.menu_id,
+        dish.submenu_id,
+        dish.title,
+        dish.description,
+    )
+
+
+SEARCH_CURSOR_REGEX = r"^\d+$"
+
+
+# Результаты упорядочены по релевантности, курсор — число уже выданных
+# результатов. Ранжируются только строки, совпавшие с запросом по индексу.
+def search_catalog(query: str, limit: int, after: str | None, db: Session):
+    words = search.terms(query)
+    if not words:
+        return {"items": [], "next_cursor": None}
+
+    offset = int(after or 0)
+    statement, match = search.search_statement(
+        db.get_bind().dialect.name, words
+    )
+    rows = (
+        db.execute(
+            statement,
+            {"query": match, "limit": limit + 1, "offset": offset},
+        )
+        .mappings()
+        .all()
+    )
+    items = [
+        {
+            "kind": row["kind"],
+            "id": row["entity_id"],
+            "menu_id": row["menu_id"],
+            "submenu_id": row["submenu_id"],
+            "title": row["title"],
+            "description": row["description"],
+            "score": row["score"],
+        }
+        for row in rows[:limit]
+    ]
+    next_cursor = str(offset + limit) if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+# Меню удаляется вместе с потомками несколькими DELETE по menu_id,
+# число запросов не зависит от размера меню. Счётчики родителей
+# не меняются: у меню их нет.
+def delete_menu_statements(menu_id: str):
+    return (
+        search.remove_menu(menu_id),
+        tombstone("menu", models.Menu, models.Menu.id == menu_id),
+        delete(models.Dish)
+        .filter(models.Dish.menu_id == menu_id)
+        .execution_options(synchronize_session=False),
+        delete(models.Submenu)
+        .filter(models.Submenu.menu_id == menu_id)
+        .execution_options(synchronize_session=False),
+        delete(models.Menu)
+        .filter(models.Menu.id == menu_id)
+        .execution_options(synchronize_session=False),
+    )
+
+
+# ETag списка строится из числа строк, суммы версий и максимального id,
+# ETag сущности из id и версии. Запрос читает только эти значения.
+# SQLite выдаёт id удалённой последней строки повторно, поэтому к обоим
+# добавляется последняя запись об удалении самой сущности, её предков
+# и потомков: иначе после удаления и повторного создания ETag совпал бы
+# с прежним. Список меняется вместе с родителем (для списка меню — весь
+# каталог). Другие удаления в ETag не входят: снимок их не перечитывает.
+def deleted_query(
+    menu_id: str | None = None,
+    submenu_id: str | None = None,
+    dish_id: str | None = None,
+):
+    tombstone = models.Tombstone
+    query = select(func.coalesce(func.max(tombstone.id), 0))
+    if menu_id is not None:
+        query = query.filter(tombstone.menu_id == menu_id)
+    if submenu_id is not None:
+        query = query.filter(
+            or_(
+                tombstone.kind == "menu",
+                and_(
+                    tombstone.kind == "submenu",
+                    tombstone.entity_id == submenu_id,
+                ),
+                tombstone.submenu_id == submenu_id,
+            )
+        )
+    if dish_id is not None:
+        query = query.filter(
+            or_(tombstone.kind != "dish", tombstone.entity_id == dish_id)
+        )
+    return query.scalar_subquery()
+
+
+def _list_version_query(model, deleted, *criteria):
+    return select(
+        func.count(model.id),
+        func.coalesce(func.sum(model.version), 0),
+        func.coalesce(func.max(model.id), 0),
+        deleted,
+    ).filter(*criteria)
+
+
+def menus_version_query():
+    return _list_version_query(models.Menu, deleted_query())
+
+
+def menu_version_query(menu_id: str):
+    return select(
+        models.Menu.id, models.Menu.version, deleted_query(menu_id)
+    ).filter(models.Menu.id == menu_id)
+
+
+def submenus_version_query(menu_id: str):
+    return _list_version_query(
+        models.Submenu,
+        deleted_query(menu_id),
+        models.Submenu.menu_id == menu_id,
+    )
+
+
+def submenu_version_query(menu_id: str, submenu_id: str):
+    return select(
+        models.Submenu.id,
+        models.Submenu.version,
+        deleted_query(menu_id, submenu_id),
+    ).filter(
+        models.Submenu.menu_id == menu_id, models.Submenu.id == submenu_id
+    )
+
+
+def dishes_version_query(menu_id: str, submenu_id: str):
+    return _list_version_query(
+        models.Dish,
+        deleted_query(menu_id, submenu_id),
+        models.Dish.menu_id == menu_id,
+        models.Dish.submenu_id == submenu_id,
+    )
+
+
+def dish_version_query(menu_id: str, submenu_id: str, dish_id: str):
+    return select(
+        models.Dish.id,
+        models.Dish.version,
+        deleted_query(menu_id, submenu_id, dish_id),
+    ).filter(
+        models.Dish.menu_id == menu_id,
+        models.Dish.submenu_id == submenu_id,
+        models.Dish.id == dish_id,
+    )
+
+
+def get_etag(query, db: Session) -> str | None:
+    row = db.execute(query).first()
+    return None if row is None else etag.make(*row)
+
+
+# Размер пачки строк в одном INSERT при массовой загрузке
+IMPORT_BATCH_SIZE = 1000
+
+
+def import_catalog(catalog: schemas.CatalogImport, db: Session) -> dict:
+    result = insert_catalog(catalog, db)
+    cache.invalidate(cache.menus_key())
+    # Одно событие на всю загрузку: клиенты перечитывают список меню
+    changes.publish("create", "catalog")
+    return result
+
+
+# Массовая загрузка каталога в одной транзакции: id выделяются заранее,
+# счётчики считаются один раз на родителя, строки вставляются пачками
+def insert_catalog(catalog: schemas.CatalogImport, db: Session) -> dict:
+    menus, submenus, dishes = [], [], []
+
+    menu_ids = _reserve_ids(models.Menu, len(catalog.menus), db)
+    submenu_ids = iter(
+        _reserve_ids(
+            models.Submenu, sum(len(m.submenus) for m in catalog.menus), db
+        )
+    )
+    dish_ids = iter(
+        _reserve_ids(
+            models.Dish,
+            sum(len(sm.dishes) for m in catalog.menus for sm in m.submenus),
+            db,
+        )
+    )
+
+    for menu, menu_id in zip(catalog.menus, menu_ids):
+        menu_dishes_count = 0
+        for submenu in menu.submenus:
+            submenu_id = next(submenu_ids)
+            for dish in submenu.dishes:
+                dishes.append(
+                    {
+                        "id": next(dish_ids),
+                        "title": dish.title,
+                        "description": dish.description,
+                        "price": dish.price,
+                        "price_cents": schemas.price_to_cents(dish.price),
+                        "menu_id": menu_id,
+                        "submenu_id": submenu_id,
+                    }
+                )
+            submenus.append(
+                {
+                    "id": submenu_id,
+                    "title": submenu.title,
+                    "description": submenu.description,
+                    "dishes_count": len(submenu.dishes),
+                    "menu_id": menu_id,
+                }
+            )
+            menu_dishes_count += len(submenu.dishes)
+        menus.append(
+            {
+                "id": menu_id,
+                "title": menu.title,
+                "description": menu.description,
+                "submenus_count": len(menu.submenus),
+                "dishes_count": menu_dishes_count,
+            }
+        )
+
+    documents = [
+        search.document(
+            kind,
+            row["id"],
+            row.get("menu_id", row["id"]),
+            row.get("submenu_id"),
+            row["title"],
+            row["description"],
+        )
+        for kind, rows in (
+            ("menu", menus),
+            ("submenu", submenus),
+            ("dish", dishes),
+        )
+        for row in rows
+    ]
+    for table, rows in (
+        (models.Menu.__table__, menus),
+        (models.Submenu.__table__, submenus),
+        (models.Dish.__table__, dishes),
+        (search.search_index, documents),
+    ):
+        for start in range(0, len(rows), IMPORT_BATCH_SIZE):
+            db.execute(
+                insert(table),
+                rows[start : start + IMPORT_BATCH_SIZE],
+            )
 
     db.commit()
+
+    return {
+        "menus": len(menus),
+        "submenus": len(submenus),
+        "dishes": len(dishes),
+    }
+
+
+# В PostgreSQL id берутся из последовательности таблицы, в SQLite
+# продолжают максимальный id. Пустой UPDATE заранее берёт блокировку
+# записи SQLite, иначе параллельные загрузки прочитают один и тот же max(id).
+def _reserve_ids(model, count: int, db: Session) -> list[int]:
+    if count == 0:
+        return []
+    table = model.__tablename__
+    if db.get_bind().dialect.name == "postgresql":
+        res = db.execute(
+            text(
+                "SELECT nextval(pg_get_serial_sequence(:table, 'id')) "
+                "FROM generate_series(1, :count)"
+            ),
+            {"table": table, "count": count},
+        )
+        return [row[0] for row in res]
+
+    db.execute(update(model).where(false()).values(id=model.id))
+    start = db.execute(select(func.coalesce(func.max(model.id), 0))).scalar()
+    return list(range(start + 1, start + count + 1))
+
+
+# Выгрузка каталога: строки читаются курсором на стороне сервера
+# пачками по EXPORT_BATCH_SIZE, в памяти держится только одна пачка
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = {
+    "menu": (
+        models.Menu,
+        (
+            "id",
+            "title",
+            "description",
+            "submenus_count",
+            "dishes_count",
+            "updated_at",
+        ),
+    ),
+    "submenu": (
+        models.Submenu,
+        (
+            "id",
+            "menu_id",
+            "title",
+            "description",
+            "dishes_count",
+            "updated_at",
+        ),
+    ),
+    "dish": (
+        models.Dish,
+        (
+            "id",
+            "menu_id",
+            "submenu_id",
+            "title",
+            "description",
+            "price",
+            "updated_at",
+        ),
+    ),
+}
+
+
+def export_query(kind: str, since: datetime | None):
+    model, columns = EXPORT_COLUMNS[kind]
+    query = select(*(getattr(model, column) for column in columns))
+    if since is not None:
+        query = query.filter(model.updated_at > since)
+    return query.order_by(model.id)
+
+
+# Удалённые после since сущности выгружаются строками с id родителей
+# и deleted_at. Они идут перед изменёнными: id удалённой строки может
+# достаться новой (SQLite), и та не должна затереться удалением.
+TOMBSTONE_COLUMNS = {
+    "menu": (),
+    "submenu": ("menu_id",),
+    "dish": ("menu_id", "submenu_id"),
+}
+
+
+def tombstone_query(kind: str, since: datetime):
+    return (
+        select(
+            models.Tombstone.entity_id.label("id"),
+            *(
+                getattr(models.Tombstone, column)
+                for column in TOMBSTONE_COLUMNS[kind]
+            ),
+            models.Tombstone.deleted_at,
+        )
+        .filter(models.Tombstone.deleted_at > since)
+        .filter(models.Tombstone.kind == kind)
+        .order_by(models.Tombstone.id)
+    )
+
+
+def export_queries(since: datetime | None):
+    if since is not None:
+        for kind in TOMBSTONE_COLUMNS:
+            yield kind, tombstone_query(kind, since)
+    for kind in EXPORT_COLUMNS:
+        yield kind, export_query(kind, since)
+
+
+def iter_catalog_batches(since: datetime | None, db: Session):
+    for kind, query in export_queries(since):
+        res = db.execute(
+            query,
+            execution_options={"stream_results": True},
+        )
+        for rows in res.mappings().partitions(EXPORT_BATCH_SIZE):
+            yield kind, rows
+
+
+# Время последнего изменения или удаления в каталоге
+def last_modified_queries():
+    for model, _ in EXPORT_COLUMNS.values():
+        yield select(func.max(model.updated_at))
+    yield select(func.max(models.Tombstone.deleted_at))
+
+
+def get_catalog_last_modified(db: Session) -> datetime | None:
+    values = [db.execute(query).scalar() for query in last_modified_queries()]
+    return max((value for value in values if value is not None), default=None)
+
+
+# Быстрая выдача списков: строки читаются кортежами и сразу становятся
+# словарями с полями схемы, id приводятся к строке в самом запросе
+def rows_query(model, schema):
+    return select(
+        *(
+            cast(getattr(model, name), String).label(name)
+            if name == "id" or name.endswith("_id")
+            else getattr(model, name)
+            for name in schema.__fields__
+        )
+    )
+
+
+def rows_to_dicts(res) -> list[dict]:
+    keys = tuple(res.keys())
+    return [dict(zip(keys, row)) for row in res]
+
+
+def menu_rows_query():
+    return rows_query(models.Menu, schemas.Menu).order_by(models.Menu.id)
+
+
+def submenu_rows_query(menu_id: str):
+    return (
+        rows_query(models.Submenu, schemas.Submenu)
+        .filter(models.Submenu.menu_id == menu_id)
+        .order_by(models.Submenu.id)
+    )
+
+
+def dish_rows_query(menu_id: str, submenu_id: str):
+    return (
+        rows_query(models.Dish, schemas.Dish)
+        .filter(models.Dish.submenu_id == submenu_id)
+        .filter(models.Dish.menu_id == menu_id)
+        .order_by(models.Dish.id)
+    )
+
+
+def get_all_menu_rows(db: Session) -> list[dict]:
+    return rows_to_dicts(db.execute(menu_rows_query()))
+
+
+def get_all_submenu_rows(menu_id: str, db: Session) -> list[dict]:
+    return rows_to_dicts(db.execute(submenu_rows_query(menu_id)))
+
+
+def get_all_dishes_rows(menu_id: str, submenu_id: str, db: Session):
+    return rows_to_dicts(db.execute(dish_rows_query(menu_id, submenu_id)))
+
+
+# Постраничная выборка по id: запрашивается на одну запись больше,
+# чтобы узнать, есть ли следующая страница
+def _get_page(query, model, limit: int, after: int | None):
+    if after is not None:
+        query = query.filter(model.id > after)
+    rows = query.order_by(model.id).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = str(rows[-1].id)
+    return {"items": rows, "next_cursor": next_cursor}
+
+
+# Добавление/удаление блюда меняет dishes_count у меню и подменю
+def _invalidate_dish_parents(menu_id: str, submenu_id: str) -> None:
+    cache.invalidate(
+        cache.menus_key(),
+        cache.menu_key(menu_id),
+        cache.submenus_key(menu_id),
+        cache.submenu_key(menu_id, submenu_id),
+        cache.dishes_key(menu_id, submenu_id),
+    )
+
+
+# Чтение через кэш для GET-обработчиков: возвращают уже сериализованные
+# данные, поэтому их результат нельзя изменять и передавать в update_*
+cached_get_all_menu = cache.read_through(
+    cache.menus_key, schemas.Menu, many=True
+)(get_all_menu)
+cached_get_menu_by_id = cache.read_through(cache.menu_key, schemas.Menu)(
+    get_menu_by_id
+)
+cached_get_all_submenu = cache.read_through(
+    cache.submenus_key, schemas.Submenu, many=True
+)(get_all_submenu)
+cached_get_submenu_by_id = cache.read_through(
+    cache.submenu_key, schemas.Submenu
+)(get_submenu_by_id)
+cached_get_all_dishes = cache.read_through(
+    cache.dishes_key, schemas.Dish, many=True
+)(get_all_dishes)
+cached_get_dish_by_id = cache.read_through(cache.dish_key, schemas.Dish)(
+    get_dish_by_id
+)
+
+# Те же ключи кэша: словари строк совпадают с сериализованными схемами
+cached_get_all_menu_rows = cache.read_through(cache.menus_key)(
+    get_all_menu_rows
+)
+cached_get_all_submenu_rows = cache.read_through(cache.submenus_key)(
+    get_all_submenu_rows
+)
+cached_get_all_dishes_rows = cache.read_through(cache.dishes_key)(
+    get_all_dishes_rows
+)
@@ -0,0 +1,429 @@
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from menu import cache, changes, crud, etag, models, schemas, search
+
+
+# Асинхронные версии функций из crud.py для режима DB_ASYNC=1
+
+
+async def get_all_menu(db: AsyncSession) -> list[schemas.MenuBase]:
+    res = await db.scalars(select(models.Menu).order_by(models.Menu.id))
+    return res.all()
+
+
+async def get_menu_page(limit: int, after: int | None, db: AsyncSession):
+    return await _get_page(db, select(models.Menu), models.Menu, limit, after)
+
+
+async def get_menu_by_id(menu_id: str, db: AsyncSession) -> schemas.Menu:
+    res = await db.scalars(
+        select(models.Menu).filter(models.Menu.id == menu_id)
+    )
+    return res.first()
+
+
+def _menu_tree_query():
+    return select(models.Menu).options(
+        selectinload(models.Menu.submenu).selectinload(models.Submenu.dishes)
+    )
+
+
+async def get_menu_tree(db: AsyncSession):
+    res = await db.scalars(_menu_tree_query().order_by(models.Menu.id))
+    return res.all()
+
+
+async def get_menu_tree_by_id(menu_id: str, db: AsyncSession):
+    res = await db.scalars(
+        _menu_tree_query().filter(models.Menu.id == menu_id)
+    )
+    return res.first()
+
+
+async def create_menu(
+    menu: schemas.MenuBase, db: AsyncSession
+) -> schemas.Menu:
+    menu_db = models.Menu(
+        title=menu.title,
+        description=menu.description,
+        submenus_count=0,
+        dishes_count=0,
+    )
+    db.add(menu_db)
+    await db.flush()
+    await db.execute(search.add([crud.menu_document(menu_db)]))
+    await db.commit()
+    await cache.invalidate_async(cache.menus_key())
+    changes.publish("create", "menu", menu_db.id, menu_db.id)
+    return menu_db
+
+
+async def delete_menu(menu_id: str, db: AsyncSession) -> None:
+    for statement in crud.delete_menu_statements(menu_id):
+        res = await db.execute(statement)
+    await db.commit()
+    await cache.invalidate_async(cache.menus_key())
+    await cache.invalidate_tree_async(cache.menu_key(menu_id))
+    if res.rowcount:
+        changes.publish("delete", "menu", menu_id, menu_id)
+
+
+async def update_menu(
+    old_menu: schemas.Menu, new_menu: schemas.MenuBase, db: AsyncSession
+) -> schemas.MenuBase:
+    old_menu.title, old_menu.description = new_menu.title, new_menu.description
+    old_menu.version = models.Menu.version + 1
+    db.add(old_menu)
+    for statement in search.replace(crud.menu_document(old_menu)):
+        await db.execute(statement)
+    await db.commit()
+    await cache.invalidate_async(
+        cache.menus_key(), cache.menu_key(old_menu.id)
+    )
+    changes.publish("update", "menu", old_menu.id, old_menu.id)
+    return old_menu
+
+
+async def get_all_submenu(menu_id: str, db: AsyncSession):
+    res = await db.scalars(
+        select(models.Submenu)
+        .filter(models.Submenu.menu_id == menu_id)
+        .order_by(models.Submenu.id)
+    )
+    return res.all()
+
+
+async def get_submenu_page(
+    menu_id: str, limit: int, after: int | None, db: AsyncSession
+):
+    query = select(models.Submenu).filter(models.Submenu.menu_id == menu_id)
+    return await _get_page(db, query, models.Submenu, limit, after)
+
+
+async def get_submenu_by_id(menu_id: str, submenu_id: str, db: AsyncSession):
+    res = await db.scalars(
+        select(models.Submenu)
+        .filter(models.Submenu.menu_id == menu_id)
+        .filter(models.Submenu.id == submenu_id)
+    )
+    return res.first()
+
+
+async def create_submenu(
+    menu_id: str, submenu: schemas.SubmenuBase, db: AsyncSession
+):
+    submenu_db = models.Submenu(
+        title=submenu.title,
+        description=submenu.description,
+        dishes_count=0,
+        menu_id=menu_id,
+    )
+    db.add(submenu_db)
+
+    res = await db.execute(crud.menu_counters(menu_id, submenus=1))
+    if res.rowcount == 0:
+        await db.rollback()
+        return None
+    await db.flush()
+    await db.execute(search.add([crud.submenu_document(submenu_db)]))
+
+    await db.commit()
+    await cache.invalidate_async(
+        cache.menus_key(), cache.menu_key(menu_id), cache.submenus_key(menu_id)
+    )
+    changes.publish("create", "submenu", submenu_db.id, menu_id)
+
+    return submenu_db
+
+
+async def update_submenu(
+    old_submenu: schemas.Submenu,
+    new_submenu: schemas.SubmenuBase,
+    db: AsyncSession,
+):
+    old_submenu.title, old_submenu.description = (
+        new_submenu.title,
+        new_submenu.description,
+    )
+    old_submenu.version = models.Submenu.version + 1
+    db.add(old_submenu)
+    await db.execute(crud.menu_counters(old_submenu.menu_id))
+    for statement in search.replace(crud.submenu_document(old_submenu)):
+        await db.execute(statement)
+    await db.commit()
+    await cache.invalidate_async(
+        cache.submenus_key(old_submenu.menu_id),
+        cache.submenu_key(old_submenu.menu_id, old_submenu.id),
+    )
+    changes.publish("update", "submenu", old_submenu.id, old_submenu.menu_id)
+    return old_submenu
+
+
+async def delete_submenu(menu_id: str, submenu_id: str, db: AsyncSession):
+    for statement in crud.delete_submenu_statements(menu_id, submenu_id):
+        res = await db.execute(statement)
+
+    await db.commit()
+    await cache.invalidate_async(
+        cache.menus_key(), cache.menu_key(menu_id), cache.submenus_key(menu_id)
+    )
+    await cache.invalidate_tree_async(cache.submenu_key(menu_id, submenu_id))
+    if res.rowcount:
+        changes.publish("delete", "submenu", submenu_id, menu_id)
+
+
+async def get_all_dishes(menu_id: str, submenu_id: str, db: AsyncSession):
+    res = await db.scalars(
+        select(models.Dish)
+        .filter(models.Dish.submenu_id == submenu_id)
+        .filter(models.Dish.menu_id == menu_id)
+        .order_by(models.Dish.id)
+    )
+    return res.all()
+
+
+# Фильтры и курсоры как в crud.get_dishes_filtered, запрос выполняется
+# синхронной функцией внутри асинхронной сессии
+async def get_dishes_filtered(
+    menu_id: str | None,
+    submenu_id: str | None,
+    min_price: Decimal | None,
+    max_price: Decimal | None,
+    sort: str,
+    limit: int | None,
+    after: str | None,
+    db: AsyncSession,
+):
+    return await db.run_sync(
+        lambda session: crud.get_dishes_filtered(
+            menu_id,
+            submenu_id,
+            min_price,
+            max_price,
+            sort,
+            limit,
+            after,
+            session,
+        )
+    )
+
+
+async def get_dish_by_id(
+    menu_id: str, submenu_id: str, dish_id: str, db: AsyncSession
+):
+    res = await db.scalars(
+        select(models.Dish)
+        .filter(models.Dish.submenu_id == submenu_id)
+        .filter(models.Dish.menu_id == menu_id)
+        .filter(models.Dish.id == dish_id)
+    )
+    return res.first()
+
+
+async def create_dish(
+    menu_id: str, submenu_id: str, dish: schemas.DishBase, db: AsyncSession
+):
+    dish_db = models.Dish(
+        title=dish.title,
+        description=dish.description,
+        price=dish.price,
+        price_cents=schemas.price_to_cents(dish.price),
+        menu_id=menu_id,
+        submenu_id=submenu_id,
+    )
+    db.add(dish_db)
+
+    res = await db.execute(
+        crud.submenu_counters(menu_id, submenu_id, dishes=1)
+    )
+    if res.rowcount == 0:
+        await db.rollback()
+        return None
+    await db.execute(crud.menu_counters(menu_id, dishes=1))
+    await db.flush()
+    await db.execute(search.add([crud.dish_document(dish_db)]))
+
+    await db.commit()
+    await _invalidate_dish_parents(menu_id, submenu_id)
+    changes.publish("create", "dish", dish_db.id, menu_id, submenu_id)
+
+    return dish_db
+
+
+async def update_dish(
+    old_dish: schemas.Dish,
+    new_dish: schemas.DishBase,
+    db: AsyncSession,
+):
+    old_dish.title, old_dish.description, old_dish.price = (
+        new_dish.title,
+        new_dish.description,
+        new_dish.price,
+    )
+    old_dish.price_cents = schemas.price_to_cents(new_dish.price)
+    old_dish.version = models.Dish.version + 1
+    db.add(old_dish)
+    await db.execute(
+        crud.submenu_counters(old_dish.menu_id, old_dish.submenu_id)
+    )
+    await db.execute(crud.menu_counters(old_dish.menu_id))
+    for statement in search.replace(crud.dish_document(old_dish)):
+        await db.execute(statement)
+    await db.commit()
+    await cache.invalidate_async(
+        cache.dishes_key(old_dish.menu_id, old_dish.submenu_id),
+        cache.dish_key(old_dish.menu_id, old_dish.submenu_id, old_dish.id),
+    )
+    changes.publish(
+        "update", "dish", old_dish.id, old_dish.menu_id, old_dish.submenu_id
+    )
+    return old_dish
+
+
+async def delete_dish(
+    menu_id: str, submenu_id: str, dish_id: str, db: AsyncSession
+):
+    res = await db.execute(
+        delete(models.Dish)
+        .filter(models.Dish.submenu_id == submenu_id)
+        .filter(models.Dish.menu_id == menu_id)
+        .filter(models.Dish.id == dish_id)
+        .execution_options(synchronize_session=False)
+    )
+    if res.rowcount:
+        await db.execute(crud.submenu_counters(menu_id, submenu_id, dishes=-1))
+        await db.execute(crud.menu_counters(menu_id, dishes=-1))
+        await db.execute(search.remove_dish(dish_id))
+        await db.execute(crud.dish_tombstone(menu_id, submenu_id, dish_id))
+
+    await db.commit()
+    await _invalidate_dish_parents(menu_id, submenu_id)
+    await cache.invalidate_async(cache.dish_key(menu_id, submenu_id, dish_id))
+    if res.rowcount:
+        changes.publish("delete", "dish", dish_id, menu_id, submenu_id)
+
+
+async def import_catalog(
+    catalog: schemas.CatalogImport, db: AsyncSession
+) -> dict:
+    result = await db.run_sync(
+        lambda session: crud.insert_catalog(catalog, session)
+    )
+    await cache.invalidate_async(cache.menus_key())
+    changes.publish("create", "catalog")
+    return result
+
+
+async def get_menus_by_ids(ids: list[str], db: AsyncSession) -> dict:
+    rows = (await db.scalars(crud.batch_query(models.Menu, ids))).all()
+    return crud.batch_result(ids, rows)
+
+
+async def get_submenus_by_ids(ids: list[str], db: AsyncSession) -> dict:
+    rows = (await db.scalars(crud.batch_query(models.Submenu, ids))).all()
+    return crud.batch_result(ids, rows)
+
+
+async def get_dishes_by_ids(ids: list[str], db: AsyncSession) -> dict:
+    rows = (await db.scalars(crud.batch_query(models.Dish, ids))).all()
+    return crud.batch_result(ids, rows)
+
+
+async def search_catalog(
+    query: str, limit: int, after: str | None, db: AsyncSession
+):
+    return await db.run_sync(
+        lambda session: crud.search_catalog(query, limit, after, session)
+    )
+
+
+async def get_etag(query, db: AsyncSession) -> str | None:
+    row = (await db.execute(query)).first()
+    return None if row is None else etag.make(*row)
+
+
+async def iter_catalog_batches(since: datetime | None, db: AsyncSession):
+    for kind, query in crud.export_queries(since):
+        res = await db.stream(query)
+        async for rows in res.mappings().partitions(crud.EXPORT_BATCH_SIZE):
+            yield kind, rows
+
+
+async def get_catalog_last_modified(db: AsyncSession) -> datetime | None:
+    values = [
+        await db.scalar(query) for query in crud.last_modified_queries()
+    ]
+    return max((value for value in values if value is not None), default=None)
+
+
+async def get_all_menu_rows(db: AsyncSession) -> list[dict]:
+    return crud.rows_to_dicts(await db.execute(crud.menu_rows_query()))
+
+
+async def get_all_submenu_rows(menu_id: str, db: AsyncSession) -> list[dict]:
+    res = await db.execute(crud.submenu_rows_query(menu_id))
+    return crud.rows_to_dicts(res)
+
+
+async def get_all_dishes_rows(
+    menu_id: str, submenu_id: str, db: AsyncSession
+) -> list[dict]:
+    res = await db.execute(crud.dish_rows_query(menu_id, submenu_id))
+    return crud.rows_to_dicts(res)
+
+
+async def _get_page(db: AsyncSession, query, model, limit, after):
+    if after is not None:
+        query = query.filter(model.id > after)
+    res = await db.scalars(query.order_by(model.id).limit(limit + 1))
+    rows = res.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = str(rows[-1].id)
+    return {"items": rows, "next_cursor": next_cursor}
+
+
+async def _invalidate_dish_parents(menu_id: str, submenu_id: str) -> None:
+    await cache.invalidate_async(
+        cache.menus_key(),
+        cache.menu_key(menu_id),
+        cache.submenus_key(menu_id),
+        cache.submenu_key(menu_id, submenu_id),
+        cache.dishes_key(menu_id, submenu_id),
+    )
+
+
+cached_get_all_menu = cache.read_through_async(
+    cache.menus_key, schemas.Menu, many=True
+)(get_all_menu)
+cached_get_menu_by_id = cache.read_through_async(
+    cache.menu_key, schemas.Menu
+)(get_menu_by_id)
+cached_get_all_submenu = cache.read_through_async(
+    cache.submenus_key, schemas.Submenu, many=True
+)(get_all_submenu)
+cached_get_submenu_by_id = cache.read_through_async(
+    cache.submenu_key, schemas.Submenu
+)(get_submenu_by_id)
+cached_get_all_dishes = cache.read_through_async(
+    cache.dishes_key, schemas.Dish, many=True
+)(get_all_dishes)
+cached_get_dish_by_id = cache.read_through_async(
+    cache.dish_key, schemas.Dish
+)(get_dish_by_id)
+cached_get_all_menu_rows = cache.read_through_async(cache.menus_key)(
+    get_all_menu_rows
+)
+cached_get_all_submenu_rows = cache.read_through_async(cache.submenus_key)(
+    get_all_submenu_rows
+)
+cached_get_all_dishes_rows = cache.read_through_async(cache.dishes_key)(
+    get_all_dishes_rows
+)
@@ -1,25 +1,164 @@
+import time
 from os import getenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-from .dependencies import get_db_settings
+from . import sqlite
+from .dependencies import (
+    get_db_settings,
+    get_replica_settings,
+    get_sqlite_settings,
+    get_startup_settings,
+)
+from .pool import InstrumentedNullPool, InstrumentedQueuePool, instrument
+from .replicas import Replica, ReplicaSet
 
 
-# База данных SQLite по умолчанию
-if getenv("DB_ENGINE") is None:
-    SQLALCHEMY_DATABASE_URL = "sqlite:///./sql_app.db"
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-    )
-# База данных PostgreSQL (передать переменную окружения DB_ENGINE=POSTGRESQL)
-if getenv("DB_ENGINE") == "POSTGRESQL":
-    settings = get_db_settings()
-    SQLALCHEMY_DATABASE_URL = f"postgresql://{settings.username}:{settings.password}@{settings.service}/{settings.database}"
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Драйверы aiosqlite (SQLite) и asyncpg (PostgreSQL) — extras async.
+# Нужен драйвер aiosqlite для SQLite или asyncpg для PostgreSQL.
+ASYNC_MODE = getenv("DB_ASYNC") == "1"
 
-assert engine is not None, "Не указана база данных."
+# Движки создаются при запуске приложения (init_engine), а не при импорте
+engine: Engine | None = None
+async_engine = None
+# Реплики для чтения (DB_REPLICA_URLS), None — все запросы в основную БД
+replicas: ReplicaSet | None = None
+# Пул соединений только для чтения встроенного режима SQLite
+reader: Replica | None = None
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = None
 
 Base = declarative_base()
+
+
+def init_engine() -> Engine:
+    global engine, async_engine, replicas, reader, AsyncSessionLocal
+
+    sqlite_settings = None
+    # База данных SQLite по умолчанию
+    if getenv("DB_ENGINE") is None:
+        SQLALCHEMY_DATABASE_URL = "sqlite:///./sql_app.db"
+        ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./sql_app.db"
+        if get_sqlite_settings().tuned:
+            sqlite_settings = get_sqlite_settings()
+            engine = sqlite.create_writer_engine(
+                SQLALCHEMY_DATABASE_URL, sqlite_settings
+            )
+        else:
+            engine = create_engine(
+                SQLALCHEMY_DATABASE_URL,
+                connect_args={"check_same_thread": False},
+                poolclass=InstrumentedNullPool,
+            )
+        pool_options = {}
+    # База данных PostgreSQL (передать переменную окружения DB_ENGINE=POSTGRESQL)
+    if getenv("DB_ENGINE") == "POSTGRESQL":
+        settings = get_db_settings()
+        SQLALCHEMY_DATABASE_URL = f"postgresql://{settings.username}:{settings.password}@{settings.service}/{settings.database}"
+        ASYNC_DATABASE_URL = f"postgresql+asyncpg://{settings.username}:{settings.password}@{settings.service}/{settings.database}"
+        pool_options = {
+            "pool_size": settings.pool_size,
+            "max_overflow": settings.max_overflow,
+            "pool_timeout": settings.pool_timeout,
+            "pool_recycle": settings.pool_recycle,
+            "pool_pre_ping": settings.pool_pre_ping,
+        }
+        engine = create_engine(
+            SQLALCHEMY_DATABASE_URL,
+            poolclass=InstrumentedQueuePool,
+            **pool_options,
+        )
+
+    assert engine is not None, "Не указана база данных."
+    instrument("primary", engine)
+    SessionLocal.configure(bind=engine)
+
+    # Чтение встроенного режима SQLite идёт через get_read_db так же,
+    # как чтение из реплик
+    replica_list = []
+    if sqlite_settings is not None and sqlite_settings.readers > 0:
+        reader_engine = sqlite.create_reader_engine(
+            SQLALCHEMY_DATABASE_URL, sqlite_settings
+        )
+        instrument("reader", reader_engine)
+        reader = Replica("reader", reader_engine, lagging=False)
+        replica_list.append(reader)
+
+    replica_settings = get_replica_settings()
+    if replica_settings.replica_urls:
+        for i, url in enumerate(replica_settings.replica_urls, 1):
+            name = f"replica{i}"
+            replica_engine = create_replica_engine(name, url, pool_options)
+            replica_list.append(Replica(name, replica_engine))
+    if replica_list:
+        replicas = ReplicaSet(
+            replica_list,
+            check_interval=replica_settings.replica_check_interval,
+        )
+
+    if ASYNC_MODE:
+        from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+        async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_options)
+        if sqlite_settings is not None:
+            sqlite.apply_pragmas(
+                async_engine.sync_engine, sqlite.pragmas(sqlite_settings)
+            )
+        instrument("async", async_engine.sync_engine)
+        AsyncSessionLocal = sessionmaker(
+            async_engine,
+            class_=AsyncSession,
+            autoflush=False,
+            expire_on_commit=False,
+        )
+
+    return engine
+
+
+def create_replica_engine(name: str, url: str, pool_options: dict) -> Engine:
+    if url.startswith("sqlite"):
+        replica_engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False},
+            poolclass=InstrumentedNullPool,
+        )
+    else:
+        replica_engine = create_engine(
+            url, poolclass=InstrumentedQueuePool, **pool_options
+        )
+    instrument(name, replica_engine)
+    return replica_engine
+
+
+# Ожидание доступности БД с экспоненциальной задержкой между попытками
+def wait_for_database(engine: Engine) -> None:
+    settings = get_startup_settings()
+    delay = settings.backoff
+    for attempt in range(1, settings.connect_attempts + 1):
+        try:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            return
+        except OperationalError:
+            if attempt == settings.connect_attempts:
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, settings.max_backoff)
+
+
+async def dispose_engine() -> None:
+    global engine, async_engine, replicas, reader
+    if async_engine is not None:
+        await async_engine.dispose()
+        async_engine = None
+    if replicas is not None:
+        replicas.dispose()
+        replicas = None
+        reader = None
+    if engine is not None:
+        engine.dispose()
+        engine = None
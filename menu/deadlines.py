@@ -0,0 +1,139 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import monotonic
+from typing import Iterator
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from menu.dependencies import get_deadline_settings
+
+# Число инструкций виртуальной машины SQLite между проверками срока
+SQLITE_PROGRESS_STEPS = 1000
+
+# Момент (time.monotonic), к которому запрос должен завершить работу с БД
+_expires: ContextVar[float | None] = ContextVar(
+    "deadline_expires", default=None
+)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def remaining() -> float | None:
+    expires = _expires.get()
+    return None if expires is None else expires - monotonic()
+
+
+def expired() -> bool:
+    expires = _expires.get()
+    return expires is not None and monotonic() >= expires
+
+
+@contextmanager
+def deadline(seconds: float | None) -> Iterator[None]:
+    token = _expires.set(None if seconds is None else monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _expires.reset(token)
+
+
+# Работа, которую нельзя прерывать на полпути (публикация уже
+# зафиксированных изменений), выполняется без срока
+@contextmanager
+def unbounded() -> Iterator[None]:
+    with deadline(None):
+        yield
+
+
+# Срок запроса: заголовок клиента (не больше max), значение для шаблона
+# маршрута или общее значение; 0 — без ограничения
+def timeout_for(request: Request) -> float | None:
+    settings = get_deadline_settings()
+    route = request.scope.get("route")
+    seconds = settings.default
+    if route is not None:
+        seconds = settings.routes.get(route.path, seconds)
+
+    header = request.headers.get(settings.header)
+    if header is not None:
+        try:
+            requested = float(header)
+        except ValueError:
+            requested = 0
+        if requested > 0:
+            seconds = min(requested, settings.max)
+    return seconds if seconds > 0 else None
+
+
+# Зависимость уровня приложения: срок начинает отсчитываться, когда запрос
+# сопоставлен с маршрутом. Асинхронная, чтобы значение контекстной
+# переменной было видно обработчику и зависимостям в пуле потоков.
+async def start(request: Request) -> None:
+    seconds = timeout_for(request)
+    _expires.set(None if seconds is None else monotonic() + seconds)
+
+
+async def handle_expired(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(
+        status_code=504, content={"detail": "deadline exceeded"}
+    )
+
+
+# PostgreSQL: остаток срока становится тайм-аутом SQL-запросов транзакции
+def _after_begin(session, transaction, connection) -> None:
+    left = remaining()
+    if left is None or connection.dialect.name != "postgresql":
+        return
+    if left <= 0:
+        raise DeadlineExceeded()
+    connection.exec_driver_sql(
+        f"SET LOCAL statement_timeout = {max(1, int(left * 1000))}"
+    )
+
+
+def _progress_handler() -> int:
+    # Ненулевое значение прерывает выполняемый запрос SQLite
+    return 1 if expired() else 0
+
+
+# Новый запрос после истечения срока не отправляется в БД; соединениям
+# SQLite один раз ставится обработчик прогресса, который прерывает
+# запрос, выполняющийся дольше срока
+def _before_cursor_execute(conn, cursor, statement, params, context, many):
+    if _expires.get() is None:
+        return
+    if expired():
+        raise DeadlineExceeded()
+    if conn.dialect.name != "sqlite":
+        return
+    record = conn.connection
+    dbapi_connection = record.dbapi_connection
+    if not record.info.get("deadline_handler") and hasattr(
+        dbapi_connection, "set_progress_handler"
+    ):
+        dbapi_connection.set_progress_handler(
+            _progress_handler, SQLITE_PROGRESS_STEPS
+        )
+        record.info["deadline_handler"] = True
+
+
+# Ошибка БД после истечения срока (запрос прерван или отменён по
+# statement_timeout) заменяется на DeadlineExceeded
+def _handle_error(context) -> None:
+    if expired():
+        raise DeadlineExceeded() from context.original_exception
+
+
+def install() -> None:
+    if not event.contains(
+        Engine, "before_cursor_execute", _before_cursor_execute
+    ):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+        event.listen(Session, "after_begin", _after_begin)
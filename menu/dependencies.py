@@ -7,3 +7,54 @@ from menu import config
 @lru_cache
 def get_db_settings() -> config.DBSettings:
     return config.DBSettings()
+
+
+# Реплики настраиваются и для SQLite, где DBSettings не используется
+@lru_cache
+def get_replica_settings() -> config.ReplicaSettings:
+    return config.ReplicaSettings()
+
+
+@lru_cache
+def get_sqlite_settings() -> config.SQLiteSettings:
+    return config.SQLiteSettings()
+
+
+@lru_cache
+def get_cache_settings() -> config.CacheSettings:
+    return config.CacheSettings()
+
+
+@lru_cache
+def get_startup_settings() -> config.StartupSettings:
+    return config.StartupSettings()
+
+
+@lru_cache
+def get_response_settings() -> config.ResponseSettings:
+    return config.ResponseSettings()
+
+
+@lru_cache
+def get_querylog_settings() -> config.QueryLogSettings:
+    return config.QueryLogSettings()
+
+
+@lru_cache
+def get_snapshot_settings() -> config.SnapshotSettings:
+    return config.SnapshotSettings()
+
+
+@lru_cache
+def get_admission_settings() -> config.AdmissionSettings:
+    return config.AdmissionSettings()
+
+
+@lru_cache
+def get_deadline_settings() -> config.DeadlineSettings:
+    return config.DeadlineSettings()
+
+
+@lru_cache
+def get_changes_settings() -> config.ChangesSettings:
+    return config.ChangesSettings()
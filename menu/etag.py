@@ -0,0 +1,26 @@
+from fastapi import HTTPException, Response
+
+
+# Сильный ETag из версии сущности (или агрегата версий списка)
+def make(*parts) -> str:
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (
+        tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+    )
+
+
+# 304 без тела, если у клиента актуальная версия, иначе ETag в ответе.
+# Для отсутствующей сущности (etag is None) обработчик вернёт 404.
+def check(etag: str | None, if_none_match: str | None, response: Response):
+    if etag is None:
+        return
+    if matches(if_none_match, etag):
+        raise HTTPException(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+# Форматы выгрузки каталога и их типы содержимого
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+CSV_FIELDS = [
+    "type",
+    "id",
+    "menu_id",
+    "submenu_id",
+    "title",
+    "description",
+    "price",
+    "submenus_count",
+    "dishes_count",
+    "updated_at",
+    "deleted_at",
+]
+
+
+def _row_dict(kind: str, row) -> dict:
+    data = {"type": kind}
+    for key, value in row.items():
+        if key.endswith("id"):
+            value = str(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        data[key] = value
+    return data
+
+
+# Пачка строк одного типа сущности превращается в один кусок ответа
+def format_batch(fmt: str, kind: str, rows) -> str:
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS)
+        writer.writerows(_row_dict(kind, row) for row in rows)
+        return buffer.getvalue()
+    return "".join(
+        json.dumps(_row_dict(kind, row), ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+def header(fmt: str) -> str:
+    if fmt == "csv":
+        return ",".join(CSV_FIELDS) + "\r\n"
+    return ""
+
+
+def iter_export(fmt: str, batches):
+    yield header(fmt)
+    for kind, rows in batches:
+        yield format_batch(fmt, kind, rows)
+
+
+async def aiter_export(fmt: str, batches):
+    yield header(fmt)
+    async for kind, rows in batches:
+        yield format_batch(fmt, kind, rows)
+
+
+# Время в БД хранится в UTC без часового пояса
+def to_utc(value: datetime | None) -> datetime | None:
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def parse_http_date(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        return to_utc(parsedate_to_datetime(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def format_http_date(value: datetime) -> str:
+    return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
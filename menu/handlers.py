@@ -0,0 +1,107 @@
+from datetime import datetime
+from decimal import Decimal
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from menu import changes, crud, etag, export, snapshot
+from menu.dependencies import get_changes_settings
+
+# Общая часть синхронных (menu.main) и асинхронных (menu.async_api)
+# маршрутов: ответы, проверка ETag по снимку каталога, условия выгрузки
+# и маршруты, которые не обращаются к БД. Обработчики обоих режимов
+# отличаются только сессией и вызовами crud/crud_async.
+router = APIRouter()
+
+
+def not_found(entity: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=404, content={"detail": f"{entity} not found"}
+    )
+
+
+def deleted(entity: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=200,
+        content={"status": True, "message": f"The {entity} has been deleted"},
+    )
+
+
+def invalid_cursor() -> JSONResponse:
+    return JSONResponse(status_code=422, content={"detail": "invalid cursor"})
+
+
+# Проверка If-None-Match по ETag из снимка. False — ключа в снимке нет,
+# версию нужно прочитать из БД
+def check_snapshot_etag(
+    key: str, if_none_match: str | None, response: Response
+) -> bool:
+    entry = snapshot.lookup(key)
+    if entry is None:
+        return False
+    etag.check(entry.etag, if_none_match, response)
+    return True
+
+
+# Весь список блюд подменю (без страниц, фильтров и сортировки по цене)
+# отдаётся из снимка и кэша
+def whole_dish_list(
+    limit: int | None,
+    after: str | None,
+    min_price: Decimal | None,
+    max_price: Decimal | None,
+    sort: str,
+) -> bool:
+    return (
+        limit is None
+        and after is None
+        and min_price is None
+        and max_price is None
+        and sort == "id"
+    )
+
+
+# С limit или after — размер страницы, иначе None (весь список)
+def dish_page_size(limit: int | None, after: str | None) -> int | None:
+    if limit is None and after is None:
+        return None
+    return limit or crud.PAGE_SIZE
+
+
+# Заголовки и граница выгрузки. Без since граница берётся
+# из If-Modified-Since; если каталог с тех пор не менялся — 304
+def export_since(
+    last_modified: datetime | None,
+    since: datetime | None,
+    if_modified_since: str | None,
+) -> tuple[dict, datetime | None]:
+    headers = {}
+    if last_modified is not None:
+        headers["Last-Modified"] = export.format_http_date(last_modified)
+
+    since = export.to_utc(since)
+    if since is None:
+        since = export.parse_http_date(if_modified_since)
+        if since is not None and (
+            last_modified is None or last_modified <= since
+        ):
+            raise HTTPException(status_code=304, headers=headers)
+    return headers, since
+
+
+def export_response(fmt: str, chunks, headers: dict) -> StreamingResponse:
+    return StreamingResponse(
+        chunks, media_type=export.MEDIA_TYPES[fmt], headers=headers
+    )
+
+
+# Лента изменений каталога (Server-Sent Events). После переподключения
+# клиент продолжает с события после Last-Event-ID (или after)
+@router.get("/api/v1/changes", response_class=StreamingResponse)
+async def get_changes(
+    after: int | None = Query(None, ge=0),
+    last_event_id: str | None = Header(None),
+):
+    if after is None:
+        after = changes.parse_last_event_id(last_event_id)
+    return changes.respond(after, get_changes_settings().heartbeat)
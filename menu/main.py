@@ -1,15 +1,23 @@
-from fastapi import Depends, FastAPI
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, FastAPI, Header, Query, Request
+from fastapi.responses import PlainTextResponse, Response
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
-from typing import Any
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Union
 
-from menu import models, schemas, crud
-from menu.database import SessionLocal, engine
+from menu import database, etag, export, migrations, pool, schemas, crud
+from menu import admission, cache, compression, metrics, querylog, responses
+from menu import changes, deadlines, handlers, snapshot
+from menu.dependencies import get_querylog_settings, get_response_settings
+from menu.dependencies import get_admission_settings, get_snapshot_settings
+from menu.dependencies import get_changes_settings, get_deadline_settings
+from menu.database import SessionLocal
 
+logger = logging.getLogger(__name__)
 
-models.Base.metadata.create_all(bind=engine)
-
-app = FastAPI()
+router = APIRouter()
 
 
 # Dependency
@@ -21,80 +29,212 @@ def get_db():
         db.close()
 
 
-@app.get("/api/v1/menus", response_model=list[schemas.Menu])
-def get_all_menu(db: Session = Depends(get_db)):
-    return crud.get_all_menu(db)
+# Сессия для маршрутов только на чтение: реплика по кругу, а если реплик
+# нет или все недоступны — та же сессия основной БД, что и у get_db.
+# Запрос, на котором реплика отказала, повторяется на основной БД.
+def get_read_db(db: Session = Depends(get_db)):
+    replica = database.replicas.pick() if database.replicas else None
+    if replica is None:
+        yield db
+        return
+
+    read_db = replica.failover_session(db.get_bind())
+    try:
+        yield read_db
+    except OperationalError:
+        replica.mark_failed()
+        raise
+    finally:
+        read_db.close()
+
+
+# Проверка If-None-Match до загрузки данных: версия читается отдельным
+# лёгким запросом (или берётся из снимка каталога), при совпадении сразу
+# отдаётся 304 Not Modified
+def check_etag(version_query, key_func):
+    def dependency(
+        request: Request,
+        response: Response,
+        if_none_match: str | None = Header(None),
+        db: Session = Depends(get_read_db),
+    ):
+        key = key_func(**request.path_params)
+        if handlers.check_snapshot_etag(key, if_none_match, response):
+            return
+        query = version_query(**request.path_params)
+        etag.check(crud.get_etag(query, db), if_none_match, response)
+
+    return Depends(dependency)
+
+
+# Без limit и after возвращается весь список, как раньше
+@router.get(
+    "/api/v1/menus",
+    response_model=Union[list[schemas.Menu], schemas.MenuPage],
+    dependencies=[check_etag(crud.menus_version_query, cache.menus_key)],
+)
+def get_all_menu(
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=crud.MAX_PAGE_SIZE),
+    after: int | None = None,
+    db: Session = Depends(get_read_db),
+):
+    if limit is None and after is None:
+        entry = snapshot.lookup(cache.menus_key())
+        if entry is not None:
+            return snapshot.respond(entry)
+        if responses.fast_json_enabled():
+            rows = crud.cached_get_all_menu_rows(db)
+            return responses.fast_list(rows, response)
+        return crud.cached_get_all_menu(db)
+    return crud.get_menu_page(limit or crud.PAGE_SIZE, after, db)
+
+
+# Объявлен раньше /api/v1/menus/{menu_id}, чтобы "tree" не считался id
+@router.get("/api/v1/menus/tree", response_model=list[schemas.MenuTree])
+def get_menu_tree(db: Session = Depends(get_read_db)):
+    return crud.get_menu_tree(db)
+
+
+# Несколько меню по списку id одним запросом
+@router.post("/api/v1/menus/batch", response_model=schemas.MenuBatch)
+def get_menus_by_ids(
+    batch: schemas.BatchIds, db: Session = Depends(get_read_db)
+):
+    return crud.get_menus_by_ids(batch.ids, db)
 
 
-@app.get(
+@router.get(
     "/api/v1/menus/{menu_id}",
     response_model=schemas.Menu,
+    dependencies=[check_etag(crud.menu_version_query, cache.menu_key)],
 )
-def get_menu_by_id(menu_id: str, db: Session = Depends(get_db)):
-    menu_db = crud.get_menu_by_id(menu_id, db)
+def get_menu_by_id(menu_id: str, db: Session = Depends(get_read_db)):
+    entry = snapshot.lookup(cache.menu_key(menu_id))
+    if entry is not None:
+        return snapshot.respond(entry)
+    menu_db = crud.cached_get_menu_by_id(menu_id, db)
 
     if menu_db is None:
-        return JSONResponse(
-            status_code=404, content={"detail": "menu not found"}
-        )
+        return handlers.not_found("menu")
+
+    return menu_db
+
+
+@router.get("/api/v1/menus/{menu_id}/tree", response_model=schemas.MenuTree)
+def get_menu_tree_by_id(menu_id: str, db: Session = Depends(get_read_db)):
+    menu_db = crud.get_menu_tree_by_id(menu_id, db)
+
+    if menu_db is None:
+        return handlers.not_found("menu")
 
     return menu_db
 
 
-@app.post("/api/v1/menus", response_model=schemas.Menu, status_code=201)
+@router.post("/api/v1/menus", response_model=schemas.Menu, status_code=201)
 def create_menu(menu: schemas.MenuBase, db: Session = Depends(get_db)):
     return crud.create_menu(menu, db)
 
 
-@app.delete("/api/v1/menus/{menu_id}")
+@router.delete("/api/v1/menus/{menu_id}")
 def delete_menu(menu_id: str, db: Session = Depends(get_db)):
     crud.delete_menu(menu_id, db)
-    return JSONResponse(
-        status_code=200,
-        content={"status": True, "message": "The menu has been deleted"},
-    )
+    return handlers.deleted("menu")
 
 
-@app.patch("/api/v1/menus/{menu_id}", response_model=schemas.Menu)
+@router.patch("/api/v1/menus/{menu_id}", response_model=schemas.Menu)
 def update_menu(
     menu_id: str, menu_new: schemas.MenuBase, db: Session = Depends(get_db)
 ) -> Any:
     menu_db = crud.get_menu_by_id(menu_id, db)
 
     if menu_db is None:
-        return JSONResponse(
-            status_code=404, content={"detail": "menu not found"}
-        )
+        return handlers.not_found("menu")
 
     menu_db = crud.update_menu(menu_db, menu_new, db)
     return menu_db
 
 
-@app.get(
-    "/api/v1/menus/{menu_id}/submenus", response_model=list[schemas.Submenu]
+@router.post(
+    "/api/v1/catalog/import",
+    response_model=schemas.CatalogImportResult,
+    status_code=201,
 )
-def get_all_submenu_for_menu(menu_id: str, db: Session = Depends(get_db)):
-    return crud.get_all_submenu(menu_id, db)
+def import_catalog(
+    catalog: schemas.CatalogImport, db: Session = Depends(get_db)
+):
+    return crud.import_catalog(catalog, db)
+
+
+# Выгрузка каталога в NDJSON или CSV. С since или If-Modified-Since
+# выгружаются только записи, изменённые позже указанного времени.
+@router.get("/api/v1/catalog/export")
+def export_catalog(
+    fmt: str = Query("ndjson", alias="format", regex="^(ndjson|csv)$"),
+    since: datetime | None = None,
+    if_modified_since: str | None = Header(None),
+    db: Session = Depends(get_read_db),
+):
+    last_modified = crud.get_catalog_last_modified(db)
+    headers, since = handlers.export_since(
+        last_modified, since, if_modified_since
+    )
+    batches = crud.iter_catalog_batches(since, db)
+    return handlers.export_response(
+        fmt, export.iter_export(fmt, batches), headers
+    )
 
 
-@app.get(
+@router.get(
+    "/api/v1/menus/{menu_id}/submenus",
+    response_model=Union[list[schemas.Submenu], schemas.SubmenuPage],
+    dependencies=[check_etag(crud.submenus_version_query, cache.submenus_key)],
+)
+def get_all_submenu_for_menu(
+    menu_id: str,
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=crud.MAX_PAGE_SIZE),
+    after: int | None = None,
+    db: Session = Depends(get_read_db),
+):
+    if limit is None and after is None:
+        entry = snapshot.lookup(cache.submenus_key(menu_id))
+        if entry is not None:
+            return snapshot.respond(entry)
+        if responses.fast_json_enabled():
+            rows = crud.cached_get_all_submenu_rows(menu_id, db)
+            return responses.fast_list(rows, response)
+        return crud.cached_get_all_submenu(menu_id, db)
+    return crud.get_submenu_page(menu_id, limit or crud.PAGE_SIZE, after, db)
+
+
+@router.get(
     "/api/v1/menus/{menu_id}/submenus/{submenu_id}",
     response_model=schemas.Submenu,
+    dependencies=[check_etag(crud.submenu_version_query, cache.submenu_key)],
 )
 def get_submenu_for_menu_by_id(
-    menu_id: str, submenu_id: str, db: Session = Depends(get_db)
+    menu_id: str, submenu_id: str, db: Session = Depends(get_read_db)
 ):
-    submenu_db = crud.get_submenu_by_id(menu_id, submenu_id, db)
+    entry = snapshot.lookup(cache.submenu_key(menu_id, submenu_id))
+    if entry is not None:
+        return snapshot.respond(entry)
+    submenu_db = crud.cached_get_submenu_by_id(menu_id, submenu_id, db)
 
     if submenu_db is None:
-        return JSONResponse(
-            status_code=404, content={"detail": "submenu not found"}
-        )
+        return handlers.not_found("submenu")
 
     return submenu_db
 
 
-@app.post(
+@router.post("/api/v1/submenus/batch", response_model=schemas.SubmenuBatch)
+def get_submenus_by_ids(
+    batch: schemas.BatchIds, db: Session = Depends(get_read_db)
+):
+    return crud.get_submenus_by_ids(batch.ids, db)
+
+
+@router.post(
     "/api/v1/menus/{menu_id}/submenus",
     response_model=schemas.Submenu,
     status_code=201,
@@ -103,10 +243,14 @@ def create_submenu(
     menu_id: str, submenu: schemas.SubmenuBase, db: Session = Depends(get_db)
 ):
     submenu_db = crud.create_submenu(menu_id, submenu, db)
+
+    if submenu_db is None:
+        return handlers.not_found("menu")
+
     return submenu_db
 
 
-@app.patch(
+@router.patch(
     "/api/v1/menus/{menu_id}/submenus/{submenu_id}",
     response_model=schemas.Submenu,
 )
@@ -119,53 +263,123 @@ def update_submenu(
     submenu_db = crud.get_submenu_by_id(menu_id, submenu_id, db)
 
     if submenu_db is None:
-        return JSONResponse(
-            status_code=404, content={"detail": "submenu not found"}
-        )
+        return handlers.not_found("submenu")
 
     submenu_db = crud.update_submenu(submenu_db, new_submenu, db)
     return submenu_db
 
 
-@app.delete("/api/v1/menus/{menu_id}/submenus/{submenu_id}")
+@router.delete("/api/v1/menus/{menu_id}/submenus/{submenu_id}")
 def delete_submenu(
     menu_id: str, submenu_id: str, db: Session = Depends(get_db)
 ):
     crud.delete_submenu(menu_id, submenu_id, db)
-    return JSONResponse(
-        status_code=200,
-        content={"status": True, "message": "The submenu has been deleted"},
-    )
+    return handlers.deleted("submenu")
+
+
+# Неверный курсор (например, id при sort=price) — ошибка 422
+def get_dishes_filtered(*args):
+    try:
+        return crud.get_dishes_filtered(*args)
+    except ValueError:
+        return handlers.invalid_cursor()
 
 
-@app.get(
+@router.get(
     "/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes",
-    response_model=list[schemas.Dish],
+    response_model=Union[list[schemas.Dish], schemas.DishPage],
+    dependencies=[check_etag(crud.dishes_version_query, cache.dishes_key)],
 )
 def get_all_dish_for_submenu(
-    menu_id: str, submenu_id: str, db: Session = Depends(get_db)
+    menu_id: str,
+    submenu_id: str,
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=crud.MAX_PAGE_SIZE),
+    after: str | None = Query(None, regex=crud.DISH_CURSOR_REGEX),
+    min_price: Decimal | None = Query(None, ge=0),
+    max_price: Decimal | None = Query(None, ge=0),
+    sort: str = Query("id", regex=crud.DISH_SORT_REGEX),
+    db: Session = Depends(get_read_db),
+):
+    if handlers.whole_dish_list(limit, after, min_price, max_price, sort):
+        entry = snapshot.lookup(cache.dishes_key(menu_id, submenu_id))
+        if entry is not None:
+            return snapshot.respond(entry)
+        if responses.fast_json_enabled():
+            rows = crud.cached_get_all_dishes_rows(
+                menu_id, submenu_id, db
+            )
+            return responses.fast_list(rows, response)
+        return crud.cached_get_all_dishes(menu_id, submenu_id, db)
+    return get_dishes_filtered(
+        menu_id,
+        submenu_id,
+        min_price,
+        max_price,
+        sort,
+        handlers.dish_page_size(limit, after),
+        after,
+        db,
+    )
+
+
+# Блюда всех меню постранично, с фильтром и сортировкой по цене
+@router.get("/api/v1/dishes", response_model=schemas.DishPage)
+def get_all_dishes(
+    limit: int = Query(crud.PAGE_SIZE, ge=1, le=crud.MAX_PAGE_SIZE),
+    after: str | None = Query(None, regex=crud.DISH_CURSOR_REGEX),
+    min_price: Decimal | None = Query(None, ge=0),
+    max_price: Decimal | None = Query(None, ge=0),
+    sort: str = Query("id", regex=crud.DISH_SORT_REGEX),
+    db: Session = Depends(get_read_db),
+):
+    return get_dishes_filtered(
+        None, None, min_price, max_price, sort, limit, after, db
+    )
+
+
+# Блюда разных подменю (например, корзина заказа) одним запросом
+@router.post("/api/v1/dishes/batch", response_model=schemas.DishBatch)
+def get_dishes_by_ids(
+    batch: schemas.BatchIds, db: Session = Depends(get_read_db)
 ):
-    return crud.get_all_dishes(menu_id, submenu_id, db)
+    return crud.get_dishes_by_ids(batch.ids, db)
 
 
-@app.get(
+# Полнотекстовый поиск по названиям и описаниям всего каталога
+@router.get("/api/v1/search", response_model=schemas.SearchPage)
+def search_catalog(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(crud.PAGE_SIZE, ge=1, le=crud.MAX_PAGE_SIZE),
+    after: str | None = Query(None, regex=crud.SEARCH_CURSOR_REGEX),
+    db: Session = Depends(get_read_db),
+):
+    return crud.search_catalog(q, limit, after, db)
+
+
+@router.get(
     "/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}",
     response_model=schemas.Dish,
+    dependencies=[check_etag(crud.dish_version_query, cache.dish_key)],
 )
 def get_dish_for_menu_by_id(
-    menu_id: str, submenu_id: str, dish_id: str, db: Session = Depends(get_db)
+    menu_id: str,
+    submenu_id: str,
+    dish_id: str,
+    db: Session = Depends(get_read_db),
 ):
-    dish_db = crud.get_dish_by_id(menu_id, submenu_id, dish_id, db)
+    entry = snapshot.lookup(cache.dish_key(menu_id, submenu_id, dish_id))
+    if entry is not None:
+        return snapshot.respond(entry)
+    dish_db = crud.cached_get_dish_by_id(menu_id, submenu_id, dish_id, db)
 
     if dish_db is None:
-        return JSONResponse(
-            status_code=404, content={"detail": "dish not found"}
-        )
+        return handlers.not_found("dish")
 
     return dish_db
 
 
-@app.post(
+@router.post(
     "/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes",
     response_model=schemas.Dish,
     status_code=201,
@@ -177,10 +391,14 @@ def create_dish(
     db: Session = Depends(get_db),
 ):
     dish_db = crud.create_dish(menu_id, submenu_id, dish, db)
+
+    if dish_db is None:
+        return handlers.not_found("submenu")
+
     return dish_db
 
 
-@app.patch(
+@router.patch(
     "/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}",
     response_model=schemas.Dish,
 )
@@ -194,20 +412,135 @@ def update_dish(
     dish_db = crud.get_dish_by_id(menu_id, submenu_id, dish_id, db)
 
     if dish_db is None:
-        return JSONResponse(
-            status_code=404, content={"detail": "dish not found"}
-        )
+        return handlers.not_found("dish")
 
     dish_db = crud.update_dish(dish_db, new_dish, db)
     return dish_db
 
 
-@app.delete("/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}")
+@router.delete("/api/v1/menus/{menu_id}/submenus/{submenu_id}/dishes/{dish_id}")
 def delete_dish(
     menu_id: str, submenu_id: str, dish_id: str, db: Session = Depends(get_db)
 ):
     crud.delete_dish(menu_id, submenu_id, dish_id, db)
-    return JSONResponse(
-        status_code=200,
-        content={"status": True, "message": "The dish has been deleted"},
+    return handlers.deleted("dish")
+
+
+# Служебная статистика пулов соединений
+def get_pool_stats():
+    return pool.get_pool_stats()
+
+
+def get_admission_stats():
+    return admission.get_stats()
+
+
+# Метрики в текстовом формате Prometheus
+def get_metrics():
+    return PlainTextResponse(
+        metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE
+    )
+
+
+# Движок, пул и схема БД создаются при запуске приложения,
+# поэтому импорт пакета не обращается к БД
+def startup() -> None:
+    engine = database.init_engine()
+    database.wait_for_database(engine)
+    migrations.migrate(engine)
+
+    settings = get_snapshot_settings()
+    if settings.enabled:
+        # Снимок только читает БД: во встроенном режиме SQLite он берёт
+        # соединения для чтения и не ждёт единственное соединение записи,
+        # занятое другими запросами на изменение. Публикация идёт после
+        # фиксации, поэтому в WAL читатель уже видит изменения
+        session_factory = SessionLocal
+        if database.reader is not None:
+            session_factory = database.reader.session
+        snapshot.configure(
+            settings.path, session_factory, settings.compact_ratio
+        )
+        snapshot.rebuild()
+
+
+async def shutdown() -> None:
+    await database.dispose_engine()
+
+
+def create_app() -> FastAPI:
+    # Срок запроса переносится в тайм-аут SQL-запросов, по его истечении
+    # сессия откатывается и клиент получает 504
+    dependencies = []
+    if get_deadline_settings().enabled:
+        deadlines.install()
+        dependencies.append(Depends(deadlines.start))
+
+    changes_settings = get_changes_settings()
+    changes_enabled = changes_settings.enabled
+    if changes_enabled and changes_settings.workers > 1:
+        logger.warning(
+            "change feed disabled: %d workers do not share events",
+            changes_settings.workers,
+        )
+        changes_enabled = False
+    changes.configure(changes_settings.buffer_size, changes_enabled)
+
+    app = FastAPI(
+        on_startup=[startup],
+        on_shutdown=[shutdown],
+        dependencies=dependencies,
+        default_response_class=responses.default_response_class(),
+    )
+    app.add_exception_handler(
+        deadlines.DeadlineExceeded, deadlines.handle_expired
     )
+    app.get("/internal/pool", include_in_schema=False)(get_pool_stats)
+    app.get("/internal/admission", include_in_schema=False)(
+        get_admission_stats
+    )
+    app.get("/metrics", include_in_schema=False)(get_metrics)
+
+    settings = get_response_settings()
+    if settings.compression:
+        app.add_middleware(
+            compression.CompressionMiddleware,
+            minimum_size=settings.compression_min_size,
+            gzip_level=settings.gzip_level,
+            brotli_quality=settings.brotli_quality,
+        )
+
+    querylog_settings = get_querylog_settings()
+    if querylog_settings.enabled:
+        app.add_middleware(
+            querylog.QueryLogMiddleware,
+            max_queries=querylog_settings.max_queries,
+            repeat_threshold=querylog_settings.repeat_threshold,
+        )
+
+    admission_settings = get_admission_settings()
+    if admission_settings.enabled:
+        app.add_middleware(
+            admission.AdmissionMiddleware,
+            limit=admission_settings.limit,
+            classes=admission.classes_from_settings(admission_settings),
+            retry_after=admission_settings.retry_after,
+        )
+
+    metrics.install()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    # В режиме DB_ASYNC=1 те же маршруты обслуживаются асинхронными
+    # обработчиками; маршруты без обращения к БД общие
+    app.include_router(handlers.router)
+    if database.ASYNC_MODE:
+        from menu.async_api import router as async_router
+
+        app.include_router(async_router)
+    else:
+        app.include_router(router)
+
+    return app
+
+
+app = create_app()
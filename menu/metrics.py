@@ -0,0 +1,290 @@
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from time import perf_counter
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from menu import admission, pool
+
+# Границы корзин гистограмм (секунды и число запросов к БД)
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Маршрут не найден: отдельная метка вместо пути, чтобы число рядов
+# не росло от произвольных URL
+UNMATCHED = "unmatched"
+
+
+# Запросы к БД в рамках одного HTTP-запроса
+class QueryStats:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+_query_stats: ContextVar[QueryStats | None] = ContextVar(
+    "query_stats", default=None
+)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    # Накопленные значения для le="..." в формате Prometheus
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield str(bound), total
+        yield "+Inf", self.count
+
+
+class RequestMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+            self.queries = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+            self.db_time = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+            self.requests = defaultdict(int)
+
+    def observe(
+        self,
+        method: str,
+        route: str,
+        status: int,
+        seconds: float,
+        stats: QueryStats,
+    ) -> None:
+        key = (method, route)
+        with self._lock:
+            self.latency[key].observe(seconds)
+            self.queries[key].observe(stats.count)
+            self.db_time[key].observe(stats.seconds)
+            self.requests[(method, route, status)] += 1
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            _counter(
+                lines,
+                "http_requests_total",
+                "Requests by route template and status code.",
+                self.requests.items(),
+            )
+            _counter(
+                lines,
+                "http_request_errors_total",
+                "Responses with status code 400 and above.",
+                (
+                    (labels, value)
+                    for labels, value in self.requests.items()
+                    if labels[2] >= 400
+                ),
+            )
+            _histogram(
+                lines,
+                "http_request_duration_seconds",
+                "Request latency by route template.",
+                self.latency,
+            )
+            _histogram(
+                lines,
+                "http_request_db_queries",
+                "SQL statements executed per request.",
+                self.queries,
+            )
+            _histogram(
+                lines,
+                "http_request_db_seconds",
+                "Cumulative SQL execution time per request.",
+                self.db_time,
+            )
+        _pool_series(lines, pool.get_pool_stats())
+        _admission_series(lines, admission.get_stats())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = RequestMetrics()
+
+
+def _escape(value) -> str:
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+
+
+def _counter(lines, name, help_text, items) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for (method, route, status), value in items:
+        labels = _labels(method=method, route=route, status=status)
+        lines.append(f"{name}{{{labels}}} {value}")
+
+
+def _histogram(lines, name, help_text, histograms) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for (method, route), histogram in histograms.items():
+        labels = _labels(method=method, route=route)
+        for bound, value in histogram.cumulative():
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {value}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+
+# Статистика пулов из menu/pool.py: имя ряда и тип для каждого поля
+POOL_SERIES = {
+    "connects": ("db_pool_connects_total", "counter"),
+    "checkouts": ("db_pool_checkouts_total", "counter"),
+    "checkins": ("db_pool_checkins_total", "counter"),
+    "invalidated": ("db_pool_invalidated_total", "counter"),
+    "timeouts": ("db_pool_timeouts_total", "counter"),
+    "wait_total": ("db_pool_wait_seconds_total", "counter"),
+    "wait_max": ("db_pool_wait_seconds_max", "gauge"),
+    "checked_out": ("db_pool_checked_out", "gauge"),
+    "checked_in": ("db_pool_checked_in", "gauge"),
+    "size": ("db_pool_size", "gauge"),
+    "overflow": ("db_pool_overflow", "gauge"),
+}
+
+
+def _pool_series(lines, pools: dict[str, dict]) -> None:
+    for field, (name, kind) in POOL_SERIES.items():
+        values = [
+            (pool_name, stats[field])
+            for pool_name, stats in pools.items()
+            if field in stats
+        ]
+        if not values:
+            continue
+        lines.append(f"# TYPE {name} {kind}")
+        for pool_name, value in values:
+            lines.append(f"{name}{{{_labels(pool=pool_name)}}} {value}")
+
+
+# Статистика ограничителя из menu/admission.py по классам запросов
+ADMISSION_SERIES = {
+    "queued": ("admission_queued", "gauge"),
+    "admitted": ("admission_admitted_total", "counter"),
+    "rejected_queue_full": ("admission_rejected_queue_full_total", "counter"),
+    "rejected_timeout": ("admission_rejected_timeout_total", "counter"),
+}
+
+
+def _admission_series(lines, stats: dict | None) -> None:
+    if stats is None:
+        return
+    lines.append("# TYPE admission_limit gauge")
+    lines.append(f"admission_limit {stats['limit']}")
+    lines.append("# TYPE admission_in_flight gauge")
+    lines.append(f"admission_in_flight {stats['in_flight']}")
+    for field, (name, kind) in ADMISSION_SERIES.items():
+        lines.append(f"# TYPE {name} {kind}")
+        for class_name, values in stats["classes"].items():
+            labels = _labels(**{"class": class_name})
+            lines.append(f"{name}{{{labels}}} {values[field]}")
+
+
+# Подсчёт запросов и времени в БД. События вешаются на класс Engine,
+# поэтому учитываются все движки (основной, асинхронный, тестовый).
+def _before_cursor_execute(conn, cursor, statement, params, context, many):
+    if _query_stats.get() is not None:
+        context._metrics_start = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, params, context, many):
+    stats = _query_stats.get()
+    start = getattr(context, "_metrics_start", None)
+    if stats is not None and start is not None:
+        stats.count += 1
+        stats.seconds += perf_counter() - start
+
+
+def install() -> None:
+    if not event.contains(
+        Engine, "before_cursor_execute", _before_cursor_execute
+    ):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# Время, код ответа и запросы к БД каждого HTTP-запроса. Метка route —
+# шаблон пути маршрута FastAPI (например, /api/v1/menus/{menu_id}).
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp, registry: RequestMetrics = REGISTRY):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _query_stats.set(stats)
+        status = 500
+        start = perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = perf_counter() - start
+            _query_stats.reset(token)
+            route = scope.get("route")
+            self.registry.observe(
+                scope["method"],
+                route.path if route is not None else UNMATCHED,
+                status,
+                seconds,
+                stats,
+            )
@@ -0,0 +1,356 @@
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Callable, NamedTuple
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    inspect,
+    text,
+)
+from sqlalchemy.engine import Connection, Engine
+
+from menu import search
+from menu.schemas import price_to_cents
+
+
+# Версионные миграции схемы. Каждая миграция идемпотентна, чтобы её можно
+# было применить и к базе, созданной раньше через create_all.
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+    # Нетранзакционные миграции (CREATE INDEX CONCURRENTLY в PostgreSQL)
+    # выполняются в режиме AUTOCOMMIT
+    transactional: bool = True
+
+
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Произвольный ключ блокировки, чтобы несколько воркеров
+# не применяли миграции одновременно
+ADVISORY_LOCK_ID = 7_301_202
+
+
+def _initial_schema(conn: Connection) -> None:
+    metadata = MetaData()
+    Table(
+        "menu",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("title", String(40), nullable=False),
+        Column("description", String(120), nullable=False),
+        Column("submenus_count", Integer, nullable=False),
+        Column("dishes_count", Integer, nullable=False),
+    )
+    Table(
+        "submenu",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("menu_id", ForeignKey("menu.id"), nullable=False),
+        Column("title", String(40), nullable=False),
+        Column("description", String(120), nullable=False),
+        Column("dishes_count", Integer, nullable=False),
+    )
+    Table(
+        "dish",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("menu_id", ForeignKey("menu.id"), nullable=False),
+        Column("submenu_id", ForeignKey("submenu.id"), nullable=False),
+        Column("title", String(40), nullable=False),
+        Column("description", String(120), nullable=False),
+        Column("price", String(10), nullable=False),
+    )
+    metadata.create_all(conn, checkfirst=True)
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    columns = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column not in columns:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _create_index(conn: Connection, name: str, table: str, columns) -> None:
+    concurrently = "CONCURRENTLY " if conn.dialect.name == "postgresql" else ""
+    # Прерванный CREATE INDEX CONCURRENTLY оставляет индекс INVALID,
+    # который IF NOT EXISTS считает созданным: такой индекс пересоздаётся
+    if concurrently and _index_invalid(conn, name):
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    conn.execute(
+        text(
+            f"CREATE INDEX {concurrently}IF NOT EXISTS {name} "
+            f"ON {table} ({', '.join(columns)})"
+        )
+    )
+
+
+def _index_invalid(conn: Connection, name: str) -> bool:
+    res = conn.execute(
+        text(
+            "SELECT NOT indisvalid FROM pg_index "
+            "WHERE indexrelid = to_regclass(:name)"
+        ),
+        {"name": name},
+    )
+    return bool(res.scalar())
+
+
+# Добавление столбца с постоянным значением по умолчанию не переписывает
+# таблицу (PostgreSQL 11+, SQLite); старые строки получают начало эпохи
+def _add_updated_at(conn: Connection) -> None:
+    ddl = (
+        f"{DateTime().compile(dialect=conn.dialect)} NOT NULL "
+        "DEFAULT '1970-01-01 00:00:00'"
+    )
+    for table in ("menu", "submenu", "dish"):
+        _add_column(conn, table, "updated_at", ddl)
+
+
+def _add_lookup_indexes(conn: Connection) -> None:
+    _create_index(conn, "ix_submenu_menu_id_id", "submenu", ("menu_id", "id"))
+    _create_index(
+        conn,
+        "ix_dish_menu_id_submenu_id_id",
+        "dish",
+        ("menu_id", "submenu_id", "id"),
+    )
+
+
+def _add_version(conn: Connection) -> None:
+    for table in ("menu", "submenu", "dish"):
+        _add_column(conn, table, "version", "INTEGER NOT NULL DEFAULT 1")
+
+
+# Копейки заполняются из строковой цены пачками по id; нечисловые цены
+# остаются NULL. Миграция нетранзакционная: каждая пачка записывается
+# одним UPDATE и фиксируется сразу, а после сбоя заполнение продолжается
+# с незаполненных строк (price_cents IS NULL).
+PRICE_BACKFILL_BATCH = 10000
+
+
+def _add_price_cents(conn: Connection) -> None:
+    _add_column(conn, "dish", "price_cents", "BIGINT")
+
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT id, price FROM dish "
+                "WHERE id > :last_id AND price_cents IS NULL "
+                "ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": PRICE_BACKFILL_BATCH},
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        cents = {}
+        for dish_id, price in rows:
+            try:
+                cents[int(dish_id)] = price_to_cents(price)
+            except ValueError:
+                continue
+        if cents:
+            # В запрос подставляются только целые числа
+            cases = " ".join(
+                f"WHEN {dish_id} THEN {int(value)}"
+                for dish_id, value in cents.items()
+            )
+            ids = ", ".join(str(dish_id) for dish_id in cents)
+            conn.execute(
+                text(
+                    f"UPDATE dish SET price_cents = CASE id {cases} END "
+                    f"WHERE id IN ({ids})"
+                )
+            )
+
+
+def _add_price_index(conn: Connection) -> None:
+    _create_index(
+        conn, "ix_dish_price_cents_id", "dish", ("price_cents", "id")
+    )
+
+
+# Поисковый индекс создаётся и заполняется по текущим данным каталога
+def _add_search_index(conn: Connection) -> None:
+    search.create_index(conn)
+    search.rebuild(conn)
+
+
+# Внешние ключи потомков с ON DELETE CASCADE. В PostgreSQL новое
+# ограничение сначала добавляется как NOT VALID (без проверки строк под
+# блокировкой таблицы), затем удаляется старое и новое проверяется
+# командой VALIDATE, так что таблица ни на миг не остаётся без внешнего
+# ключа. SQLite не меняет ограничения без пересоздания таблицы, там
+# потомков удаляют явные DELETE из crud.
+CASCADE_FOREIGN_KEYS = (
+    ("submenu", "menu_id", "menu"),
+    ("dish", "menu_id", "menu"),
+    ("dish", "submenu_id", "submenu"),
+)
+
+
+def _cascade_foreign_keys(conn: Connection) -> None:
+    if conn.dialect.name != "postgresql":
+        return
+
+    inspector = inspect(conn)
+    for table, column, referred in CASCADE_FOREIGN_KEYS:
+        foreign_keys = [
+            fk
+            for fk in inspector.get_foreign_keys(table)
+            if fk["constrained_columns"] == [column]
+        ]
+        cascade = [
+            fk["name"]
+            for fk in foreign_keys
+            if fk["options"].get("ondelete", "").upper() == "CASCADE"
+        ]
+        if cascade:
+            name = cascade[0]
+        else:
+            name = f"{table}_{column}_cascade_fkey"
+            conn.execute(
+                text(
+                    f"ALTER TABLE {table} ADD CONSTRAINT {name} "
+                    f"FOREIGN KEY ({column}) REFERENCES {referred} (id) "
+                    "ON DELETE CASCADE NOT VALID"
+                )
+            )
+        for fk in foreign_keys:
+            if fk["name"] not in cascade:
+                conn.execute(
+                    text(f"ALTER TABLE {table} DROP CONSTRAINT {fk['name']}")
+                )
+        conn.execute(text(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}"))
+
+
+# Журнал удалений: удаление сдвигает Last-Modified каталога и попадает
+# в инкрементальную выгрузку
+def _add_tombstones(conn: Connection) -> None:
+    metadata = MetaData()
+    Table(
+        "tombstone",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("kind", String(10), nullable=False),
+        Column("entity_id", Integer, nullable=False),
+        Column("menu_id", Integer, nullable=False),
+        Column("submenu_id", Integer),
+        Column("deleted_at", DateTime, nullable=False),
+        Index("ix_tombstone_deleted_at", "deleted_at"),
+    )
+    metadata.create_all(conn, checkfirst=True)
+
+
+# Последняя запись об удалении в меню входит в ETag его потомков
+def _add_tombstone_menu_index(conn: Connection) -> None:
+    _create_index(
+        conn, "ix_tombstone_menu_id_id", "tombstone", ("menu_id", "id")
+    )
+
+
+MIGRATIONS = [
+    Migration(1, "initial schema", _initial_schema),
+    Migration(2, "updated_at columns", _add_updated_at),
+    Migration(3, "lookup indexes", _add_lookup_indexes, transactional=False),
+    Migration(4, "version columns", _add_version),
+    Migration(5, "dish price in cents", _add_price_cents, transactional=False),
+    Migration(6, "dish price index", _add_price_index, transactional=False),
+    Migration(7, "search index", _add_search_index),
+    Migration(
+        8,
+        "cascade foreign keys",
+        _cascade_foreign_keys,
+        transactional=False,
+    ),
+    Migration(9, "tombstones", _add_tombstones),
+    Migration(
+        10,
+        "tombstone menu index",
+        _add_tombstone_menu_index,
+        transactional=False,
+    ),
+]
+
+
+def current_version(conn: Connection) -> int:
+    schema_version.create(conn, checkfirst=True)
+    res = conn.execute(text("SELECT max(version) FROM schema_version"))
+    return res.scalar() or 0
+
+
+# Применение всех недостающих миграций (или до версии target)
+def migrate(engine: Engine, target: int | None = None) -> list[int]:
+    applied = []
+    postgresql = engine.dialect.name == "postgresql"
+    # Отдельное соединение держит advisory-блокировку только в PostgreSQL:
+    # у встроенного режима SQLite одно соединение для записи
+    with engine.connect() if postgresql else nullcontext() as lock_conn:
+        if postgresql:
+            lock_conn.execute(
+                text("SELECT pg_advisory_lock(:id)"), {"id": ADVISORY_LOCK_ID}
+            )
+        try:
+            with engine.begin() as conn:
+                version = current_version(conn)
+
+            for migration in MIGRATIONS:
+                if migration.version <= version:
+                    continue
+                if target is not None and migration.version > target:
+                    break
+                _apply(engine, migration)
+                applied.append(migration.version)
+        finally:
+            if postgresql:
+                lock_conn.execute(
+                    text("SELECT pg_advisory_unlock(:id)"),
+                    {"id": ADVISORY_LOCK_ID},
+                )
+    return applied
+
+
+def _apply(engine: Engine, migration: Migration) -> None:
+    if migration.transactional:
+        with engine.begin() as conn:
+            migration.upgrade(conn)
+            _record(conn, migration)
+        return
+
+    with engine.connect().execution_options(
+        isolation_level="AUTOCOMMIT"
+    ) as conn:
+        migration.upgrade(conn)
+        _record(conn, migration)
+
+
+def _record(conn: Connection, migration: Migration) -> None:
+    conn.execute(
+        schema_version.insert().values(
+            version=migration.version,
+            description=migration.description,
+            applied_at=datetime.utcnow(),
+        )
+    )
+
+
+if __name__ == "__main__":
+    from menu.database import init_engine
+
+    for version in migrate(init_engine()):
+        print(f"applied migration {version}")
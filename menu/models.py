@@ -1,4 +1,14 @@
-from sqlalchemy import Column, ForeignKey, Integer, String
+from datetime import datetime
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+)
 from sqlalchemy.orm import relationship
 
 from menu.database import Base
@@ -12,47 +22,115 @@ class Menu(Base):
     description = Column(String(120), nullable=False)
     submenus_count = Column(Integer, nullable=False)
     dishes_count = Column(Integer, nullable=False)
+    updated_at = Column(
+        DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+    )
+    # Растёт при изменении сущности и её потомков, используется для ETag
+    version = Column(Integer, nullable=False, default=1)
 
+    # Потомки удаляются на стороне БД (ON DELETE CASCADE и явные DELETE
+    # в crud), без загрузки в сессию
     submenu = relationship(
         "Submenu",
         back_populates="menu",
         cascade="all, delete",
+        passive_deletes=True,
+        order_by="Submenu.id",
     )
     dishes = relationship(
         "Dish",
         back_populates="menu",
         cascade="all, delete",
+        passive_deletes=True,
     )
 
+    # Имя поля во вложенной выдаче (schemas.MenuTree)
+    @property
+    def submenus(self):
+        return self.submenu
+
 
 class Submenu(Base):
     __tablename__ = "submenu"
+    # Выборки подменю идут по menu_id (и id)
+    __table_args__ = (Index("ix_submenu_menu_id_id", "menu_id", "id"),)
 
     id = Column(Integer, primary_key=True)
-    menu_id = Column(ForeignKey("menu.id"), nullable=False)
+    menu_id = Column(ForeignKey("menu.id", ondelete="CASCADE"), nullable=False)
 
     title = Column(String(40), nullable=False)
     description = Column(String(120), nullable=False)
     dishes_count = Column(Integer, nullable=False)
+    updated_at = Column(
+        DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+    )
+    # Растёт при изменении сущности и её потомков, используется для ETag
+    version = Column(Integer, nullable=False, default=1)
 
     menu = relationship("Menu", back_populates="submenu")
     dishes = relationship(
         "Dish",
         back_populates="submenu",
         cascade="all, delete",
+        passive_deletes=True,
+        order_by="Dish.id",
     )
 
 
 class Dish(Base):
     __tablename__ = "dish"
+    # Выборки блюд идут по menu_id и submenu_id (и id), фильтры
+    # и сортировка по цене — по price_cents (и id)
+    __table_args__ = (
+        Index("ix_dish_menu_id_submenu_id_id", "menu_id", "submenu_id", "id"),
+        Index("ix_dish_price_cents_id", "price_cents", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
-    menu_id = Column(ForeignKey("menu.id"), nullable=False)
-    submenu_id = Column(ForeignKey("submenu.id"), nullable=False)
+    menu_id = Column(ForeignKey("menu.id", ondelete="CASCADE"), nullable=False)
+    submenu_id = Column(
+        ForeignKey("submenu.id", ondelete="CASCADE"), nullable=False
+    )
 
     title = Column(String(40), nullable=False)
     description = Column(String(120), nullable=False)
     price = Column(String(10), nullable=False)
+    # Цена в копейках; NULL у старых строк с нечисловой ценой
+    price_cents = Column(BigInteger)
+    updated_at = Column(
+        DateTime,
+        nullable=False,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+    )
+    # Растёт при изменении сущности и её потомков, используется для ETag
+    version = Column(Integer, nullable=False, default=1)
 
     submenu = relationship("Submenu", back_populates="dishes")
     menu = relationship("Menu", back_populates="dishes")
+
+
+# Запись об удалении сущности для Last-Modified и инкрементальной
+# выгрузки каталога. Удаление меню или подменю записывается только для
+# него самого: потомки удаляются вместе с ним.
+class Tombstone(Base):
+    __tablename__ = "tombstone"
+    # Выгрузка идёт по deleted_at, ETag — по последней записи меню
+    __table_args__ = (
+        Index("ix_tombstone_deleted_at", "deleted_at"),
+        Index("ix_tombstone_menu_id_id", "menu_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # menu | submenu | dish
+    kind = Column(String(10), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    menu_id = Column(Integer, nullable=False)
+    submenu_id = Column(Integer)
+    deleted_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,135 @@
+import threading
+from time import perf_counter
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool, QueuePool
+
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidated = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.waits += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def as_dict(self, pool) -> dict:
+        with self._lock:
+            data = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "checked_out": self.checkouts - self.checkins,
+                "invalidated": self.invalidated,
+                "timeouts": self.timeouts,
+                "wait_total": self.wait_total,
+                "wait_max": self.wait_max,
+                "wait_avg": self.wait_total / self.waits if self.waits else 0,
+            }
+        # Размер и переполнение есть только у пула с очередью
+        if isinstance(pool, QueuePool):
+            data["size"] = pool.size()
+            data["checked_in"] = pool.checkedin()
+            data["overflow"] = max(0, pool.overflow())
+        return data
+
+
+# Замер времени ожидания соединения и таймаутов при выдаче из пула
+class _TimedConnectMixin:
+    stats: PoolStats | None = None
+
+    def connect(self):
+        start = perf_counter()
+        timed_out = False
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            if self.stats is not None:
+                self.stats.record_wait(perf_counter() - start, timed_out)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class InstrumentedQueuePool(_TimedConnectMixin, QueuePool):
+    pass
+
+
+class InstrumentedNullPool(_TimedConnectMixin, NullPool):
+    pass
+
+
+_pools: dict[str, tuple[Engine, PoolStats, list]] = {}
+
+
+# Подписка на события пула движка, статистика регистрируется под именем name
+def instrument(name: str, engine: Engine) -> PoolStats:
+    stats = PoolStats()
+    if isinstance(engine.pool, _TimedConnectMixin):
+        engine.pool.stats = stats
+
+    def on_connect(dbapi_connection, connection_record):
+        stats.incr("connects")
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.incr("checkouts")
+
+    def on_checkin(dbapi_connection, connection_record):
+        stats.incr("checkins")
+
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        stats.incr("invalidated")
+
+    listeners = [
+        ("connect", on_connect),
+        ("checkout", on_checkout),
+        ("checkin", on_checkin),
+        ("invalidate", on_invalidate),
+    ]
+    for identifier, fn in listeners:
+        event.listen(engine, identifier, fn)
+
+    unregister(name)
+    _pools[name] = (engine, stats, listeners)
+    return stats
+
+
+# Снятие подписки и удаление статистики пула из реестра
+def unregister(name: str) -> None:
+    entry = _pools.pop(name, None)
+    if entry is None:
+        return
+    engine, stats, listeners = entry
+    for identifier, fn in listeners:
+        event.remove(engine, identifier, fn)
+    if getattr(engine.pool, "stats", None) is stats:
+        engine.pool.stats = None
+
+
+def get_pool_stats() -> dict[str, dict]:
+    return {
+        name: stats.as_dict(engine.pool)
+        for name, (engine, stats, _) in _pools.items()
+    }
@@ -0,0 +1,150 @@
+import logging
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Литералы и параметры заменяются на ?, списки параметров (IN (...),
+# VALUES (...)) сворачиваются, чтобы одинаковые по форме запросы совпадали
+_NORMALIZE = (
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"%\(\w+\)s|\$\d+|(?<!:):\w+"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\?(?:\s*,\s*\?)+"), "?"),
+    (re.compile(r"\s+"), " "),
+)
+
+
+def shape(statement: str) -> str:
+    for pattern, replacement in _NORMALIZE:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.statements: list[str] = []
+        self._lock = threading.Lock()
+
+    def add(self, statement: str) -> None:
+        with self._lock:
+            self.statements.append(statement)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def shapes(self) -> Counter:
+        return Counter(shape(statement) for statement in self.statements)
+
+    # Формы запросов, выполненные не меньше threshold раз (признак N+1)
+    def repeated(self, threshold: int = 2) -> dict[str, int]:
+        return {
+            statement: count
+            for statement, count in self.shapes().items()
+            if count >= threshold
+        }
+
+    def report(self) -> str:
+        lines = [f"{self.count} queries:"]
+        lines.extend(
+            f"  {count} x {statement}"
+            for statement, count in self.shapes().most_common()
+        )
+        return "\n".join(lines)
+
+
+# Записываются запросы всех потоков, пока активен record() (тесты,
+# вызовы crud из скриптов), и запросы текущего HTTP-запроса
+_recorders: list[QueryRecorder] = []
+_request_recorder: ContextVar[QueryRecorder | None] = ContextVar(
+    "request_recorder", default=None
+)
+
+
+def _after_cursor_execute(conn, cursor, statement, params, context, many):
+    for recorder in _recorders:
+        recorder.add(statement)
+    recorder = _request_recorder.get()
+    if recorder is not None:
+        recorder.add(statement)
+
+
+def install() -> None:
+    if not event.contains(
+        Engine, "after_cursor_execute", _after_cursor_execute
+    ):
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def record() -> Iterator[QueryRecorder]:
+    install()
+    recorder = QueryRecorder()
+    _recorders.append(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorders.remove(recorder)
+
+
+# Проверка бюджета запросов в тестах:
+#     with assert_max_queries(2):
+#         client.get("/api/v1/menus")
+@contextmanager
+def assert_max_queries(
+    limit: int, max_repeats: int | None = None
+) -> Iterator[QueryRecorder]:
+    with record() as recorder:
+        yield recorder
+    if recorder.count > limit:
+        raise AssertionError(
+            f"expected at most {limit} queries, got {recorder.report()}"
+        )
+    if max_repeats is not None and recorder.repeated(max_repeats + 1):
+        raise AssertionError(
+            f"statement repeated more than {max_repeats} times (N+1), "
+            f"got {recorder.report()}"
+        )
+
+
+# Предупреждение в лог, если запрос выполнил больше max_queries
+# SQL-запросов или повторил одну форму запроса repeat_threshold раз
+class QueryLogMiddleware:
+    def __init__(
+        self, app: ASGIApp, max_queries: int = 50, repeat_threshold: int = 5
+    ):
+        self.app = app
+        self.max_queries = max_queries
+        self.repeat_threshold = repeat_threshold
+        install()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        recorder = QueryRecorder()
+        token = _request_recorder.set(recorder)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_recorder.reset(token)
+            self.check(scope, recorder)
+
+    def check(self, scope: Scope, recorder: QueryRecorder) -> None:
+        route = scope.get("route")
+        path = route.path if route is not None else scope["path"]
+        repeated = recorder.repeated(self.repeat_threshold)
+        if recorder.count > self.max_queries or repeated:
+            logger.warning(
+                "%s %s: %s", scope["method"], path, recorder.report()
+            )
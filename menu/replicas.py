@@ -0,0 +1,98 @@
+import itertools
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.orm import Session, sessionmaker
+
+
+# Сессия чтения из реплики. Если реплика отказала на запросе, она
+# помечается недоступной, а запрос повторяется на основной БД (primary),
+# так что GET не получает 500 из-за упавшей реплики. info["lagging"] —
+# данные могут отставать от основной БД (см. cache.read_through).
+class ReplicaSession(Session):
+    replica: "Replica | None" = None
+    primary: Engine | None = None
+
+    def execute(self, *args, **kwargs):
+        try:
+            return super().execute(*args, **kwargs)
+        except OperationalError:
+            if self.replica is None or self.primary is None:
+                raise
+            self.replica.mark_failed()
+            self.rollback()
+            self.replica = None
+            self.bind = self.primary
+            self.info["lagging"] = False
+            return super().execute(*args, **kwargs)
+
+
+class Replica:
+    # lagging=False у соединений чтения той же базы (встроенный режим
+    # SQLite): их данные не отстают от записи
+    def __init__(self, name: str, engine: Engine, lagging: bool = True):
+        self.name = name
+        self.engine = engine
+        self.session = sessionmaker(
+            class_=ReplicaSession,
+            autocommit=False,
+            autoflush=False,
+            bind=engine,
+            info={"lagging": lagging},
+        )
+        self.healthy = True
+        self.checked_at: float | None = None
+
+    # Сессия, которая при отказе реплики дочитывает из основной БД
+    def failover_session(self, primary: Engine) -> ReplicaSession:
+        session = self.session()
+        session.replica, session.primary = self, primary
+        return session
+
+    def check(self) -> bool:
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            self.healthy = True
+        except DBAPIError:
+            self.healthy = False
+        self.checked_at = time.monotonic()
+        return self.healthy
+
+    def mark_failed(self) -> None:
+        self.healthy = False
+        self.checked_at = time.monotonic()
+
+
+# Реплики выдаются по кругу. Состояние реплики проверяется запросом
+# SELECT 1 не чаще раза в check_interval секунд, недоступные пропускаются.
+class ReplicaSet:
+    def __init__(self, replicas: list[Replica], check_interval: float = 5.0):
+        self.replicas = replicas
+        self.check_interval = check_interval
+        self._cycle = itertools.cycle(replicas)
+        self._lock = threading.Lock()
+
+    def _due(self, replica: Replica) -> bool:
+        return (
+            replica.checked_at is None
+            or time.monotonic() - replica.checked_at >= self.check_interval
+        )
+
+    # None, если доступных реплик нет: чтение идёт в основную БД
+    def pick(self) -> Replica | None:
+        for _ in range(len(self.replicas)):
+            with self._lock:
+                replica = next(self._cycle)
+            if self._due(replica):
+                replica.check()
+            if replica.healthy:
+                return replica
+        return None
+
+    def dispose(self) -> None:
+        for replica in self.replicas:
+            replica.engine.dispose()
@@ -0,0 +1,20 @@
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+
+from menu.dependencies import get_response_settings
+
+
+def fast_json_enabled() -> bool:
+    return get_response_settings().fast_json
+
+
+def default_response_class() -> type[Response]:
+    if fast_json_enabled():
+        return ORJSONResponse
+    return JSONResponse
+
+
+# Список уже состоит из словарей с полями схемы, поэтому отдаётся через
+# orjson без проверки response_model. Заголовки, выставленные
+# зависимостями (ETag), переносятся в ответ.
+def fast_list(content: list[dict], response: Response) -> ORJSONResponse:
+    return ORJSONResponse(content, headers=dict(response.headers))
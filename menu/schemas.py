@@ -1,4 +1,19 @@
-from pydantic import BaseModel
+from decimal import Decimal, InvalidOperation
+
+from pydantic import BaseModel, Field, validator
+
+
+# Цена хранится строкой (как в API) и в копейках для фильтров и сортировки
+def price_to_cents(price: str | Decimal) -> int:
+    try:
+        value = Decimal(price)
+    except InvalidOperation:
+        raise ValueError("price must be a number")
+    if not value.is_finite() or value < 0:
+        raise ValueError("price must be a non-negative number")
+    if value.as_tuple().exponent < -2:
+        raise ValueError("price must have at most two decimal places")
+    return int(value * 100)
 
 
 class DishBase(BaseModel):
@@ -6,6 +21,13 @@ class DishBase(BaseModel):
     description: str
     price: str
 
+    @validator("price")
+    def check_price(cls, value: str) -> str:
+        if len(value) > 10:
+            raise ValueError("price is too long")
+        price_to_cents(value)
+        return value
+
 
 class Dish(DishBase):
     id: str
@@ -42,3 +64,87 @@ class Menu(MenuBase):
 
     class Config:
         orm_mode = True
+
+
+# Меню целиком со вложенными подменю и блюдами
+class SubmenuTree(Submenu):
+    dishes: list[Dish]
+
+
+class MenuTree(Menu):
+    submenus: list[SubmenuTree]
+
+
+# Страница списка при постраничной выдаче по курсору (id последней записи)
+class DishPage(BaseModel):
+    items: list[Dish]
+    next_cursor: str | None
+
+
+class SubmenuPage(BaseModel):
+    items: list[Submenu]
+    next_cursor: str | None
+
+
+class MenuPage(BaseModel):
+    items: list[Menu]
+    next_cursor: str | None
+
+
+# Выборка по списку id: найденные записи в порядке запроса
+# и id, которых нет
+MAX_BATCH_SIZE = 1000
+
+
+class BatchIds(BaseModel):
+    ids: list[str] = Field(..., max_items=MAX_BATCH_SIZE)
+
+
+class DishBatch(BaseModel):
+    items: list[Dish]
+    not_found: list[str]
+
+
+class SubmenuBatch(BaseModel):
+    items: list[Submenu]
+    not_found: list[str]
+
+
+class MenuBatch(BaseModel):
+    items: list[Menu]
+    not_found: list[str]
+
+
+# Результат поиска: меню, подменю или блюдо (kind) и его родители
+class SearchResult(BaseModel):
+    kind: str
+    id: str
+    menu_id: str
+    submenu_id: str | None
+    title: str
+    description: str
+    score: float
+
+
+class SearchPage(BaseModel):
+    items: list[SearchResult]
+    next_cursor: str | None
+
+
+# Документ для массовой загрузки каталога
+class SubmenuImport(SubmenuBase):
+    dishes: list[DishBase] = []
+
+
+class MenuImport(MenuBase):
+    submenus: list[SubmenuImport] = []
+
+
+class CatalogImport(BaseModel):
+    menus: list[MenuImport]
+
+
+class CatalogImportResult(BaseModel):
+    menus: int
+    submenus: int
+    dishes: int
@@ -0,0 +1,217 @@
+import re
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    delete,
+    event,
+    insert,
+    literal,
+    or_,
+    select,
+    text,
+    union_all,
+)
+from sqlalchemy.engine import Connection
+
+from menu import models
+
+# Поисковый индекс по title и description меню, подменю и блюд: в SQLite —
+# виртуальная таблица FTS5, в PostgreSQL — таблица с вычисляемым столбцом
+# tsvector и GIN-индексом. Ключ строки (rowid) кодирует тип и id сущности,
+# поэтому строки индекса обновляются и удаляются по первичному ключу.
+search_index = Table(
+    "search_index",
+    MetaData(),
+    Column("rowid", BigInteger, primary_key=True),
+    Column("kind", String(10), nullable=False),
+    Column("entity_id", Integer, nullable=False),
+    Column("menu_id", Integer, nullable=False),
+    Column("submenu_id", Integer),
+    Column("title", String(40), nullable=False),
+    Column("description", String(120), nullable=False),
+)
+
+KINDS = {"menu": 1, "submenu": 2, "dish": 3}
+
+# Вес совпадения в названии относительно описания (bm25 в SQLite)
+TITLE_WEIGHT = 10.0
+
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+    "title, description, kind UNINDEXED, entity_id UNINDEXED, "
+    "menu_id UNINDEXED, submenu_id UNINDEXED, "
+    "tokenize = 'unicode61 remove_diacritics 2')",
+)
+
+POSTGRESQL_DDL = (
+    "CREATE TABLE IF NOT EXISTS search_index ("
+    "rowid BIGINT PRIMARY KEY, "
+    "kind VARCHAR(10) NOT NULL, "
+    "entity_id INTEGER NOT NULL, "
+    "menu_id INTEGER NOT NULL, "
+    "submenu_id INTEGER, "
+    "title VARCHAR(40) NOT NULL, "
+    "description VARCHAR(120) NOT NULL, "
+    "document tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', title), 'A') || "
+    "setweight(to_tsvector('simple', description), 'B')) STORED)",
+    "CREATE INDEX IF NOT EXISTS ix_search_index_document "
+    "ON search_index USING GIN (document)",
+)
+
+
+def key(kind: str, entity_id):
+    return entity_id * len(KINDS) + KINDS[kind]
+
+
+def create_index(conn: Connection) -> None:
+    if conn.dialect.name == "postgresql":
+        statements = POSTGRESQL_DDL
+    else:
+        statements = SQLITE_DDL
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+def drop_index(conn: Connection) -> None:
+    conn.execute(text("DROP TABLE IF EXISTS search_index"))
+
+
+# Полная перестройка индекса по таблицам каталога (миграция)
+def rebuild(conn: Connection) -> None:
+    conn.execute(delete(search_index))
+    for kind, model in (
+        ("menu", models.Menu),
+        ("submenu", models.Submenu),
+        ("dish", models.Dish),
+    ):
+        conn.execute(
+            insert(search_index).from_select(
+                [c.name for c in search_index.columns],
+                _documents_query(kind, model),
+            )
+        )
+
+
+def _documents_query(kind: str, model):
+    return select(
+        key(kind, model.id),
+        literal(kind),
+        model.id,
+        model.id if kind == "menu" else model.menu_id,
+        model.submenu_id if kind == "dish" else literal(None),
+        model.title,
+        model.description,
+    )
+
+
+# Индекс создаётся и удаляется вместе с таблицами create_all и drop_all
+event.listen(
+    models.Base.metadata,
+    "after_create",
+    lambda target, conn, **kw: create_index(conn),
+)
+event.listen(
+    models.Base.metadata,
+    "before_drop",
+    lambda target, conn, **kw: drop_index(conn),
+)
+
+
+def document(
+    kind: str, entity_id, menu_id, submenu_id, title: str, description: str
+) -> dict:
+    entity_id = int(entity_id)
+    return {
+        "rowid": key(kind, entity_id),
+        "kind": kind,
+        "entity_id": entity_id,
+        "menu_id": int(menu_id),
+        "submenu_id": None if submenu_id is None else int(submenu_id),
+        "title": title,
+        "description": description,
+    }
+
+
+def add(documents: list[dict]):
+    return insert(search_index).values(documents)
+
+
+# В FTS5 нет UPDATE ... ON CONFLICT, строка заменяется удалением и вставкой
+def replace(doc: dict):
+    return (
+        delete(search_index).filter(search_index.c.rowid == doc["rowid"]),
+        add([doc]),
+    )
+
+
+def remove_dish(dish_id: str):
+    return delete(search_index).filter(
+        search_index.c.rowid == key("dish", int(dish_id))
+    )
+
+
+# Строки подменю и его блюд удаляются до удаления самих записей:
+# ключи выбираются подзапросами по индексам таблиц каталога
+def remove_submenu(menu_id: str, submenu_id: str):
+    keys = union_all(
+        select(key("submenu", models.Submenu.id))
+        .filter(models.Submenu.menu_id == menu_id)
+        .filter(models.Submenu.id == submenu_id),
+        select(key("dish", models.Dish.id))
+        .filter(models.Dish.menu_id == menu_id)
+        .filter(models.Dish.submenu_id == submenu_id),
+    )
+    return delete(search_index).filter(search_index.c.rowid.in_(keys))
+
+
+def remove_menu(menu_id: str):
+    keys = union_all(
+        select(key("submenu", models.Submenu.id)).filter(
+            models.Submenu.menu_id == menu_id
+        ),
+        select(key("dish", models.Dish.id)).filter(
+            models.Dish.menu_id == menu_id
+        ),
+    )
+    return delete(search_index).filter(
+        or_(
+            search_index.c.rowid == key("menu", int(menu_id)),
+            search_index.c.rowid.in_(keys),
+        )
+    )
+
+
+# Слова запроса без операторов FTS5 и tsquery; все слова обязательны
+def terms(query: str) -> list[str]:
+    return re.findall(r"\w+", query.lower())
+
+
+SQLITE_SEARCH = f"""
+SELECT kind, entity_id, menu_id, submenu_id, title, description,
+       -bm25(search_index, {TITLE_WEIGHT}, 1.0) AS score
+FROM search_index
+WHERE search_index MATCH :query
+ORDER BY score DESC, rowid
+LIMIT :limit OFFSET :offset
+"""
+
+POSTGRESQL_SEARCH = """
+SELECT kind, entity_id, menu_id, submenu_id, title, description,
+       ts_rank(document, query) AS score
+FROM search_index, plainto_tsquery('simple', :query) AS query
+WHERE document @@ query
+ORDER BY score DESC, rowid
+LIMIT :limit OFFSET :offset
+"""
+
+
+def search_statement(dialect: str, words: list[str]):
+    if dialect == "postgresql":
+        return text(POSTGRESQL_SEARCH), " ".join(words)
+    return text(SQLITE_SEARCH), " ".join(f'"{word}"' for word in words)
@@ -0,0 +1,507 @@
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from itertools import groupby
+from typing import Iterable, Iterator, NamedTuple
+
+from fastapi.responses import Response
+from sqlalchemy import func, select
+
+from menu import cache, deadlines, etag, models, schemas
+
+# Снимок каталога в общем файле: готовые JSON-тела ответов GET по ключам
+# кэша (menu/cache.py) вместе с ETag. Файл отображается в память всеми
+# воркерами, тела отдаются срезами memoryview без копирования.
+#
+# Файл — заголовок и журнал записей (ключ, ETag, тело или флаг REMOVED).
+# Записи только дописываются, уже выданные срезы остаются верными.
+# Заголовок хранит поколение и длину опубликованной части журнала;
+# контрольная сумма отличает заголовок, прочитанный во время записи.
+# Разросшийся журнал сжимается в новый файл, который атомарно заменяет
+# старый, а старый помечается флагом RETIRED.
+MAGIC = b"MENUSNP1"
+HEADER = struct.Struct("<8sQQQB")
+HEADER_SIZE = 64
+RETIRED_OFFSET = 32
+RECORD = struct.Struct("<IHIB")
+REMOVED = 1
+CHECK_MASK = 0x5A5A_5A5A_5A5A_5A5A
+# Журнал меньше этого размера не сжимается
+MIN_COMPACT_SIZE = 1 << 20
+
+
+class Entry(NamedTuple):
+    body: memoryview
+    etag: str
+
+
+def _header(generation: int, committed: int) -> bytes:
+    check = generation ^ committed ^ CHECK_MASK
+    return HEADER.pack(MAGIC, generation, committed, check, 0)
+
+
+def _record(key: str, tag: str, body, flags: int = 0) -> bytes:
+    key_bytes, tag_bytes = key.encode(), tag.encode()
+    return (
+        RECORD.pack(len(key_bytes), len(tag_bytes), len(body), flags)
+        + key_bytes
+        + tag_bytes
+        + body
+    )
+
+
+class Snapshot:
+    def __init__(self, path: str, compact_ratio: float = 2.0):
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.generation = 0
+        self._fd: int | None = None
+        self._mm: mmap.mmap | None = None
+        self._view: memoryview | None = None
+        self._committed = HEADER_SIZE
+        # Ключ -> (смещение тела, длина тела, ETag)
+        self._index: dict[str, tuple[int, int, str]] = {}
+        self._live = HEADER_SIZE
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    # Старые отображения не закрываются явно: на них могут ссылаться
+    # отдаваемые срезы, память освобождается вместе с последним срезом
+    def _open(self) -> None:
+        fd = os.open(self.path, os.O_RDONLY)
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = fd
+        self._mm = self._view = None
+        self._map()
+        self._index = {}
+        self._committed = HEADER_SIZE
+        self._live = HEADER_SIZE
+        self.generation = 0
+
+    def _map(self) -> None:
+        size = os.fstat(self._fd).st_size
+        self._mm = mmap.mmap(self._fd, size, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mm)
+
+    def sync(self) -> None:
+        if self._mm is None:
+            self._open()
+        magic, generation, committed, check, retired = HEADER.unpack_from(
+            self._mm
+        )
+        if magic != MAGIC or generation ^ committed ^ CHECK_MASK != check:
+            return
+        if retired:
+            self._open()
+            self.sync()
+            return
+        self.generation = generation
+        if committed == self._committed:
+            return
+        if committed > len(self._mm):
+            self._map()
+        self._read_records(self._committed, committed)
+        self._committed = committed
+
+    def _read_records(self, offset: int, end: int) -> None:
+        mm = self._mm
+        while offset < end:
+            key_len, tag_len, body_len, flags = RECORD.unpack_from(mm, offset)
+            size = RECORD.size + key_len + tag_len + body_len
+            offset += RECORD.size
+            key = mm[offset : offset + key_len].decode()
+            offset += key_len
+            tag = mm[offset : offset + tag_len].decode()
+            offset += tag_len
+
+            previous = self._index.pop(key, None)
+            if previous is not None:
+                self._live -= self._record_size(key, previous)
+            if not flags & REMOVED:
+                self._index[key] = (offset, body_len, tag)
+                self._live += size
+            offset += body_len
+
+    @staticmethod
+    def _record_size(key: str, item: tuple[int, int, str]) -> int:
+        _, body_len, tag = item
+        return RECORD.size + len(key.encode()) + len(tag.encode()) + body_len
+
+    def get(self, key: str) -> Entry | None:
+        with self._lock:
+            self.sync()
+            item = self._index.get(key)
+            view = self._view
+        if item is None:
+            return None
+        offset, length, tag = item
+        return Entry(view[offset : offset + length], tag)
+
+    def keys(self, prefix: str = "") -> list[str]:
+        with self._lock:
+            self.sync()
+            return [key for key in self._index if key.startswith(prefix)]
+
+    # Запись из нескольких процессов: блокировка файла рядом со снимком,
+    # внутри процесса — обычная блокировка (flock не разделяет потоки)
+    @contextmanager
+    def locked(self) -> Iterator["Snapshot"]:
+        with self._write_lock, open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if not os.path.exists(self.path):
+                self._write_file(())
+            with self._lock:
+                self.sync()
+            yield self
+
+    # Вызывается внутри locked()
+    def write(
+        self, entries: dict[str, tuple[bytes, str]], removed: Iterable[str]
+    ) -> None:
+        records = [
+            _record(key, "", b"", REMOVED)
+            for key in set(removed)
+            if key in self._index and key not in entries
+        ]
+        records.extend(
+            _record(key, tag, body) for key, (body, tag) in entries.items()
+        )
+        if not records:
+            return
+
+        data = b"".join(records)
+        generation = self.generation + 1
+        committed = self._committed + len(data)
+        with open(self.path, "r+b") as f:
+            os.pwrite(f.fileno(), data, self._committed)
+            os.pwrite(f.fileno(), _header(generation, committed), 0)
+        with self._lock:
+            self.sync()
+
+        if (
+            committed > MIN_COMPACT_SIZE
+            and committed > self.compact_ratio * self._live
+        ):
+            self.compact()
+
+    # Вызывается внутри locked()
+    def compact(self) -> None:
+        self.replace(
+            (key, tag, self._view[offset : offset + length])
+            for key, (offset, length, tag) in self._index.items()
+        )
+
+    # Вызывается внутри locked(): новый файл целиком
+    def replace(self, entries: Iterable[tuple[str, str, bytes]]) -> None:
+        self._write_file(entries)
+        with self._lock:
+            self.sync()
+
+    def _write_file(self, entries: Iterable[tuple[str, str, bytes]]) -> None:
+        tmp = self.path + ".tmp"
+        committed = HEADER_SIZE
+        with open(tmp, "wb") as f:
+            f.write(bytes(HEADER_SIZE))
+            for key, tag, body in entries:
+                record = _record(key, tag, body)
+                f.write(record)
+                committed += len(record)
+            f.seek(0)
+            f.write(_header(self.generation + 1, committed))
+
+        try:
+            old = open(self.path, "r+b")
+        except FileNotFoundError:
+            os.replace(tmp, self.path)
+            return
+        with old:
+            os.replace(tmp, self.path)
+            os.pwrite(old.fileno(), b"\x01", RETIRED_OFFSET)
+
+
+def _dumps(content) -> bytes:
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode()
+
+
+# Уровни каталога: модель, схема ответа и поля родителей в ключе
+LEVELS = (
+    (models.Menu, schemas.Menu, ()),
+    (models.Submenu, schemas.Submenu, ("menu_id",)),
+    (models.Dish, schemas.Dish, ("menu_id", "submenu_id")),
+)
+
+
+# Последние записи об удалении по путям сущностей (menu_id, submenu_id,
+# dish_id). Для ETag, как в crud.deleted_query, берётся максимум по самой
+# сущности, её предкам и потомкам.
+class Deletions:
+    def __init__(self, rows: Iterable[tuple[tuple[int, ...], int]]):
+        self.own = {}
+        self.subtree = {}
+        for path, last in rows:
+            self.own[path] = max(self.own.get(path, 0), last)
+            for i in range(len(path) + 1):
+                self.subtree[path[:i]] = max(
+                    self.subtree.get(path[:i], 0), last
+                )
+
+    def last(self, path: tuple[int, ...]) -> int:
+        ancestors = [self.own.get(path[:i], 0) for i in range(1, len(path))]
+        return max([self.subtree.get(path, 0), *ancestors])
+
+
+def _deletions(db, *criteria) -> Deletions:
+    tombstone = models.Tombstone
+    rows = db.execute(
+        select(
+            tombstone.kind,
+            tombstone.menu_id,
+            tombstone.submenu_id,
+            tombstone.entity_id,
+            func.max(tombstone.id),
+        )
+        .filter(*criteria)
+        .group_by(
+            tombstone.kind,
+            tombstone.menu_id,
+            tombstone.submenu_id,
+            tombstone.entity_id,
+        )
+    )
+    return Deletions(
+        (
+            {
+                "menu": (menu_id,),
+                "submenu": (menu_id, entity_id),
+                "dish": (menu_id, submenu_id, entity_id),
+            }[kind],
+            last,
+        )
+        for kind, menu_id, submenu_id, entity_id, last in rows
+    )
+
+
+# Для списка меню и самих меню достаточно последней записи по каждому
+# меню: предков у меню нет
+def _menu_deletions(db) -> Deletions:
+    tombstone = models.Tombstone
+    rows = db.execute(
+        select(tombstone.menu_id, func.max(tombstone.id)).group_by(
+            tombstone.menu_id
+        )
+    )
+    return Deletions(((menu_id,), last) for menu_id, last in rows)
+
+
+# path — id родителей списка
+def _list_entries(
+    key: str, level: int, path: tuple[int, ...], rows, deletions: Deletions
+) -> dict:
+    _, schema, _ = LEVELS[level]
+    items = [schema.from_orm(row).dict() for row in rows]
+    entries = {
+        key: (
+            _dumps(items),
+            etag.make(
+                len(rows),
+                sum(row.version for row in rows),
+                max((row.id for row in rows), default=0),
+                deletions.last(path),
+            ),
+        )
+    }
+    for row, item in zip(rows, items):
+        entries[f"{key}:{row.id}"] = (
+            _dumps(item),
+            etag.make(row.id, row.version, deletions.last((*path, row.id))),
+        )
+    return entries
+
+
+# Ключ списка ("menus", "menus:1:submenus") или сущности ("menus:1") ->
+# записи снимка; None — сущности нет
+def _load(key: str, db) -> dict:
+    parts = key.split(":")
+    ids = parts[1::2]
+    if not all(part.isdecimal() for part in ids):
+        return {key: None}
+    path = tuple(map(int, ids))
+    if path:
+        deletions = _deletions(db, models.Tombstone.menu_id == path[0])
+    else:
+        deletions = _menu_deletions(db)
+
+    if len(parts) % 2:
+        level = len(parts) // 2
+        model, _, parents = LEVELS[level]
+        rows = db.scalars(
+            select(model)
+            .filter_by(**dict(zip(parents, path)))
+            .order_by(model.id)
+        ).all()
+        return _list_entries(key, level, path, rows, deletions)
+
+    level = len(parts) // 2 - 1
+    model, schema, parents = LEVELS[level]
+    row = db.scalars(
+        select(model).filter_by(id=path[-1], **dict(zip(parents, path[:-1])))
+    ).first()
+    if row is None:
+        return {key: None}
+    return {
+        key: (
+            _dumps(schema.from_orm(row).dict()),
+            etag.make(row.id, row.version, deletions.last(path)),
+        )
+    }
+
+
+_snapshot: Snapshot | None = None
+_session_factory = None
+
+
+def configure(path: str, session_factory, compact_ratio: float = 2.0):
+    global _snapshot, _session_factory
+    disable()
+    _snapshot = Snapshot(path, compact_ratio)
+    _session_factory = session_factory
+    cache.subscribe(refresh)
+    return _snapshot
+
+
+def disable() -> None:
+    global _snapshot
+    if _snapshot is not None:
+        cache.unsubscribe(refresh)
+    _snapshot = None
+
+
+def lookup(key: str) -> Entry | None:
+    if _snapshot is None:
+        return None
+    try:
+        return _snapshot.get(key)
+    except FileNotFoundError:
+        return None
+
+
+# Вызывается после инвалидации кэша в crud: перечитываются изменённые
+# ключи и их предки (счётчики и версии родителей), удалённые поддеревья
+# убираются. Чтение из БД идёт под блокировкой снимка, поэтому более
+# поздняя публикация всегда видит более новые данные.
+def refresh(keys: tuple[str, ...], trees: tuple[str, ...]) -> None:
+    scopes = set()
+    for key in (*keys, *trees):
+        parts = key.split(":")
+        scopes.update(":".join(parts[:i]) for i in range(1, len(parts) + 1))
+
+    # Изменения уже зафиксированы: публикация не ограничивается сроком
+    # записавшего их запроса
+    with (
+        deadlines.unbounded(),
+        _snapshot.locked() as snapshot,
+        _session_factory() as db,
+    ):
+        removed = []
+        for tree in trees:
+            removed.extend(snapshot.keys(tree + ":"))
+        entries = {}
+        for scope in sorted(scopes, key=len):
+            for key, entry in _load(scope, db).items():
+                if entry is None:
+                    removed.append(key)
+                else:
+                    entries[key] = entry
+        snapshot.write(entries, removed)
+
+
+def _group(rows, *fields):
+    return {
+        ids: list(group)
+        for ids, group in groupby(
+            rows, key=lambda row: tuple(getattr(row, f) for f in fields)
+        )
+    }
+
+
+# Полная сборка снимка тремя запросами. Выполняется при каждом запуске:
+# файл мог остаться от прошлого запуска, а данные — измениться без
+# публикации (миграции, ручные правки, сбой между фиксацией и refresh)
+def rebuild() -> None:
+    with _snapshot.locked() as snapshot, _session_factory() as db:
+        menus = db.scalars(select(models.Menu).order_by(models.Menu.id)).all()
+        submenus = _group(
+            db.scalars(
+                select(models.Submenu).order_by(
+                    models.Submenu.menu_id, models.Submenu.id
+                )
+            ),
+            "menu_id",
+        )
+        dishes = _group(
+            db.scalars(
+                select(models.Dish).order_by(
+                    models.Dish.menu_id, models.Dish.submenu_id, models.Dish.id
+                )
+            ),
+            "menu_id",
+            "submenu_id",
+        )
+
+        deletions = _deletions(db)
+
+        entries = _list_entries(cache.menus_key(), 0, (), menus, deletions)
+        for menu in menus:
+            menu_submenus = submenus.get((menu.id,), [])
+            entries.update(
+                _list_entries(
+                    cache.submenus_key(menu.id),
+                    1,
+                    (menu.id,),
+                    menu_submenus,
+                    deletions,
+                )
+            )
+            for submenu in menu_submenus:
+                entries.update(
+                    _list_entries(
+                        cache.dishes_key(menu.id, submenu.id),
+                        2,
+                        (menu.id, submenu.id),
+                        dishes.get((menu.id, submenu.id), []),
+                        deletions,
+                    )
+                )
+        snapshot.replace(
+            (key, tag, body) for key, (body, tag) in entries.items()
+        )
+
+
+# Тело из отображённого файла передаётся как есть, без копирования
+class SnapshotResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> memoryview:
+        return content
+
+
+def respond(entry: Entry) -> SnapshotResponse:
+    return SnapshotResponse(entry.body, headers={"ETag": entry.etag})
+
+
+if __name__ == "__main__":
+    from menu.database import SessionLocal, init_engine
+    from menu.dependencies import get_snapshot_settings
+
+    init_engine()
+    settings = get_snapshot_settings()
+    configure(settings.path, SessionLocal, settings.compact_ratio)
+    rebuild()
+    print(f"snapshot {settings.path}: generation {_snapshot.generation}")
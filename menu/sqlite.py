@@ -0,0 +1,61 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+
+from .pool import InstrumentedQueuePool
+
+# Встроенный режим SQLite (SQLITE_TUNED=true): журнал WAL, при котором
+# чтение не блокируется записью, одно соединение для записи (запись
+# в SQLite всё равно идёт по одной, очередь в пуле вместо ожидания
+# блокировки файла) и пул соединений только для чтения.
+
+
+def pragmas(settings, read_only: bool = False) -> list[str]:
+    statements = [
+        f"PRAGMA busy_timeout = {settings.busy_timeout}",
+        f"PRAGMA journal_mode = {settings.journal_mode}",
+        f"PRAGMA synchronous = {settings.synchronous}",
+        f"PRAGMA mmap_size = {settings.mmap_size}",
+        f"PRAGMA cache_size = {settings.cache_size}",
+        f"PRAGMA temp_store = {settings.temp_store}",
+    ]
+    if read_only:
+        statements.append("PRAGMA query_only = 1")
+    return statements
+
+
+# PRAGMA выполняются для каждого нового соединения движка
+def apply_pragmas(engine: Engine, statements: list[str]) -> None:
+    @event.listens_for(engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+
+def create_writer_engine(url: str, settings) -> Engine:
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=settings.pool_timeout,
+    )
+    apply_pragmas(engine, pragmas(settings))
+    return engine
+
+
+def create_reader_engine(url: str, settings) -> Engine:
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.readers,
+        max_overflow=0,
+        pool_timeout=settings.pool_timeout,
+    )
+    apply_pragmas(engine, pragmas(settings, read_only=True))
+    return engine
@@ -0,0 +1,165 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from menu import admission, main
+from menu.dependencies import get_admission_settings
+from tests.test_main import test_db  # noqa: F401
+
+CLASSES = {
+    "read": admission.RequestClass(0, 10, 1.0),
+    "write": admission.RequestClass(1, 1, 0.05),
+}
+
+
+@pytest.fixture(autouse=True)
+def reset_limiter():
+    yield
+    admission.limiter = None
+
+
+def test_classify():
+    assert admission.classify("GET", "/metrics") is None
+    assert admission.classify("GET", "/api/v1/changes") is None
+    assert admission.classify("GET", "/api/v1/menus/1") == "read"
+    assert admission.classify("GET", "/api/v1/search") == "query"
+    assert admission.classify("POST", "/api/v1/dishes/batch") == "query"
+    assert admission.classify("POST", "/api/v1/menus") == "write"
+    assert admission.classify("POST", "/api/v1/catalog/import") == "bulk"
+    assert admission.classify("GET", "/api/v1/catalog/export") == "bulk"
+
+
+def test_limiter_priority_and_shedding():
+    async def scenario():
+        limiter = admission.Limiter(1, CLASSES)
+        await limiter.acquire("write")
+        order = []
+
+        async def wait(name):
+            await limiter.acquire(name)
+            order.append(name)
+
+        write = asyncio.create_task(wait("write"))
+        await asyncio.sleep(0)
+        read = asyncio.create_task(wait("read"))
+        await asyncio.sleep(0)
+
+        # Очередь записи заполнена
+        with pytest.raises(admission.Overloaded) as exc:
+            await limiter.acquire("write")
+        assert exc.value.reason == "queue_full"
+
+        # Слот получает чтение, хотя запись ждёт дольше
+        limiter.release()
+        await read
+        assert order == ["read"]
+        with pytest.raises(admission.Overloaded) as exc:
+            await write
+        assert exc.value.reason == "timeout"
+
+        limiter.release()
+        assert limiter.in_flight == 0
+        return limiter.get_stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["classes"]["read"] == {
+        "queued": 0,
+        "admitted": 1,
+        "rejected_queue_full": 0,
+        "rejected_timeout": 0,
+    }
+    assert stats["classes"]["write"] == {
+        "queued": 0,
+        "admitted": 1,
+        "rejected_queue_full": 1,
+        "rejected_timeout": 1,
+    }
+
+
+def test_limiter_cancelled_waiter():
+    async def scenario():
+        limiter = admission.Limiter(1, CLASSES)
+        await limiter.acquire("read")
+        task = asyncio.create_task(limiter.acquire("read"))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # Слот не достаётся отменённому запросу
+        limiter.release()
+        return limiter.in_flight
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_middleware_returns_503():
+    app = FastAPI()
+    blocked = {}
+
+    @app.post("/api/v1/menus")
+    async def slow():
+        blocked["started"].set()
+        await blocked["release"].wait()
+        return {}
+
+    @app.get("/metrics")
+    async def service():
+        return {}
+
+    app.add_middleware(
+        admission.AdmissionMiddleware,
+        limit=1,
+        classes=CLASSES,
+        retry_after=3,
+    )
+
+    async def scenario():
+        blocked["started"] = asyncio.Event()
+        blocked["release"] = asyncio.Event()
+        async with httpx.AsyncClient(app=app, base_url="http://test") as ac:
+            first = asyncio.create_task(ac.post("/api/v1/menus"))
+            await blocked["started"].wait()
+            queued = asyncio.create_task(ac.post("/api/v1/menus"))
+            await asyncio.sleep(0.01)
+            rejected = await ac.post("/api/v1/menus")
+            service = await ac.get("/metrics")
+            timed_out = await queued
+            blocked["release"].set()
+            return rejected, service, timed_out, await first
+
+    rejected, service, timed_out, first = asyncio.run(scenario())
+    assert rejected.status_code == 503
+    assert rejected.headers["Retry-After"] == "3"
+    assert rejected.json() == {
+        "detail": "service overloaded",
+        "reason": "queue_full",
+    }
+    assert timed_out.status_code == 503
+    assert timed_out.json()["reason"] == "timeout"
+    assert service.status_code == 200
+    assert first.status_code == 200
+    assert admission.get_stats()["in_flight"] == 0
+
+
+def test_admission_enabled_in_app(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("ADMISSION_ENABLED", "1")
+    monkeypatch.setenv("ADMISSION_LIMIT", "4")
+    get_admission_settings.cache_clear()
+    try:
+        with TestClient(main.create_app()) as app_client:
+            assert app_client.get("/api/v1/menus").status_code == 200
+            stats = app_client.get("/internal/admission").json()
+            metrics = app_client.get("/metrics").text
+    finally:
+        get_admission_settings.cache_clear()
+
+    assert stats["limit"] == 4
+    assert stats["in_flight"] == 0
+    assert stats["classes"]["read"]["admitted"] == 1
+    assert list(stats["classes"]) == ["read", "query", "write", "bulk"]
+    assert "admission_limit 4" in metrics
+    assert 'admission_admitted_total{class="read"} 1' in metrics
@@ -0,0 +1,302 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from menu import cache, changes
+from menu.async_api import get_async_db, router
+from menu.dependencies import get_response_settings
+from tests.test_main import test_db  # noqa: F401
+
+# Асинхронный режим требует драйвера из extras async
+pytest.importorskip("aiosqlite")
+
+ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./test_sql_app.db"
+TestingAsyncSessionLocal = sessionmaker(
+    class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+
+async def override_get_async_db():
+    # Движок создаётся на каждый запрос: TestClient запускает
+    # каждый запрос в своём цикле событий
+    engine = create_async_engine(ASYNC_DATABASE_URL)
+    async with TestingAsyncSessionLocal(bind=engine) as db:
+        yield db
+    await engine.dispose()
+
+
+app = FastAPI()
+app.include_router(router)
+app.dependency_overrides[get_async_db] = override_get_async_db
+
+client = TestClient(app)
+
+
+def test_get_menus_empty():
+    response = client.get("/api/v1/menus")
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+def test_menu_404():
+    response = client.get("/api/v1/menus/10")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "menu not found"}
+
+
+def test_full_tree_counters():
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu1", "description": "menu1_description"},
+    )
+    client.post(
+        "/api/v1/menus/1/submenus",
+        json={"title": "submenu1", "description": "submenu1_description"},
+    )
+    response = client.post(
+        "/api/v1/menus/1/submenus/1/dishes",
+        json={"title": "dish1", "description": "dish1", "price": "100"},
+    )
+    assert response.status_code == 201
+    assert response.json() == {
+        "id": "1",
+        "menu_id": "1",
+        "submenu_id": "1",
+        "title": "dish1",
+        "description": "dish1",
+        "price": "100",
+    }
+
+    menu = client.get("/api/v1/menus/1").json()
+    assert menu["submenus_count"] == 1
+    assert menu["dishes_count"] == 1
+
+    response = client.patch(
+        "/api/v1/menus/1/submenus/1/dishes/1",
+        json={"title": "dish2", "description": "dish2", "price": "200"},
+    )
+    assert response.json()["price"] == "200"
+
+    client.delete("/api/v1/menus/1/submenus/1/dishes/1")
+    assert client.get("/api/v1/menus/1/submenus/1").json()["dishes_count"] == 0
+
+    client.delete("/api/v1/menus/1/submenus/1")
+    assert client.get("/api/v1/menus/1").json()["submenus_count"] == 0
+
+    client.delete("/api/v1/menus/1")
+    assert client.get("/api/v1/menus").json() == []
+
+
+def test_submenus_paginated():
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu1", "description": "menu1_description"},
+    )
+    for i in range(3):
+        client.post(
+            "/api/v1/menus/1/submenus",
+            json={"title": f"submenu{i}", "description": "description"},
+        )
+
+    page = client.get("/api/v1/menus/1/submenus?limit=2").json()
+    assert [submenu["id"] for submenu in page["items"]] == ["1", "2"]
+    assert page["next_cursor"] == "2"
+    assert len(client.get("/api/v1/menus/1/submenus").json()) == 3
+
+
+def test_import_catalog():
+    catalog = {
+        "menus": [
+            {
+                "title": "menu1",
+                "description": "description",
+                "submenus": [
+                    {
+                        "title": "submenu1",
+                        "description": "description",
+                        "dishes": [
+                            {"title": "dish1", "description": "d", "price": "1"}
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+    response = client.post("/api/v1/catalog/import", json=catalog)
+    assert response.json() == {"menus": 1, "submenus": 1, "dishes": 1}
+    assert client.get("/api/v1/menus/1").json()["dishes_count"] == 1
+
+
+def test_export_catalog():
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu1", "description": "menu1_description"},
+    )
+    response = client.get("/api/v1/catalog/export?format=csv")
+    assert response.status_code == 200
+    assert response.text.splitlines()[1].startswith("menu,1,,,menu1,")
+
+
+def test_export_catalog_deletes():
+    client.post("/api/v1/menus", json={"title": "m", "description": "d"})
+    response = client.get("/api/v1/catalog/export")
+    since = json.loads(response.text)["updated_at"]
+    client.delete("/api/v1/menus/1")
+
+    response = client.get("/api/v1/catalog/export", params={"since": since})
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [(row["type"], row["id"]) for row in rows] == [("menu", "1")]
+    assert "deleted_at" in rows[0]
+
+
+def test_menu_etag():
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu1", "description": "menu1_description"},
+    )
+    etag = client.get("/api/v1/menus/1").headers["etag"]
+    response = client.get("/api/v1/menus/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    client.patch(
+        "/api/v1/menus/1",
+        json={"title": "menu2", "description": "menu2_description"},
+    )
+    response = client.get("/api/v1/menus/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+
+
+def test_fast_json_lists(monkeypatch):
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu1", "description": "menu1_description"},
+    )
+    client.post(
+        "/api/v1/menus/1/submenus",
+        json={"title": "submenu1", "description": "submenu1_description"},
+    )
+    urls = ["/api/v1/menus", "/api/v1/menus/1/submenus"]
+    expected = [client.get(url).json() for url in urls]
+
+    monkeypatch.setenv("RESPONSE_FAST_JSON", "1")
+    get_response_settings.cache_clear()
+    try:
+        assert [client.get(url).json() for url in urls] == expected
+        assert client.get("/api/v1/menus/1/submenus/1/dishes").json() == []
+    finally:
+        get_response_settings.cache_clear()
+
+
+def test_dishes_price_filter():
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu1", "description": "menu1_description"},
+    )
+    client.post(
+        "/api/v1/menus/1/submenus",
+        json={"title": "submenu1", "description": "submenu1_description"},
+    )
+    for price in ("30", "10.50", "5"):
+        client.post(
+            "/api/v1/menus/1/submenus/1/dishes",
+            json={"title": "dish", "description": "d", "price": price},
+        )
+
+    response = client.get(
+        "/api/v1/menus/1/submenus/1/dishes",
+        params={"sort": "price", "max_price": 20},
+    )
+    assert [d["price"] for d in response.json()] == ["5", "10.50"]
+    page = client.get("/api/v1/dishes", params={"sort": "price"}).json()
+    assert [d["price"] for d in page["items"]] == ["5", "10.50", "30"]
+
+
+def test_search():
+    client.post(
+        "/api/v1/menus",
+        json={"title": "Lunch", "description": "Daily menu"},
+    )
+    client.post(
+        "/api/v1/menus/1/submenus",
+        json={"title": "Hot", "description": "Spicy"},
+    )
+    client.patch(
+        "/api/v1/menus/1/submenus/1",
+        json={"title": "Grill", "description": "Spicy"},
+    )
+
+    response = client.get("/api/v1/search", params={"q": "grill"})
+    assert [item["kind"] for item in response.json()["items"]] == ["submenu"]
+
+    client.delete("/api/v1/menus/1")
+    response = client.get("/api/v1/search", params={"q": "spicy"})
+    assert response.json()["items"] == []
+
+
+def test_batch_fetch():
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu1", "description": "menu1_description"},
+    )
+    client.post(
+        "/api/v1/menus/1/submenus",
+        json={"title": "submenu1", "description": "submenu1_description"},
+    )
+    client.post(
+        "/api/v1/menus/1/submenus/1/dishes",
+        json={"title": "dish", "description": "d", "price": "1"},
+    )
+
+    for kind in ("menus", "submenus", "dishes"):
+        response = client.post(
+            f"/api/v1/{kind}/batch", json={"ids": ["2", "1"]}
+        )
+        assert [item["id"] for item in response.json()["items"]] == ["1"]
+        assert response.json()["not_found"] == ["2"]
+
+
+def test_writes_publish_changes():
+    start = changes.feed.seq
+    client.post("/api/v1/menus", json={"title": "m", "description": "d"})
+    client.post(
+        "/api/v1/menus/1/submenus", json={"title": "s", "description": "d"}
+    )
+    client.delete("/api/v1/menus/1/submenus/1")
+    client.delete("/api/v1/menus/1")
+
+    assert [(e.type, e.kind, e.id) for e in changes.feed.since(start)] == [
+        ("create", "menu", "1"),
+        ("create", "submenu", "1"),
+        ("delete", "submenu", "1"),
+        ("delete", "menu", "1"),
+    ]
+
+
+# Подписчики инвалидации (публикация снимка) выполняются вне цикла событий
+def test_writes_notify_off_event_loop():
+    on_loop = []
+
+    def subscriber(keys, trees):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            on_loop.append(False)
+        else:
+            on_loop.append(True)
+
+    cache.subscribe(subscriber)
+    try:
+        client.post("/api/v1/menus", json={"title": "m", "description": "d"})
+        client.post(
+            "/api/v1/catalog/import",
+            json={"menus": [{"title": "m2", "description": "d"}]},
+        )
+        client.delete("/api/v1/menus/1")
+    finally:
+        cache.unsubscribe(subscriber)
+    assert on_loop and not any(on_loop)
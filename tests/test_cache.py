@@ -0,0 +1,156 @@
+import asyncio
+import fnmatch
+import threading
+import time
+
+import pytest
+
+from menu import cache
+from tests.test_main import client, test_db  # noqa: F401
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode()
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match):
+        return [key for key in self.data if fnmatch.fnmatch(key, match)]
+
+
+@pytest.fixture(params=["memory", "redis"], autouse=True)
+def backend(request):
+    if request.param == "memory":
+        backend = cache.MemoryCache()
+    else:
+        backend = cache.RedisCache(FakeRedis())
+    cache.set_backend(backend)
+    yield backend
+    cache.set_backend(cache.NullCache())
+
+
+def test_memory_cache_lru_and_ttl():
+    lru = cache.MemoryCache(maxsize=2, ttl=0.05)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+    time.sleep(0.06)
+    assert lru.get("a") is None
+
+
+def test_menu_read_is_cached(backend):
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu1", "description": "menu1_description"},
+    )
+    assert client.get("/api/v1/menus/1").status_code == 200
+    assert backend.get(cache.menu_key(1))["title"] == "menu1"
+
+    backend.set(cache.menu_key(1), {**backend.get("menus:1"), "title": "x"})
+    assert client.get("/api/v1/menus/1").json()["title"] == "x"
+
+
+def test_write_invalidates_parents(backend):
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu1", "description": "menu1_description"},
+    )
+    client.post(
+        "/api/v1/menus/1/submenus",
+        json={"title": "submenu1", "description": "submenu1_description"},
+    )
+    client.get("/api/v1/menus")
+    client.get("/api/v1/menus/1")
+    client.get("/api/v1/menus/1/submenus/1")
+    client.get("/api/v1/menus/1/submenus/1/dishes")
+
+    client.post(
+        "/api/v1/menus/1/submenus/1/dishes",
+        json={"title": "dish1", "description": "dish1", "price": "100"},
+    )
+    assert client.get("/api/v1/menus").json()[0]["dishes_count"] == 1
+    assert client.get("/api/v1/menus/1").json()["dishes_count"] == 1
+    assert client.get("/api/v1/menus/1/submenus/1").json()["dishes_count"] == 1
+    assert len(client.get("/api/v1/menus/1/submenus/1/dishes").json()) == 1
+
+
+def test_delete_menu_invalidates_subtree(backend):
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu1", "description": "menu1_description"},
+    )
+    client.post(
+        "/api/v1/menus/1/submenus",
+        json={"title": "submenu1", "description": "submenu1_description"},
+    )
+    client.get("/api/v1/menus/1/submenus/1")
+    client.delete("/api/v1/menus/1")
+
+    assert backend.get(cache.submenu_key(1, 1)) is None
+    assert client.get("/api/v1/menus/1/submenus/1").status_code == 404
+
+
+def test_keys_normalize_ids(backend):
+    assert cache.menu_key("01") == cache.menu_key(1) == "menus:1"
+    assert cache.dish_key("1", "002", "3") == cache.dish_key(1, 2, 3)
+    assert cache.menu_key("1_0") != cache.menu_key(10)
+
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu1", "description": "menu1_description"},
+    )
+    assert client.get("/api/v1/menus/01").json()["title"] == "menu1"
+    client.patch(
+        "/api/v1/menus/1", json={"title": "menu2", "description": "d"}
+    )
+    assert client.get("/api/v1/menus/01").json()["title"] == "menu2"
+
+
+class ThreadRecordingRedis(FakeRedis):
+    def __init__(self):
+        super().__init__()
+        self.threads = set()
+
+    def get(self, key):
+        self.threads.add(threading.get_ident())
+        return super().get(key)
+
+    def set(self, key, value, ex=None):
+        self.threads.add(threading.get_ident())
+        super().set(key, value, ex)
+
+    def delete(self, *keys):
+        self.threads.add(threading.get_ident())
+        super().delete(*keys)
+
+
+def test_async_redis_calls_leave_event_loop():
+    redis = ThreadRecordingRedis()
+    cache.set_backend(cache.RedisCache(redis))
+
+    async def read(menu_id, db):
+        return {"id": menu_id}
+
+    cached_read = cache.read_through_async(cache.menu_key)(read)
+
+    async def scenario():
+        assert await cached_read("1", None) == {"id": "1"}
+        assert await cached_read("1", None) == {"id": "1"}
+        await cache.invalidate_async(cache.menu_key("1"))
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(scenario())
+    assert redis.threads and loop_thread not in redis.threads
+    assert redis.data == {}
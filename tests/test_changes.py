@@ -0,0 +1,218 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from menu import changes, main
+from menu.dependencies import get_changes_settings
+from menu.main import app
+from tests.test_main import client, test_db  # noqa: F401
+
+
+def parse(body: bytes) -> list[dict]:
+    events = []
+    for block in body.decode().split("\n\n"):
+        fields = dict(
+            line.split(": ", 1)
+            for line in block.splitlines()
+            if line and not line.startswith(":") and ": " in line
+        )
+        if "event" in fields:
+            events.append(
+                {
+                    "id": fields["id"],
+                    "event": fields["event"],
+                    "data": json.loads(fields["data"]),
+                }
+            )
+    return events
+
+
+def test_ring_buffer():
+    feed = changes.ChangeFeed(size=3)
+    assert feed.since(0) == []
+    for i in range(5):
+        feed.publish("create", "menu", i, i)
+
+    assert [event.seq for event in feed.since(2)] == [3, 4, 5]
+    assert [event.seq for event in feed.since(4)] == [5]
+    assert feed.since(5) == []
+    # Часть событий уже вытеснена из буфера или номер из будущего
+    assert feed.since(1) is None
+    assert feed.since(6) is None
+
+
+def test_stream_wakes_subscribers():
+    async def scenario():
+        feed = changes.ChangeFeed()
+        feed.publish("create", "menu", 1, 1)
+        streams = [feed.stream(1, heartbeat=0.01) for _ in range(100)]
+        for stream in streams:
+            assert await stream.__anext__() == b"retry: 3000\n\n"
+        pending = [
+            asyncio.ensure_future(stream.__anext__()) for stream in streams
+        ]
+        # Без событий подписчики получают keepalive
+        assert set(await asyncio.gather(*pending)) == {b": keepalive\n\n"}
+
+        pending = [
+            asyncio.ensure_future(stream.__anext__()) for stream in streams
+        ]
+        await asyncio.sleep(0)
+        # Публикация из другого потока, как из синхронного обработчика
+        thread = threading.Thread(
+            target=feed.publish, args=("delete", "dish", 5, 1, 2)
+        )
+        thread.start()
+        thread.join()
+        chunks = await asyncio.gather(*pending)
+        for stream in streams:
+            await stream.aclose()
+        return chunks
+
+    chunks = asyncio.run(scenario())
+    assert len(set(chunks)) == 1
+    assert parse(chunks[0]) == [
+        {
+            "id": "2",
+            "event": "delete",
+            "data": {
+                "seq": 2,
+                "type": "delete",
+                "kind": "dish",
+                "id": "5",
+                "menu_id": "1",
+                "submenu_id": "2",
+            },
+        }
+    ]
+
+
+def test_stream_reset_after_gap():
+    async def scenario():
+        feed = changes.ChangeFeed(size=1)
+        feed.publish("create", "menu", 1, 1)
+        feed.publish("create", "menu", 2, 2)
+        stream = feed.stream(0, heartbeat=0.01)
+        await stream.__anext__()
+        chunks = [await stream.__anext__(), await stream.__anext__()]
+        await stream.aclose()
+        return chunks
+
+    reset, keepalive = asyncio.run(scenario())
+    assert parse(reset) == [{"id": "2", "event": "reset", "data": {}}]
+    assert keepalive == b": keepalive\n\n"
+
+
+def test_writes_publish_events():
+    start = changes.feed.seq
+    client.post("/api/v1/menus", json={"title": "m", "description": "d"})
+    client.patch("/api/v1/menus/1", json={"title": "m2", "description": "d"})
+    client.post(
+        "/api/v1/menus/1/submenus", json={"title": "s", "description": "d"}
+    )
+    client.post(
+        "/api/v1/menus/1/submenus/1/dishes",
+        json={"title": "dish", "description": "d", "price": "1"},
+    )
+    client.patch(
+        "/api/v1/menus/1/submenus/1/dishes/1",
+        json={"title": "dish", "description": "d", "price": "2"},
+    )
+    client.delete("/api/v1/menus/1/submenus/1/dishes/1")
+    client.delete("/api/v1/menus/1/submenus/1/dishes/1")
+    client.delete("/api/v1/menus/1/submenus/1")
+    client.delete("/api/v1/menus/1")
+    client.delete("/api/v1/menus/1")
+
+    events = [
+        (e.type, e.kind, e.id, e.menu_id, e.submenu_id)
+        for e in changes.feed.since(start)
+    ]
+    assert events == [
+        ("create", "menu", "1", "1", None),
+        ("update", "menu", "1", "1", None),
+        ("create", "submenu", "1", "1", None),
+        ("create", "dish", "1", "1", "1"),
+        ("update", "dish", "1", "1", "1"),
+        ("delete", "dish", "1", "1", "1"),
+        ("delete", "submenu", "1", "1", None),
+        ("delete", "menu", "1", "1", None),
+    ]
+
+
+def test_changes_endpoint_resumes():
+    start = changes.feed.seq
+    client.post("/api/v1/menus", json={"title": "m", "description": "d"})
+    client.post("/api/v1/menus", json={"title": "m", "description": "d"})
+
+    async def scenario():
+        messages = []
+        received = asyncio.Event()
+        scope = {
+            "type": "http",
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": "/api/v1/changes",
+            "raw_path": b"/api/v1/changes",
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"last-event-id", str(start + 1).encode())],
+            "server": ("test", 80),
+            "client": ("test", 1),
+        }
+
+        async def receive():
+            await received.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            messages.append(message)
+            if b"event:" in message.get("body", b""):
+                received.set()
+
+        await asyncio.wait_for(app(scope, receive, send), 5)
+        return messages
+
+    messages = asyncio.run(scenario())
+    headers = dict(messages[0]["headers"])
+    assert headers[b"content-type"].startswith(b"text/event-stream")
+    assert headers[b"cache-control"] == b"no-cache"
+    body = b"".join(message.get("body", b"") for message in messages)
+    events = parse(body)
+    assert [event["id"] for event in events] == [str(start + 2)]
+    assert events[0]["data"]["id"] == "2"
+
+
+@pytest.fixture
+def restore_feed():
+    get_changes_settings.cache_clear()
+    yield
+    get_changes_settings.cache_clear()
+    changes.configure(get_changes_settings().buffer_size)
+
+
+# Буфер событий свой у каждого процесса, поэтому при нескольких
+# воркерах лента отключается, а не теряет события других воркеров
+@pytest.mark.parametrize(
+    "env", [{"WEB_CONCURRENCY": "4"}, {"CHANGES_ENABLED": "false"}]
+)
+def test_feed_disabled(env, monkeypatch, restore_feed):
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    test_app = main.create_app()
+    assert changes.feed is None
+    assert changes.publish("create", "menu", 1, 1) is None
+
+    response = TestClient(test_app).get("/api/v1/changes")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "change feed disabled"}
+
+
+def test_feed_enabled_for_single_worker(monkeypatch, restore_feed):
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    main.create_app()
+    assert changes.feed is not None
@@ -0,0 +1,153 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from menu import crud, models, querylog, schemas
+from tests.test_main import TestingSessionLocal, client, test_db  # noqa: F401
+
+
+THREADS = 8
+WRITES_PER_THREAD = 25
+
+
+def run_in_session(func, *args):
+    db = TestingSessionLocal()
+    try:
+        return func(*args, db)
+    finally:
+        db.close()
+
+
+def counter_updates(recorder, table: str) -> list[str]:
+    return [
+        statement
+        for statement in recorder.statements
+        if statement.startswith(f"UPDATE {table} SET")
+    ]
+
+
+# Счётчики родителей меняются одним UPDATE x = x + n, и до него
+# ни меню, ни подменю не читаются
+def assert_atomic(recorder, table: str, *columns: str) -> None:
+    updates = counter_updates(recorder, table)
+    assert len(updates) == 1, recorder.report()
+    for column in columns:
+        assert f"{column}=({table}.{column} + ?)" in updates[0]
+    before = recorder.statements[: recorder.statements.index(updates[0])]
+    assert not [
+        statement for statement in before if statement.startswith("SELECT")
+    ], recorder.report()
+
+
+def create_parents():
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu1", "description": "menu1_description"},
+    )
+    client.post(
+        "/api/v1/menus/1/submenus",
+        json={"title": "submenu1", "description": "description"},
+    )
+
+
+def test_create_dish_updates_counters_in_place():
+    create_parents()
+    dish = schemas.DishBase(title="dish", description="dish", price="1")
+    with querylog.record() as recorder:
+        run_in_session(crud.create_dish, "1", "1", dish)
+
+    assert_atomic(recorder, "submenu", "dishes_count")
+    assert_atomic(recorder, "menu", "dishes_count")
+    assert client.get("/api/v1/menus/1").json()["dishes_count"] == 1
+
+
+def test_delete_dish_updates_counters_in_place():
+    create_parents()
+    client.post(
+        "/api/v1/menus/1/submenus/1/dishes",
+        json={"title": "dish1", "description": "dish1", "price": "100"},
+    )
+    with querylog.record() as recorder:
+        run_in_session(crud.delete_dish, "1", "1", "1")
+
+    assert_atomic(recorder, "submenu", "dishes_count")
+    assert_atomic(recorder, "menu", "dishes_count")
+    assert client.get("/api/v1/menus/1/submenus/1").json()["dishes_count"] == 0
+
+
+def test_create_submenu_updates_counters_in_place():
+    create_parents()
+    submenu = schemas.SubmenuBase(title="submenu2", description="d")
+    with querylog.record() as recorder:
+        run_in_session(crud.create_submenu, "1", submenu)
+
+    assert_atomic(recorder, "menu", "submenus_count")
+    assert client.get("/api/v1/menus/1").json()["submenus_count"] == 2
+
+
+def test_counters_do_not_drift_under_concurrent_writes():
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu1", "description": "menu1_description"},
+    )
+    for i in range(2):
+        client.post(
+            "/api/v1/menus/1/submenus",
+            json={"title": f"submenu{i}", "description": "description"},
+        )
+    dish = schemas.DishBase(title="dish", description="dish", price="1")
+
+    def create_dishes(n):
+        submenu_id = str(n % 2 + 1)
+        for _ in range(WRITES_PER_THREAD):
+            run_in_session(crud.create_dish, "1", submenu_id, dish)
+
+    with ThreadPoolExecutor(THREADS) as executor:
+        list(executor.map(create_dishes, range(THREADS)))
+
+    def delete_dishes(n):
+        for dish_id in range(n + 1, THREADS * WRITES_PER_THREAD, THREADS * 2):
+            db = TestingSessionLocal()
+            try:
+                dish_db = db.get(models.Dish, dish_id)
+                submenu_id = dish_db.submenu_id
+            finally:
+                db.close()
+            run_in_session(crud.delete_dish, "1", submenu_id, dish_id)
+
+    with ThreadPoolExecutor(THREADS) as executor:
+        list(executor.map(delete_dishes, range(THREADS)))
+
+    db = TestingSessionLocal()
+    try:
+        menu_db = db.get(models.Menu, 1)
+        dishes = db.query(models.Dish).count()
+        assert dishes < THREADS * WRITES_PER_THREAD
+        assert menu_db.dishes_count == dishes
+        assert menu_db.submenus_count == 2
+        for submenu_db in db.query(models.Submenu):
+            assert submenu_db.dishes_count == (
+                db.query(models.Dish)
+                .filter(models.Dish.submenu_id == submenu_db.id)
+                .count()
+            )
+    finally:
+        db.close()
+
+    client.delete("/api/v1/menus/1/submenus/1")
+    menu = client.get("/api/v1/menus/1").json()
+    submenu = client.get("/api/v1/menus/1/submenus/2").json()
+    assert menu["submenus_count"] == 1
+    assert menu["dishes_count"] == submenu["dishes_count"]
+
+
+def test_create_dish_for_missing_submenu():
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu1", "description": "menu1_description"},
+    )
+    response = client.post(
+        "/api/v1/menus/1/submenus/5/dishes",
+        json={"title": "dish1", "description": "dish1", "price": "100"},
+    )
+    assert response.status_code == 404
+    assert response.json() == {"detail": "submenu not found"}
+    assert client.get("/api/v1/menus/1").json()["dishes_count"] == 0
@@ -0,0 +1,79 @@
+import time
+
+import pytest
+from fastapi import Depends
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from menu import deadlines, main
+from menu.dependencies import get_deadline_settings
+from tests.test_main import TestingSessionLocal, override_get_db
+from tests.test_main import test_db  # noqa: F401
+
+# Запрос, который без прерывания выполняется очень долго
+SLOW_QUERY = text(
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) "
+    "SELECT count(*) FROM (SELECT x FROM c LIMIT 1000000000)"
+)
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    monkeypatch.setenv("DEADLINE_ENABLED", "1")
+    monkeypatch.setenv("DEADLINE_DEFAULT", "2")
+    monkeypatch.setenv("DEADLINE_MAX", "10")
+    monkeypatch.setenv("DEADLINE_ROUTES", '{"/api/v1/fast": 3}')
+    get_deadline_settings.cache_clear()
+    yield
+    get_deadline_settings.cache_clear()
+
+
+def test_sqlite_query_interrupted():
+    deadlines.install()
+    with TestingSessionLocal() as db:
+        start = time.monotonic()
+        with deadlines.deadline(0.05), pytest.raises(
+            deadlines.DeadlineExceeded
+        ):
+            db.execute(SLOW_QUERY)
+        assert time.monotonic() - start < 1
+        db.rollback()
+        # Соединение остаётся рабочим и без срока не прерывается
+        assert db.execute(text("SELECT 1")).scalar() == 1
+
+
+def test_expired_deadline_skips_query():
+    deadlines.install()
+    with TestingSessionLocal() as db:
+        with deadlines.deadline(0), pytest.raises(deadlines.DeadlineExceeded):
+            db.execute(text("SELECT 1"))
+
+
+def test_deadline_returns_504(settings):
+    app = main.create_app()
+    app.dependency_overrides[main.get_db] = override_get_db
+    timeouts = []
+
+    @app.get("/api/v1/slow")
+    def slow(db: Session = Depends(main.get_db)):
+        timeouts.append(deadlines.remaining())
+        db.execute(SLOW_QUERY)
+
+    @app.get("/api/v1/fast")
+    def fast(db: Session = Depends(main.get_db)):
+        timeouts.append(deadlines.remaining())
+        return db.execute(text("SELECT 1")).scalar()
+
+    app_client = TestClient(app)
+    response = app_client.get(
+        "/api/v1/slow", headers={"X-Request-Timeout": "0.05"}
+    )
+    assert response.status_code == 504
+    assert response.json() == {"detail": "deadline exceeded"}
+
+    assert app_client.get("/api/v1/fast").json() == 1
+    app_client.get("/api/v1/fast", headers={"X-Request-Timeout": "100"})
+    app_client.get("/api/v1/fast", headers={"X-Request-Timeout": "x"})
+    # Срок маршрута из DEADLINE_ROUTES, заголовок не больше DEADLINE_MAX
+    assert [round(t) for t in timeouts[1:]] == [3, 10, 3]
@@ -1,10 +1,12 @@
+import json
+
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 import pytest
 
 from menu.main import app, get_db
-from menu import models
+from menu import crud, models, querylog
 
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test_sql_app.db"
@@ -385,3 +387,510 @@ def test_delete_dishes():
         "status": True,
         "message": "The dish has been deleted",
     }
+
+
+def test_get_menus_paginated():
+    for i in range(5):
+        client.post(
+            "/api/v1/menus",
+            json={"title": f"menu{i}", "description": "description"},
+        )
+
+    response = client.get("/api/v1/menus?limit=2")
+    assert response.status_code == 200
+    page = response.json()
+    assert [menu["id"] for menu in page["items"]] == ["1", "2"]
+    assert page["next_cursor"] == "2"
+
+    page = client.get("/api/v1/menus?limit=2&after=4").json()
+    assert [menu["id"] for menu in page["items"]] == ["5"]
+    assert page["next_cursor"] is None
+
+    response = client.get("/api/v1/menus?limit=0")
+    assert response.status_code == 422
+
+
+def test_get_dishes_paginated():
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu1", "description": "menu1_description"},
+    )
+    client.post(
+        "/api/v1/menus/1/submenus",
+        json={"title": "submenu1", "description": "submenu1_description"},
+    )
+    for i in range(3):
+        client.post(
+            "/api/v1/menus/1/submenus/1/dishes",
+            json={"title": f"dish{i}", "description": "d", "price": "100"},
+        )
+
+    page = client.get("/api/v1/menus/1/submenus/1/dishes?limit=2").json()
+    assert [dish["id"] for dish in page["items"]] == ["1", "2"]
+    page = client.get(
+        f"/api/v1/menus/1/submenus/1/dishes?limit=2&after={page['next_cursor']}"
+    ).json()
+    assert [dish["id"] for dish in page["items"]] == ["3"]
+    assert page["next_cursor"] is None
+
+
+def test_get_menu_tree():
+    for i in range(2):
+        client.post(
+            "/api/v1/menus",
+            json={"title": f"menu{i}", "description": "description"},
+        )
+    for i in range(2):
+        client.post(
+            "/api/v1/menus/1/submenus",
+            json={"title": f"submenu{i}", "description": "description"},
+        )
+        client.post(
+            f"/api/v1/menus/1/submenus/{i + 1}/dishes",
+            json={"title": f"dish{i}", "description": "d", "price": "100"},
+        )
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        response = client.get("/api/v1/menus/tree")
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    assert response.status_code == 200
+    assert len(statements) == 3
+    tree = response.json()
+    assert [menu["id"] for menu in tree] == ["1", "2"]
+    assert tree[1]["submenus"] == []
+    submenus = tree[0]["submenus"]
+    assert [submenu["title"] for submenu in submenus] == [
+        "submenu0",
+        "submenu1",
+    ]
+    assert submenus[1]["dishes"] == [
+        {
+            "id": "2",
+            "menu_id": "1",
+            "submenu_id": "2",
+            "title": "dish1",
+            "description": "d",
+            "price": "100",
+        }
+    ]
+
+    response = client.get("/api/v1/menus/1/tree")
+    assert response.json() == tree[0]
+    assert client.get("/api/v1/menus/3/tree").status_code == 404
+
+
+def test_import_catalog():
+    catalog = {
+        "menus": [
+            {
+                "title": f"menu{m}",
+                "description": "description",
+                "submenus": [
+                    {
+                        "title": f"submenu{m}{s}",
+                        "description": "description",
+                        "dishes": [
+                            {
+                                "title": f"dish{m}{s}{d}",
+                                "description": "description",
+                                "price": "10.50",
+                            }
+                            for d in range(3)
+                        ],
+                    }
+                    for s in range(2)
+                ],
+            }
+            for m in range(2)
+        ]
+    }
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu0", "description": "menu0_description"},
+    )
+
+    response = client.post("/api/v1/catalog/import", json=catalog)
+    assert response.status_code == 201
+    assert response.json() == {"menus": 2, "submenus": 4, "dishes": 12}
+
+    menus = client.get("/api/v1/menus").json()
+    assert [menu["id"] for menu in menus] == ["1", "2", "3"]
+    assert menus[1]["submenus_count"] == 2
+    assert menus[1]["dishes_count"] == 6
+
+    tree = client.get("/api/v1/menus/3/tree").json()
+    assert tree["submenus"][1]["title"] == "submenu11"
+    assert tree["submenus"][1]["dishes_count"] == 3
+    assert tree["submenus"][1]["dishes"][2]["title"] == "dish112"
+
+    response = client.post(
+        "/api/v1/menus/3/submenus/4/dishes",
+        json={"title": "dish", "description": "d", "price": "1"},
+    )
+    assert response.json()["id"] == "13"
+
+
+def test_export_catalog():
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu1", "description": "menu1_description"},
+    )
+    client.post(
+        "/api/v1/menus/1/submenus",
+        json={"title": "submenu1", "description": "submenu1_description"},
+    )
+    client.post(
+        "/api/v1/menus/1/submenus/1/dishes",
+        json={"title": "dish1", "description": "dish1", "price": "100"},
+    )
+
+    response = client.get("/api/v1/catalog/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [(row["type"], row["id"]) for row in rows] == [
+        ("menu", "1"),
+        ("submenu", "1"),
+        ("dish", "1"),
+    ]
+    assert rows[1]["menu_id"] == "1"
+    assert rows[2]["price"] == "100"
+
+    response = client.get("/api/v1/catalog/export?format=csv")
+    lines = response.text.splitlines()
+    assert lines[0].startswith("type,id,menu_id,submenu_id,title")
+    assert lines[3].startswith("dish,1,1,1,dish1,dish1,100,")
+
+    last_modified = response.headers["last-modified"]
+    response = client.get(
+        "/api/v1/catalog/export",
+        headers={"If-Modified-Since": "Sun, 01 Jan 2090 00:00:00 GMT"},
+    )
+    assert response.status_code == 304
+
+    response = client.get(
+        "/api/v1/catalog/export",
+        headers={"If-Modified-Since": last_modified},
+    )
+    assert response.status_code == 200
+
+    since = max(row["updated_at"] for row in rows)
+    client.patch(
+        "/api/v1/menus/1/submenus/1/dishes/1",
+        json={"title": "dish2", "description": "dish2", "price": "200"},
+    )
+    response = client.get("/api/v1/catalog/export", params={"since": since})
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    # Изменение блюда поднимает версии и время изменения родителей
+    assert [(row["type"], row["title"]) for row in rows] == [
+        ("menu", "menu1"),
+        ("submenu", "submenu1"),
+        ("dish", "dish2"),
+    ]
+
+
+def test_export_catalog_deletes():
+    for title in ("menu1", "menu2"):
+        client.post("/api/v1/menus", json={"title": title, "description": "d"})
+    client.post(
+        "/api/v1/menus/1/submenus",
+        json={"title": "submenu1", "description": "d"},
+    )
+    client.post(
+        "/api/v1/menus/1/submenus/1/dishes",
+        json={"title": "dish1", "description": "d", "price": "1"},
+    )
+    response = client.get("/api/v1/catalog/export")
+    since = max(
+        json.loads(line)["updated_at"] for line in response.text.splitlines()
+    )
+    db = TestingSessionLocal()
+    try:
+        before = crud.get_catalog_last_modified(db)
+    finally:
+        db.close()
+
+    # У меню нет родителя, поэтому время его удаления видно только
+    # по журналу удалений
+    client.delete("/api/v1/menus/2")
+    client.delete("/api/v1/menus/1/submenus/1/dishes/1")
+    db = TestingSessionLocal()
+    try:
+        assert crud.get_catalog_last_modified(db) > before
+    finally:
+        db.close()
+
+    response = client.get("/api/v1/catalog/export", params={"since": since})
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    deleted = [row for row in rows if "deleted_at" in row]
+    assert [
+        {k: v for k, v in row.items() if k != "deleted_at"} for row in deleted
+    ] == [
+        {"type": "menu", "id": "2"},
+        {"type": "dish", "id": "1", "menu_id": "1", "submenu_id": "1"},
+    ]
+    # Удаления идут перед изменёнными записями
+    assert rows[: len(deleted)] == deleted
+    assert [(row["type"], row["id"]) for row in rows[len(deleted) :]] == [
+        ("menu", "1"),
+        ("submenu", "1"),
+    ]
+
+    response = client.get(
+        "/api/v1/catalog/export", params={"since": since, "format": "csv"}
+    )
+    lines = response.text.splitlines()
+    assert lines[0].endswith(",updated_at,deleted_at")
+    assert lines[1].startswith("menu,2,,,")
+
+    # Полная выгрузка удалений не содержит
+    response = client.get("/api/v1/catalog/export")
+    assert all("deleted_at" not in line for line in response.text.splitlines())
+
+
+def test_menu_etag():
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu1", "description": "menu1_description"},
+    )
+    response = client.get("/api/v1/menus/1")
+    etag = response.headers["etag"]
+
+    response = client.get("/api/v1/menus/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    list_etag = client.get("/api/v1/menus").headers["etag"]
+    response = client.get("/api/v1/menus", headers={"If-None-Match": list_etag})
+    assert response.status_code == 304
+
+    client.post(
+        "/api/v1/menus/1/submenus",
+        json={"title": "submenu1", "description": "submenu1_description"},
+    )
+    response = client.get("/api/v1/menus/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["submenus_count"] == 1
+    response = client.get("/api/v1/menus", headers={"If-None-Match": list_etag})
+    assert response.status_code == 200
+
+    submenu_etag = client.get("/api/v1/menus/1/submenus/1").headers["etag"]
+    client.patch(
+        "/api/v1/menus/1/submenus/1",
+        json={"title": "submenu2", "description": "submenu2_description"},
+    )
+    response = client.get(
+        "/api/v1/menus/1/submenus/1", headers={"If-None-Match": submenu_etag}
+    )
+    assert response.status_code == 200
+    assert response.json()["title"] == "submenu2"
+
+    response = client.get("/api/v1/menus/2", headers={"If-None-Match": "*"})
+    assert response.status_code == 404
+
+    # SQLite выдаёт id удалённой последней строки повторно: пересозданное
+    # меню с тем же id и версией не должно получить прежний ETag
+    client.delete("/api/v1/menus/1")
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu1", "description": "menu1_description"},
+    )
+    response = client.get("/api/v1/menus/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["id"] == "1"
+    assert response.json()["submenus_count"] == 0
+    response = client.get("/api/v1/menus", headers={"If-None-Match": list_etag})
+    assert response.status_code == 200
+
+
+# Бюджет SQL-запросов на маршрут: лишний запрос или повтор одной формы
+# запроса (N+1) роняет тест со списком выполненных запросов
+def test_query_budget():
+    # Записи также обновляют поисковый индекс (+1 запрос, PATCH +2)
+    with querylog.assert_max_queries(3, max_repeats=1):
+        client.post(
+            "/api/v1/menus",
+            json={"title": "menu1", "description": "menu1_description"},
+        )
+    with querylog.assert_max_queries(4, max_repeats=1):
+        client.post(
+            "/api/v1/menus/1/submenus",
+            json={"title": "submenu1", "description": "submenu1_description"},
+        )
+    for i in range(3):
+        with querylog.assert_max_queries(5, max_repeats=1):
+            client.post(
+                "/api/v1/menus/1/submenus/1/dishes",
+                json={"title": f"dish{i}", "description": "d", "price": "1"},
+            )
+
+    for url, limit in (
+        ("/api/v1/menus", 2),
+        ("/api/v1/menus/1", 2),
+        ("/api/v1/menus/tree", 3),
+        ("/api/v1/menus/1/tree", 3),
+        ("/api/v1/menus/1/submenus", 2),
+        ("/api/v1/menus/1/submenus/1", 2),
+        ("/api/v1/menus/1/submenus/1/dishes", 2),
+        ("/api/v1/menus/1/submenus/1/dishes?limit=2", 2),
+        ("/api/v1/menus/1/submenus/1/dishes/1", 2),
+        ("/api/v1/search?q=dish", 1),
+    ):
+        with querylog.assert_max_queries(limit, max_repeats=1):
+            assert client.get(url).status_code == 200
+
+    with querylog.assert_max_queries(7, max_repeats=1):
+        client.patch(
+            "/api/v1/menus/1/submenus/1/dishes/1",
+            json={"title": "dish", "description": "d", "price": "2"},
+        )
+    # Удаление записывается в журнал удалений (tombstone) отдельным INSERT
+    with querylog.assert_max_queries(5, max_repeats=1):
+        client.delete("/api/v1/menus/1/submenus/1/dishes/1")
+    with querylog.assert_max_queries(5, max_repeats=1):
+        client.delete("/api/v1/menus/1/submenus/1")
+    with querylog.assert_max_queries(5, max_repeats=1):
+        client.delete("/api/v1/menus/1")
+
+
+def create_priced_dishes():
+    for menu in ("1", "2"):
+        client.post(
+            "/api/v1/menus",
+            json={"title": f"menu{menu}", "description": "description"},
+        )
+        client.post(
+            f"/api/v1/menus/{menu}/submenus",
+            json={"title": "submenu", "description": "description"},
+        )
+    for menu, price in (("1", "30"), ("1", "10.50"), ("2", "20"), ("1", "5")):
+        client.post(
+            f"/api/v1/menus/{menu}/submenus/{menu}/dishes",
+            json={"title": f"dish{price}", "description": "d", "price": price},
+        )
+
+
+def test_dishes_price_filter_and_sort():
+    create_priced_dishes()
+    url = "/api/v1/menus/1/submenus/1/dishes"
+
+    response = client.get(url, params={"min_price": "5.01", "max_price": 30})
+    assert [d["price"] for d in response.json()] == ["30", "10.50"]
+
+    response = client.get(url, params={"sort": "price"})
+    assert [d["price"] for d in response.json()] == ["5", "10.50", "30"]
+
+    page = client.get(url, params={"sort": "price", "limit": 2}).json()
+    assert [d["price"] for d in page["items"]] == ["5", "10.50"]
+    assert page["next_cursor"] == "1050:2"
+    page = client.get(
+        url, params={"sort": "price", "limit": 2, "after": "1050:2"}
+    ).json()
+    assert [d["price"] for d in page["items"]] == ["30"]
+    assert page["next_cursor"] is None
+
+    response = client.get(url, params={"sort": "price", "after": "3"})
+    assert response.status_code == 422
+
+
+def test_all_dishes_listing():
+    create_priced_dishes()
+
+    page = client.get("/api/v1/dishes", params={"limit": 3}).json()
+    assert [d["id"] for d in page["items"]] == ["1", "2", "3"]
+    assert page["next_cursor"] == "3"
+
+    page = client.get(
+        "/api/v1/dishes", params={"sort": "price", "min_price": 10}
+    ).json()
+    assert [(d["menu_id"], d["price"]) for d in page["items"]] == [
+        ("1", "10.50"),
+        ("2", "20"),
+        ("1", "30"),
+    ]
+
+
+def test_dish_price_validation():
+    create_priced_dishes()
+    for price in ("abc", "-1", "1.005", "12345678901"):
+        response = client.post(
+            "/api/v1/menus/1/submenus/1/dishes",
+            json={"title": "dish", "description": "d", "price": price},
+        )
+        assert response.status_code == 422
+
+    client.patch(
+        "/api/v1/menus/1/submenus/1/dishes/1",
+        json={"title": "dish", "description": "d", "price": "1"},
+    )
+    response = client.get("/api/v1/dishes", params={"sort": "price"})
+    assert response.json()["items"][0]["id"] == "1"
+
+
+def test_batch_fetch():
+    create_priced_dishes()
+
+    with querylog.assert_max_queries(1):
+        response = client.post(
+            "/api/v1/dishes/batch",
+            json={"ids": ["4", "1", "99", "4", "x", "3"]},
+        )
+    assert response.status_code == 200
+    body = response.json()
+    assert [(d["id"], d["menu_id"], d["price"]) for d in body["items"]] == [
+        ("4", "1", "5"),
+        ("1", "1", "30"),
+        ("3", "2", "20"),
+    ]
+    assert body["not_found"] == ["99", "x"]
+
+    response = client.post("/api/v1/submenus/batch", json={"ids": ["2"]})
+    assert response.json()["items"][0]["menu_id"] == "2"
+    assert response.json()["not_found"] == []
+
+    response = client.post("/api/v1/menus/batch", json={"ids": ["3", "1"]})
+    assert [m["id"] for m in response.json()["items"]] == ["1"]
+    assert response.json()["not_found"] == ["3"]
+
+    response = client.post("/api/v1/menus/batch", json={"ids": []})
+    assert response.json() == {"items": [], "not_found": []}
+    response = client.post("/api/v1/menus/batch", json={"ids": ["1"] * 1001})
+    assert response.status_code == 422
+
+
+def test_delete_menu_cascade():
+    create_priced_dishes()
+    client.post(
+        "/api/v1/menus/1/submenus",
+        json={"title": "submenu", "description": "description"},
+    )
+    for i in range(5):
+        client.post(
+            "/api/v1/menus/1/submenus/3/dishes",
+            json={"title": f"dish{i}", "description": "d", "price": "1"},
+        )
+
+    # Число запросов не зависит от числа подменю и блюд
+    with querylog.assert_max_queries(5, max_repeats=1):
+        response = client.delete("/api/v1/menus/1")
+    assert response.status_code == 200
+
+    response = client.post(
+        "/api/v1/submenus/batch", json={"ids": ["1", "2", "3"]}
+    )
+    assert [s["id"] for s in response.json()["items"]] == ["2"]
+    response = client.post(
+        "/api/v1/dishes/batch", json={"ids": [str(i) for i in range(1, 10)]}
+    )
+    assert [d["id"] for d in response.json()["items"]] == ["3"]
+    assert client.get("/api/v1/menus/2").json()["dishes_count"] == 1
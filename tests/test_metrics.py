@@ -0,0 +1,61 @@
+import pytest
+
+from menu import metrics
+from tests.test_main import client, test_db  # noqa: F401
+
+
+@pytest.fixture(autouse=True)
+def registry():
+    metrics.REGISTRY.reset()
+    yield metrics.REGISTRY
+    metrics.REGISTRY.reset()
+
+
+def series(text: str) -> dict[str, float]:
+    values = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            values[name] = float(value)
+    return values
+
+
+def test_histogram_cumulative():
+    histogram = metrics.Histogram((1, 5))
+    for value in (0, 1, 3, 10):
+        histogram.observe(value)
+    assert list(histogram.cumulative()) == [("1", 2), ("5", 3), ("+Inf", 4)]
+    assert histogram.sum == 14
+
+
+def test_metrics_by_route_template():
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu1", "description": "menu1_description"},
+    )
+    client.get("/api/v1/menus/1")
+    client.get("/api/v1/menus/2")
+    client.get("/not-found")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    values = series(response.text)
+
+    route = 'method="GET",route="/api/v1/menus/{menu_id}"'
+    assert values[f'http_requests_total{{{route},status="200"}}'] == 1
+    assert values[f'http_requests_total{{{route},status="404"}}'] == 1
+    assert values[f'http_request_errors_total{{{route},status="404"}}'] == 1
+    assert values[f"http_request_duration_seconds_count{{{route}}}"] == 2
+    assert (
+        values[f'http_request_duration_seconds_bucket{{{route},le="+Inf"}}']
+        == 2
+    )
+
+    # ETag и запись читаются отдельными запросами к БД
+    assert values[f"http_request_db_queries_sum{{{route}}}"] >= 4
+    assert values[f"http_request_db_seconds_sum{{{route}}}"] > 0
+
+    unmatched = 'method="GET",route="unmatched",status="404"'
+    assert values[f"http_requests_total{{{unmatched}}}"] == 1
+    assert 'route="/api/v1/menus/1"' not in response.text
@@ -0,0 +1,160 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from menu import migrations, models
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/migrations.db")
+    yield engine
+    engine.dispose()
+
+
+def test_migrate_fresh_database(engine):
+    applied = migrations.migrate(engine)
+    assert applied == [m.version for m in migrations.MIGRATIONS]
+    assert migrations.migrate(engine) == []
+
+    inspector = inspect(engine)
+    for table in models.Base.metadata.sorted_tables:
+        columns = {c["name"] for c in inspector.get_columns(table.name)}
+        assert columns == set(table.columns.keys())
+        indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        assert indexes == {index.name for index in table.indexes}
+
+
+def test_migrate_legacy_database(engine):
+    migrations.migrate(engine, target=1)
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO menu (title, description, submenus_count, "
+                "dishes_count) VALUES ('menu1', 'description', 0, 0)"
+            )
+        )
+
+    assert migrations.migrate(engine) == [
+        m.version for m in migrations.MIGRATIONS[1:]
+    ]
+    with engine.connect() as conn:
+        row = conn.execute(text("SELECT title, updated_at FROM menu")).one()
+        assert (
+            migrations.current_version(conn)
+            == migrations.MIGRATIONS[-1].version
+        )
+    assert row.title == "menu1"
+    assert row.updated_at.startswith("1970-01-01")
+
+
+def test_migrate_database_created_by_create_all(engine):
+    models.Base.metadata.create_all(bind=engine)
+    assert len(migrations.migrate(engine)) == len(migrations.MIGRATIONS)
+
+
+def test_backfill_price_cents(engine):
+    migrations.migrate(engine, target=4)
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO menu (id, title, description, submenus_count, "
+                "dishes_count) VALUES (1, 'menu1', 'description', 1, 3)"
+            )
+        )
+        conn.execute(
+            text(
+                "INSERT INTO submenu (id, menu_id, title, description, "
+                "dishes_count) VALUES (1, 1, 'submenu1', 'description', 3)"
+            )
+        )
+        for price in ("12.50", "7", "free"):
+            conn.execute(
+                text(
+                    "INSERT INTO dish (menu_id, submenu_id, title, "
+                    "description, price) VALUES (1, 1, 'dish', 'd', :price)"
+                ),
+                {"price": price},
+            )
+
+    migrations.migrate(engine)
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text("SELECT price, price_cents FROM dish ORDER BY id")
+        ).all()
+    assert rows == [("12.50", 1250), ("7", 700), ("free", None)]
+
+
+def test_search_index_rebuilt(engine):
+    migrations.migrate(engine, target=6)
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO menu (id, title, description, submenus_count, "
+                "dishes_count) VALUES (1, 'Lunch', 'Daily', 0, 0)"
+            )
+        )
+
+    migrations.migrate(engine)
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text(
+                "SELECT kind, entity_id FROM search_index "
+                "WHERE search_index MATCH 'lunch'"
+            )
+        ).all()
+    assert rows == [("menu", 1)]
+
+
+def test_backfill_price_cents_resumes(engine, monkeypatch):
+    migrations.migrate(engine, target=4)
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO menu (id, title, description, submenus_count, "
+                "dishes_count) VALUES (1, 'menu1', 'description', 1, 5)"
+            )
+        )
+        conn.execute(
+            text(
+                "INSERT INTO submenu (id, menu_id, title, description, "
+                "dishes_count) VALUES (1, 1, 'submenu1', 'description', 5)"
+            )
+        )
+        for price in range(1, 6):
+            conn.execute(
+                text(
+                    "INSERT INTO dish (menu_id, submenu_id, title, "
+                    "description, price) VALUES (1, 1, 'dish', 'd', :price)"
+                ),
+                {"price": str(price)},
+            )
+
+    # Сбой на третьей пачке: первые две уже зафиксированы
+    calls = []
+    price_to_cents = migrations.price_to_cents
+
+    def failing(price):
+        calls.append(price)
+        if len(calls) > 4:
+            raise RuntimeError("crash")
+        return price_to_cents(price)
+
+    monkeypatch.setattr(migrations, "PRICE_BACKFILL_BATCH", 2)
+    with monkeypatch.context() as patch:
+        patch.setattr(migrations, "price_to_cents", failing)
+        with pytest.raises(RuntimeError):
+            migrations.migrate(engine)
+
+    with engine.connect() as conn:
+        assert migrations.current_version(conn) == 4
+        rows = conn.execute(
+            text("SELECT price_cents FROM dish ORDER BY id")
+        ).all()
+    assert rows == [(100,), (200,), (300,), (400,), (None,)]
+
+    assert migrations.migrate(engine)[0] == 5
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text("SELECT price_cents FROM dish ORDER BY id")
+        ).all()
+    assert rows == [(100,), (200,), (300,), (400,), (500,)]
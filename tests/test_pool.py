@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import create_engine, exc
+
+from menu import pool
+from tests.test_main import client, engine
+
+
+@pytest.fixture
+def registered():
+    names = []
+    yield names
+    for name in names:
+        pool.unregister(name)
+
+
+def test_pool_stats_and_timeouts(registered):
+    engine = create_engine(
+        "sqlite:///./test_sql_app.db",
+        connect_args={"check_same_thread": False},
+        poolclass=pool.InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    stats = pool.instrument("test", engine)
+    registered.append("test")
+
+    conn = engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+
+    data = pool.get_pool_stats()["test"]
+    assert data["checked_out"] == 1
+    assert data["timeouts"] == 1
+    assert data["size"] == 1
+    assert data["overflow"] == 0
+    assert data["wait_max"] >= 0.05
+
+    conn.close()
+    assert stats.as_dict(engine.pool)["checked_out"] == 0
+    engine.dispose()
+
+
+def test_pool_endpoint(registered):
+    pool.instrument("tests", engine)
+    registered.append("tests")
+    response = client.get("/internal/pool")
+    assert response.status_code == 200
+    assert "checked_out" in response.json()["tests"]
+
+
+def test_unregister_removes_listeners():
+    stats = pool.instrument("tests", engine)
+    pool.unregister("tests")
+    assert "tests" not in pool.get_pool_stats()
+    with engine.connect():
+        pass
+    assert stats.checkouts == 0
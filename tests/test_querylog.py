@@ -0,0 +1,74 @@
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from menu import crud, querylog
+from tests.test_main import TestingSessionLocal, client, test_db  # noqa: F401
+
+
+def create_catalog(submenus: int):
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu1", "description": "menu1_description"},
+    )
+    for i in range(submenus):
+        client.post(
+            "/api/v1/menus/1/submenus",
+            json={"title": f"submenu{i}", "description": "description"},
+        )
+
+
+def test_shape():
+    assert querylog.shape(
+        "SELECT * FROM dish WHERE id IN (?, ?, ?) AND title = 'a''b'"
+    ) == querylog.shape(
+        "SELECT *  FROM dish\nWHERE id IN (?) AND title = 'c'"
+    )
+    assert (
+        querylog.shape("SELECT * FROM menu WHERE id = %(id_1)s LIMIT 10")
+        == "SELECT * FROM menu WHERE id = ? LIMIT ?"
+    )
+
+
+def test_record_crud_calls():
+    create_catalog(3)
+    with TestingSessionLocal() as db, querylog.record() as recorder:
+        for submenu in crud.get_all_submenu("1", db):
+            crud.get_all_dishes("1", str(submenu.id), db)
+
+    assert recorder.count == 4
+    (repeated,) = recorder.repeated(3)
+    assert "FROM dish" in repeated
+
+
+def test_assert_max_queries():
+    create_catalog(3)
+    with pytest.raises(AssertionError, match="at most 1 queries"):
+        with querylog.assert_max_queries(1):
+            client.get("/api/v1/menus")
+
+    with pytest.raises(AssertionError, match=r"\(N\+1\)"):
+        with querylog.assert_max_queries(10, max_repeats=2):
+            with TestingSessionLocal() as db:
+                for i in range(1, 4):
+                    crud.get_submenu_by_id("1", str(i), db)
+
+
+def test_middleware_logs_repeats(caplog):
+    create_catalog(3)
+    app = FastAPI()
+
+    @app.get("/submenus/{menu_id}")
+    def submenus(menu_id: str):
+        with TestingSessionLocal() as db:
+            for i in range(1, 4):
+                crud.get_submenu_by_id(menu_id, str(i), db)
+
+    app.add_middleware(querylog.QueryLogMiddleware, repeat_threshold=3)
+    with caplog.at_level(logging.WARNING, logger="menu.querylog"):
+        TestClient(app).get("/submenus/1")
+
+    (message,) = caplog.messages
+    assert message.startswith("GET /submenus/{menu_id}: 3 queries")
@@ -0,0 +1,142 @@
+import os
+import sqlite3
+
+import pytest
+
+from menu import cache, database, replicas
+from tests.test_main import client, test_db  # noqa: F401
+
+REPLICA_FILES = ["test_replica1.db", "test_replica2.db"]
+
+
+# Репликация эмулируется копированием основной базы тестов в файлы реплик
+def replicate(*files: str) -> None:
+    with sqlite3.connect("test_sql_app.db") as source:
+        for name in files or REPLICA_FILES:
+            with sqlite3.connect(name) as target:
+                source.backup(target)
+
+
+def make_replicas(*urls: str) -> replicas.ReplicaSet:
+    return replicas.ReplicaSet(
+        [
+            replicas.Replica(
+                f"replica{i}", database.create_replica_engine(f"r{i}", url, {})
+            )
+            for i, url in enumerate(urls, 1)
+        ]
+    )
+
+
+@pytest.fixture
+def replica_set():
+    replicate()
+    database.replicas = make_replicas(
+        *(f"sqlite:///./{name}" for name in REPLICA_FILES)
+    )
+    yield database.replicas
+    database.replicas.dispose()
+    database.replicas = None
+    for name in REPLICA_FILES:
+        os.remove(name)
+
+
+def create_menu(title: str = "menu1"):
+    return client.post(
+        "/api/v1/menus", json={"title": title, "description": "description"}
+    )
+
+
+def test_reads_go_to_replica(replica_set):
+    assert create_menu().status_code == 201
+    assert client.get("/api/v1/menus/1").status_code == 404
+    assert client.get("/api/v1/menus").json() == []
+
+    # Запись и чтение внутри PATCH выполняются на основной БД
+    response = client.patch(
+        "/api/v1/menus/1", json={"title": "menu2", "description": "d"}
+    )
+    assert response.status_code == 200
+
+    replicate()
+    assert client.get("/api/v1/menus/1").json()["title"] == "menu2"
+
+
+def test_round_robin(replica_set):
+    create_menu()
+    replicate()
+    with sqlite3.connect(REPLICA_FILES[1]) as conn:
+        conn.execute("UPDATE menu SET title = 'replica2'")
+
+    titles = [client.get("/api/v1/menus/1").json()["title"] for _ in range(4)]
+    assert titles == ["menu1", "replica2", "menu1", "replica2"]
+
+
+def test_unhealthy_replica_skipped(replica_set):
+    create_menu()
+    replicate()
+    broken = replicas.Replica(
+        "broken",
+        database.create_replica_engine(
+            "broken", "sqlite:////nonexistent/replica.db", {}
+        ),
+    )
+    database.replicas = replicas.ReplicaSet(
+        [broken, replica_set.replicas[0]], check_interval=60
+    )
+
+    for _ in range(3):
+        assert client.get("/api/v1/menus/1").status_code == 200
+    assert broken.healthy is False
+
+
+def test_fallback_to_primary():
+    database.replicas = make_replicas("sqlite:////nonexistent/replica.db")
+    try:
+        create_menu()
+        assert client.get("/api/v1/menus/1").status_code == 200
+        assert database.replicas.pick() is None
+    finally:
+        database.replicas = None
+
+
+# Реплика отвечает на SELECT 1, но падает на запросе (здесь — нет таблиц):
+# запрос повторяется на основной БД
+def test_failed_read_retried_on_primary(replica_set):
+    create_menu()
+    sqlite3.connect("test_replica_empty.db").close()
+    empty = replicas.Replica(
+        "empty",
+        database.create_replica_engine(
+            "empty", "sqlite:///./test_replica_empty.db", {}
+        ),
+    )
+    database.replicas = replicas.ReplicaSet([empty], check_interval=60)
+    try:
+        response = client.get("/api/v1/menus/1")
+        assert response.status_code == 200
+        assert response.json()["title"] == "menu1"
+        assert empty.healthy is False
+    finally:
+        database.replicas = replica_set
+        empty.engine.dispose()
+        os.remove("test_replica_empty.db")
+
+
+def test_replica_reads_not_cached(replica_set):
+    backend = cache.MemoryCache()
+    cache.set_backend(backend)
+    try:
+        create_menu()
+        replicate()
+        assert client.get("/api/v1/menus/1").status_code == 200
+        assert backend.get(cache.menu_key(1)) is None
+
+        # Без доступных реплик чтение идёт в основную БД и кэшируется
+        database.replicas = make_replicas("sqlite:////nonexistent/r.db")
+        assert client.get("/api/v1/menus/1").status_code == 200
+        assert backend.get(cache.menu_key(1))["title"] == "menu1"
+        database.replicas.dispose()
+        database.replicas = replica_set
+    finally:
+        cache.set_backend(cache.NullCache())
@@ -0,0 +1,125 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from menu import cache, compression
+from menu.dependencies import get_response_settings
+from tests.test_main import client, test_db  # noqa: F401
+
+
+@pytest.fixture
+def fast_json(monkeypatch):
+    monkeypatch.setenv("RESPONSE_FAST_JSON", "1")
+    get_response_settings.cache_clear()
+    yield
+    get_response_settings.cache_clear()
+
+
+def create_catalog():
+    client.post(
+        "/api/v1/menus",
+        json={"title": "menu1", "description": "menu1_description"},
+    )
+    client.post(
+        "/api/v1/menus/1/submenus",
+        json={"title": "submenu1", "description": "submenu1_description"},
+    )
+    for i in range(3):
+        client.post(
+            "/api/v1/menus/1/submenus/1/dishes",
+            json={"title": f"dish{i}", "description": "d", "price": "1.5"},
+        )
+
+
+LIST_URLS = [
+    "/api/v1/menus",
+    "/api/v1/menus/1/submenus",
+    "/api/v1/menus/1/submenus/1/dishes",
+]
+
+
+def test_fast_json_lists_match_schemas(request):
+    create_catalog()
+    expected = [client.get(url) for url in LIST_URLS]
+
+    request.getfixturevalue("fast_json")
+    for url, response in zip(LIST_URLS, expected):
+        fast = client.get(url)
+        assert fast.status_code == 200
+        assert fast.json() == response.json()
+        assert fast.headers["etag"] == response.headers["etag"]
+
+
+def test_fast_json_uses_cache(fast_json):
+    cache.set_backend(cache.MemoryCache())
+    try:
+        create_catalog()
+        first = client.get("/api/v1/menus/1/submenus/1/dishes").json()
+        assert cache.get_backend().get(cache.dishes_key("1", "1")) == first
+        assert client.get("/api/v1/menus/1/submenus/1/dishes").json() == first
+    finally:
+        cache.set_backend(cache.NullCache())
+
+
+def test_negotiate():
+    assert compression.negotiate("") is None
+    assert compression.negotiate("gzip, deflate") == "gzip"
+    assert compression.negotiate("gzip;q=0") is None
+    assert compression.negotiate("br;q=0.5, gzip") == "gzip"
+    assert compression.negotiate("identity") is None
+
+
+compressed_app = FastAPI()
+compressed_app.add_middleware(
+    compression.CompressionMiddleware, minimum_size=100
+)
+
+
+@compressed_app.get("/text")
+def text(size: int):
+    return PlainTextResponse("a" * size)
+
+
+@compressed_app.get("/stream")
+def stream():
+    return StreamingResponse(iter([b"line\n"] * 50), media_type="text/plain")
+
+
+compressed_client = TestClient(compressed_app)
+
+
+def test_small_response_not_compressed():
+    response = compressed_client.get(
+        "/text?size=10", headers={"Accept-Encoding": "gzip"}
+    )
+    assert "content-encoding" not in response.headers
+    assert response.text == "a" * 10
+
+
+def test_gzip_response():
+    response = compressed_client.get(
+        "/text?size=1000", headers={"Accept-Encoding": "gzip"}
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < 1000
+    assert response.text == "a" * 1000
+
+
+def test_brotli_response():
+    pytest.importorskip("brotli")
+    response = compressed_client.get(
+        "/text?size=1000", headers={"Accept-Encoding": "gzip, br"}
+    )
+    assert response.headers["content-encoding"] == "br"
+    assert response.text == "a" * 1000
+
+
+def test_streaming_response_compressed():
+    response = compressed_client.get(
+        "/stream", headers={"Accept-Encoding": "gzip"}
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text == "line\n" * 50
@@ -0,0 +1,139 @@
+from tests.test_main import client, test_db  # noqa: F401
+
+MENUS = "/api/v1/menus"
+SUBMENUS = "/api/v1/menus/1/submenus"
+DISHES = "/api/v1/menus/1/submenus/1/dishes"
+
+
+def create_catalog():
+    client.post(MENUS, json={"title": "Lunch", "description": "Daily menu"})
+    client.post(
+        SUBMENUS, json={"title": "Hot", "description": "Spicy chicken dishes"}
+    )
+    for title, description in (
+        ("Spicy chicken", "Chicken wings with chili"),
+        ("Caesar", "Salad with chicken"),
+        ("Borscht", "Beet soup"),
+    ):
+        client.post(
+            DISHES,
+            json={"title": title, "description": description, "price": "1"},
+        )
+
+
+def search(q: str, **params):
+    response = client.get("/api/v1/search", params={"q": q, **params})
+    assert response.status_code == 200
+    return response.json()
+
+
+def found(q: str) -> list[tuple[str, str]]:
+    return [(item["kind"], item["id"]) for item in search(q)["items"]]
+
+
+def test_search_ranked():
+    create_catalog()
+
+    page = search("spicy chicken")
+    assert [(item["kind"], item["title"]) for item in page["items"]] == [
+        ("dish", "Spicy chicken"),
+        ("submenu", "Hot"),
+    ]
+    assert page["items"][0] == {
+        "kind": "dish",
+        "id": "1",
+        "menu_id": "1",
+        "submenu_id": "1",
+        "title": "Spicy chicken",
+        "description": "Chicken wings with chili",
+        "score": page["items"][0]["score"],
+    }
+    assert page["next_cursor"] is None
+    assert found("CHICKEN")[0] == ("dish", "1")
+    assert found("daily") == [("menu", "1")]
+    assert found("pizza") == []
+    assert search("***")["items"] == []
+
+
+def test_search_pagination():
+    create_catalog()
+
+    page = search("chicken", limit=2)
+    assert len(page["items"]) == 2
+    assert page["next_cursor"] == "2"
+    rest = search("chicken", limit=2, after=page["next_cursor"])
+    assert len(rest["items"]) == 1
+    assert rest["next_cursor"] is None
+
+    ids = {(i["kind"], i["id"]) for i in page["items"] + rest["items"]}
+    assert ids == {("dish", "1"), ("dish", "2"), ("submenu", "1")}
+
+    assert client.get("/api/v1/search").status_code == 422
+    response = client.get("/api/v1/search", params={"q": "a", "after": "x"})
+    assert response.status_code == 422
+
+
+def test_search_follows_writes():
+    create_catalog()
+
+    client.patch(
+        DISHES + "/3",
+        json={"title": "Borscht", "description": "Soup with chicken"},
+    )
+    client.patch(
+        DISHES + "/3",
+        json={"title": "Borscht", "description": "Beet soup", "price": "2"},
+    )
+    assert found("beet") == [("dish", "3")]
+    client.patch(SUBMENUS + "/1", json={"title": "Grill", "description": "d"})
+    assert found("grill") == [("submenu", "1")]
+    assert found("hot") == []
+
+    client.delete(DISHES + "/2")
+    assert found("salad") == []
+
+    client.delete(SUBMENUS + "/1")
+    assert found("chicken") == []
+    assert found("lunch") == [("menu", "1")]
+
+    client.post(SUBMENUS, json={"title": "Soups", "description": "d"})
+    client.delete(MENUS + "/1")
+    assert found("soups") == []
+    assert found("lunch") == []
+
+
+def test_search_imported_catalog():
+    response = client.post(
+        "/api/v1/catalog/import",
+        json={
+            "menus": [
+                {
+                    "title": "Dinner",
+                    "description": "Evening menu",
+                    "submenus": [
+                        {
+                            "title": "Grill",
+                            "description": "Charcoal",
+                            "dishes": [
+                                {
+                                    "title": "Steak",
+                                    "description": "Beef",
+                                    "price": "10",
+                                }
+                            ],
+                        }
+                    ],
+                }
+            ]
+        },
+    )
+    assert response.status_code == 201
+
+    assert found("evening") == [("menu", "1")]
+    assert found("charcoal") == [("submenu", "1")]
+    item = search("beef")["items"][0]
+    assert (item["kind"], item["menu_id"], item["submenu_id"]) == (
+        "dish",
+        "1",
+        "1",
+    )
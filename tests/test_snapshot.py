@@ -0,0 +1,179 @@
+import asyncio
+import json
+
+import pytest
+
+from menu import database, main, models, querylog, snapshot
+from menu.dependencies import get_snapshot_settings
+from tests.test_main import TestingSessionLocal, client, test_db  # noqa: F401
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "catalog.snapshot")
+
+
+@pytest.fixture
+def published(path):
+    snapshot.configure(path, TestingSessionLocal)
+    snapshot.rebuild()
+    yield path
+    snapshot.disable()
+
+
+def body(snap: snapshot.Snapshot, key: str):
+    entry = snap.get(key)
+    return None if entry is None else json.loads(bytes(entry.body))
+
+
+def test_snapshot_shared_between_instances(path):
+    writer = snapshot.Snapshot(path)
+    reader = snapshot.Snapshot(path)
+
+    with writer.locked():
+        writer.write({"a": (b"[1]", '"1"'), "b": (b"[2]", '"2"')}, ())
+    entry = reader.get("a")
+    assert bytes(entry.body) == b"[1]" and entry.etag == '"1"'
+    assert isinstance(entry.body.obj, snapshot.mmap.mmap)
+
+    with writer.locked():
+        writer.write({"a": (b"[3]", '"3"')}, ["b"])
+    assert body(reader, "a") == [3]
+    assert reader.get("b") is None
+    # Выданный ранее срез не меняется
+    assert bytes(entry.body) == b"[1]"
+    assert reader.generation == writer.generation == 3
+
+
+def test_snapshot_compaction(path, monkeypatch):
+    monkeypatch.setattr(snapshot, "MIN_COMPACT_SIZE", 0)
+    writer = snapshot.Snapshot(path)
+    reader = snapshot.Snapshot(path)
+    with writer.locked():
+        writer.write({"a": (b"0" * 100, '"0"')}, ())
+    old = reader.get("a")
+
+    for i in range(1, 5):
+        with writer.locked():
+            writer.write({"a": (str(i).encode() * 100, f'"{i}"')}, ())
+    assert reader.get("a").etag == '"4"'
+    assert writer._committed < 2 * writer._live
+    assert bytes(old.body) == b"0" * 100
+
+
+def create_catalog():
+    client.post("/api/v1/menus", json={"title": "m", "description": "d"})
+    client.post(
+        "/api/v1/menus/1/submenus", json={"title": "s", "description": "d"}
+    )
+    client.post(
+        "/api/v1/menus/1/submenus/1/dishes",
+        json={"title": "dish", "description": "d", "price": "1.50"},
+    )
+
+
+ROUTES = (
+    "/api/v1/menus",
+    "/api/v1/menus/1",
+    "/api/v1/menus/1/submenus",
+    "/api/v1/menus/1/submenus/1",
+    "/api/v1/menus/1/submenus/1/dishes",
+    "/api/v1/menus/1/submenus/1/dishes/1",
+)
+
+
+def test_get_served_from_snapshot(published):
+    create_catalog()
+    expected = {}
+    snapshot.disable()
+    for url in ROUTES:
+        response = client.get(url)
+        expected[url] = (response.json(), response.headers["ETag"])
+
+    snapshot.configure(published, TestingSessionLocal)
+    for url in ROUTES:
+        with querylog.assert_max_queries(0):
+            response = client.get(url)
+            assert response.status_code == 200
+            assert (response.json(), response.headers["ETag"]) == expected[
+                url
+            ]
+            response = client.get(
+                url, headers={"If-None-Match": expected[url][1]}
+            )
+            assert response.status_code == 304
+
+
+# ETag снимка после удалений и повторного создания (с теми же id)
+# совпадает с ETag из БД, после публикации и после пересборки
+def test_etags_after_delete(published):
+    create_catalog()
+    client.post(
+        "/api/v1/menus/1/submenus", json={"title": "s", "description": "d"}
+    )
+    client.delete("/api/v1/menus/1/submenus/1/dishes/1")
+    create_catalog()
+    client.delete("/api/v1/menus/1/submenus/2")
+
+    served = {url: client.get(url).headers["ETag"] for url in ROUTES}
+    snapshot.rebuild()
+    rebuilt = {url: client.get(url).headers["ETag"] for url in ROUTES}
+    snapshot.disable()
+    assert served == rebuilt == {
+        url: client.get(url).headers["ETag"] for url in ROUTES
+    }
+
+
+def test_writes_republish(published):
+    create_catalog()
+    reader = snapshot.Snapshot(published)
+    assert body(reader, "menus")[0]["dishes_count"] == 1
+    assert body(reader, "menus:1:submenus:1:dishes:1")["price"] == "1.50"
+
+    client.patch(
+        "/api/v1/menus/1/submenus/1/dishes/1",
+        json={"title": "dish", "description": "d", "price": "2"},
+    )
+    assert client.get("/api/v1/menus/1/submenus/1/dishes/1").json()[
+        "price"
+    ] == "2"
+    assert body(reader, "menus:1:submenus:1:dishes")[0]["price"] == "2"
+
+    client.delete("/api/v1/menus/1/submenus/1")
+    assert reader.keys("menus:1:submenus:1") == []
+    assert body(reader, "menus:1")["submenus_count"] == 0
+    assert client.get("/api/v1/menus/1/submenus/1").status_code == 404
+
+    client.delete("/api/v1/menus/1")
+    assert reader.keys("menus:") == []
+    assert client.get("/api/v1/menus").json() == []
+
+
+# Снимок, оставшийся от прошлого запуска, пересобирается при запуске:
+# данные могли измениться без публикации
+def test_startup_rebuilds_stale_snapshot(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("SNAPSHOT_ENABLED", "1")
+    get_snapshot_settings.cache_clear()
+    try:
+        main.startup()
+        assert json.loads(bytes(snapshot.lookup("menus").body)) == []
+        with database.SessionLocal() as db:
+            db.add(
+                models.Menu(
+                    title="m",
+                    description="d",
+                    submenus_count=0,
+                    dishes_count=0,
+                )
+            )
+            db.commit()
+        asyncio.run(main.shutdown())
+
+        main.startup()
+        menus = json.loads(bytes(snapshot.lookup("menus").body))
+        assert [menu["title"] for menu in menus] == ["m"]
+    finally:
+        asyncio.run(main.shutdown())
+        snapshot.disable()
+        get_snapshot_settings.cache_clear()
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select, text
+from sqlalchemy.exc import OperationalError
+
+from menu import database, main, models, snapshot
+from menu.dependencies import get_snapshot_settings, get_sqlite_settings
+
+
+@pytest.fixture
+def tuned(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("SQLITE_TUNED", "1")
+    monkeypatch.setenv("SQLITE_READERS", "2")
+    get_sqlite_settings.cache_clear()
+    yield
+    get_sqlite_settings.cache_clear()
+
+
+def pragma(conn, name: str):
+    return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+def test_tuned_connections(tuned):
+    main.startup()
+    try:
+        with database.engine.connect() as conn:
+            assert pragma(conn, "journal_mode") == "wal"
+            assert pragma(conn, "synchronous") == 1
+            assert pragma(conn, "busy_timeout") == 5000
+            assert pragma(conn, "temp_store") == 2
+            assert pragma(conn, "cache_size") == -64 * 1024
+            assert pragma(conn, "query_only") == 0
+        assert database.engine.pool.size() == 1
+
+        assert database.replicas.pick() is database.reader
+        with database.reader.engine.connect() as conn:
+            assert pragma(conn, "query_only") == 1
+        assert database.reader.engine.pool.size() == 2
+    finally:
+        asyncio.run(main.shutdown())
+    assert database.reader is None
+
+
+def add_menu(conn, title: str) -> None:
+    conn.execute(
+        insert(models.Menu).values(
+            title=title, description="d", submenus_count=0, dishes_count=0
+        )
+    )
+
+
+def test_readers_not_blocked_by_writer(tuned):
+    main.startup()
+    try:
+        with database.engine.begin() as write_conn:
+            add_menu(write_conn, "m1")
+            add_menu(write_conn, "m2")
+
+        with database.reader.engine.connect() as read_conn:
+            # Запись фиксируется, пока незавершённый запрос чтения держит
+            # свой снимок базы: в режиме WAL она не ждёт читателя
+            rows = read_conn.execute(select(models.Menu.title))
+            assert rows.fetchone() == ("m1",)
+            with database.engine.begin() as write_conn:
+                add_menu(write_conn, "m3")
+            assert rows.fetchall() == [("m2",)]
+
+            titles = read_conn.execute(select(models.Menu.title)).all()
+            assert len(titles) == 3
+
+            with pytest.raises(OperationalError, match="readonly"):
+                read_conn.execute(text("DELETE FROM menu"))
+    finally:
+        asyncio.run(main.shutdown())
+
+
+def test_tuned_app_with_snapshot(tuned, monkeypatch):
+    monkeypatch.setenv("SNAPSHOT_ENABLED", "1")
+    get_snapshot_settings.cache_clear()
+    try:
+        with TestClient(main.create_app()) as app_client:
+            response = app_client.post(
+                "/api/v1/menus", json={"title": "m", "description": "d"}
+            )
+            assert response.status_code == 201
+            response = app_client.patch(
+                "/api/v1/menus/1", json={"title": "m2", "description": "d"}
+            )
+            assert response.status_code == 200
+            assert app_client.get("/api/v1/menus/1").json()["title"] == "m2"
+            pools = app_client.get("/internal/pool").json()
+            assert pools["reader"]["checkouts"] > 0
+    finally:
+        snapshot.disable()
+        get_snapshot_settings.cache_clear()
@@ -0,0 +1,68 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, exc, inspect
+
+from menu import database, dependencies, main, migrations
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setenv("STARTUP_CONNECT_ATTEMPTS", "3")
+    monkeypatch.setenv("STARTUP_BACKOFF", "0.01")
+    dependencies.get_startup_settings.cache_clear()
+    yield
+    dependencies.get_startup_settings.cache_clear()
+
+
+def test_import_does_not_touch_database():
+    # Без переменных DB_* настройки PostgreSQL не прочитать,
+    # но импорт приложения не должен к ним обращаться
+    env = {**os.environ, "DB_ENGINE": "POSTGRESQL"}
+    env = {
+        k: v
+        for k, v in env.items()
+        if not k.startswith("DB_") or k == "DB_ENGINE"
+    }
+    subprocess.run(
+        [sys.executable, "-c", "import menu.main"], env=env, check=True
+    )
+
+
+def test_wait_for_database_retries(fast_retries):
+    attempts = []
+
+    def connect():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise sqlite3.OperationalError("database is starting up")
+        return sqlite3.connect(":memory:")
+
+    engine = create_engine("sqlite://", creator=connect)
+    database.wait_for_database(engine)
+    assert len(attempts) == 3
+
+
+def test_wait_for_database_gives_up(fast_retries):
+    def connect():
+        raise sqlite3.OperationalError("database is down")
+
+    engine = create_engine("sqlite://", creator=connect)
+    with pytest.raises(exc.OperationalError):
+        database.wait_for_database(engine)
+
+
+def test_startup_and_shutdown(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with TestClient(main.create_app()):
+        assert database.engine is not None
+        with database.engine.connect() as conn:
+            assert migrations.current_version(conn) == len(
+                migrations.MIGRATIONS
+            )
+        assert "menu" in inspect(database.engine).get_table_names()
+    assert database.engine is None